@@ -0,0 +1,226 @@
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest_argument_parser import parser
+from storage import get_storage
+from utils import signal_position_pnl
+
+logging = logging.getLogger()
+
+# Price arrays attached from shared memory in each worker process, keyed by (ticker, interval)
+worker_prices = {}
+worker_memory = None
+
+
+def load_prices(storage, tickers, intervals):
+    """Loads stored price histories and resamples them to every interval
+
+    Args:
+        storage (NumpyStorage or CsvStorage): Storage backend to load from
+        tickers (list): Stock symbols
+        intervals (list): Bar sizes in minutes
+
+    Returns:
+        dict: (ticker, interval) as keys and float64 price ndarrays as values
+    """
+    prices = {}
+    for ticker in tickers:
+        series = storage.load(ticker)["price"]
+        base = int(np.median(np.diff(series.index.values)) / np.timedelta64(1, "m"))
+        for interval in intervals:
+            if interval < base:
+                logging.warning(
+                    "Skipping %smin for %s, stored data is %smin",
+                    interval,
+                    ticker,
+                    base,
+                )
+                continue
+            if interval > base:
+                series_at_interval = series.resample(f"{interval}min").last().dropna()
+            else:
+                series_at_interval = series
+            prices[(ticker, interval)] = series_at_interval.to_numpy(dtype=np.float64)
+    return prices
+
+
+def share_prices(prices):
+    """Copies every price array into one shared memory block
+
+    Args:
+        prices (dict): (ticker, interval) as keys and price ndarrays as values
+
+    Returns:
+        tuple: (SharedMemory, layout) where layout maps each key to (offset, length)
+    """
+    total = sum(len(array) for array in prices.values())
+    memory = shared_memory.SharedMemory(create=True, size=max(total, 1) * 8)
+    block = np.ndarray((total,), dtype=np.float64, buffer=memory.buf)
+    layout = {}
+    offset = 0
+    for key, array in prices.items():
+        block[offset : offset + len(array)] = array
+        layout[key] = (offset, len(array))
+        offset += len(array)
+    return memory, layout
+
+
+def attach_prices(name, layout):
+    """Process pool initializer, maps the shared price arrays without copying them"""
+    global worker_memory
+    worker_memory = shared_memory.SharedMemory(name=name)
+    for key, (offset, length) in layout.items():
+        worker_prices[key] = np.ndarray(
+            (length,), dtype=np.float64, buffer=worker_memory.buf, offset=offset * 8
+        )
+
+
+def rolling_avg_and_sigma(price, window):
+    """Rolling mean (rounded to 2 decimals) and sample standard deviation from cumulative sums,
+    matching calculate_avg_and_sigma
+
+    Args:
+        price (ndarray): Prices
+        window (int): Window length in bars
+
+    Returns:
+        tuple: (avg_price, sigma) ndarrays, NaN until the window is full
+    """
+    n = len(price)
+    avg_price = np.full(n, np.nan)
+    sigma = np.full(n, np.nan)
+    if window < 2 or n < window:
+        return avg_price, sigma
+    shifted = price - price.mean()
+    sums = np.concatenate(([0.0], np.cumsum(shifted)))
+    squares = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    window_sum = sums[window:] - sums[:-window]
+    window_squares = squares[window:] - squares[:-window]
+    avg_price[window - 1 :] = np.round(window_sum / window + price.mean(), 2)
+    variance = (window_squares - window_sum * window_sum / window) / (window - 1)
+    sigma[window - 1 :] = np.sqrt(np.maximum(variance, 0.0))
+    return avg_price, sigma
+
+
+def evaluate(task):
+    """Backtests every band for one ticker, interval and window
+
+    Args:
+        task (tuple): (ticker, interval, window_hours, bands)
+
+    Returns:
+        list: One dict per band with the parameters, total_pnl, max_drawdown and trades
+    """
+    ticker, interval, window_hours, bands = task
+    price = worker_prices[(ticker, interval)]
+    window = int(window_hours * 60 // interval)
+    avg_price, sigma = rolling_avg_and_sigma(price, window)
+    rows = []
+    for band in bands:
+        signal, _, pnl = signal_position_pnl(price, avg_price, sigma, band=band)
+        equity = np.concatenate(([0.0], np.cumsum(pnl)))
+        rows.append(
+            {
+                "ticker": ticker,
+                "interval": interval,
+                "window_hours": window_hours,
+                "band": band,
+                "total_pnl": round(float(equity[-1]), 2),
+                "max_drawdown": round(
+                    float(np.max(np.maximum.accumulate(equity) - equity)), 2
+                ),
+                "trades": int(np.count_nonzero(signal)),
+            }
+        )
+    return rows
+
+
+def sweep(storage, tickers, windows, bands, intervals, processes=None):
+    """Backtests every combination of window, band and interval for every ticker on a process pool.
+    Histories are loaded once and shared with the workers through shared memory.
+
+    Args:
+        storage (NumpyStorage or CsvStorage): Storage backend to load from
+        tickers (list): Stock symbols
+        windows (list): Rolling window lengths in hours
+        bands (list): Band widths in sigmas
+        intervals (list): Bar sizes in minutes
+        processes (int, optional): Worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        DataFrame: One row per combination, ranked by total_pnl
+    """
+    prices = load_prices(storage, tickers, intervals)
+    memory, layout = share_prices(prices)
+    tasks = [
+        (ticker, interval, window_hours, bands)
+        for (ticker, interval) in prices
+        for window_hours in windows
+    ]
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=attach_prices,
+            initargs=(memory.name, layout),
+        ) as executor:
+            chunksize = max(1, len(tasks) // ((processes or 4) * 8))
+            rows = [
+                row
+                for result in executor.map(evaluate, tasks, chunksize=chunksize)
+                for row in result
+            ]
+    finally:
+        memory.close()
+        memory.unlink()
+    elapsed = time.perf_counter() - start
+    logging.info(
+        "Backtested %d combinations in %.2fs (%.0f per minute)",
+        len(rows),
+        elapsed,
+        len(rows) / elapsed * 60 if elapsed > 0 else float("inf"),
+    )
+
+    results = pd.DataFrame(
+        rows,
+        columns=[
+            "ticker",
+            "interval",
+            "window_hours",
+            "band",
+            "total_pnl",
+            "max_drawdown",
+            "trades",
+        ],
+    )
+    return results.sort_values(
+        ["total_pnl", "max_drawdown"], ascending=[False, True]
+    ).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    storage = get_storage(args.storage)
+    tickers = [ticker.lower() for ticker in args.tickers] or storage.tickers()
+    start = time.perf_counter()
+    results = sweep(
+        storage,
+        tickers=tickers,
+        windows=args.windows,
+        bands=args.bands,
+        intervals=args.intervals,
+        processes=args.processes,
+    )
+    elapsed = time.perf_counter() - start
+    print(results.head(args.top).to_string())
+    print(
+        f"{len(results)} combinations in {elapsed:.2f}s "
+        f"({len(results) / elapsed * 60:.0f} per minute)"
+    )
+    if args.output:
+        results.to_csv(args.output, index=False)
@@ -0,0 +1,64 @@
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Backtest the trading strategy over a grid of parameters"
+)
+
+parser.add_argument(
+    "-t",
+    "--tickers",
+    nargs="*",
+    default=[],
+    help="Tickers to backtest from the stored history. If this option is not specified, every stored ticker is used.",
+)
+parser.add_argument(
+    "-w",
+    "--windows",
+    nargs="+",
+    type=float,
+    default=[float(hours) for hours in range(1, 49)],
+    help="Rolling window lengths in hours. Default is every hour from 1 to 48.",
+)
+parser.add_argument(
+    "-b",
+    "--bands",
+    nargs="+",
+    type=float,
+    default=[band / 4 for band in range(1, 13)],
+    help="Band widths in sigmas, a signal fires when the price leaves S_avg +/- band * sigma. Default is 0.25 to 3 in steps of 0.25.",
+)
+parser.add_argument(
+    "-i",
+    "--intervals",
+    nargs="+",
+    type=int,
+    default=[5, 15, 30, 60],
+    help="Bar sizes in minutes. Stored data is resampled to each one, sizes below the stored interval are skipped. Default is 5 15 30 60.",
+)
+parser.add_argument(
+    "-p",
+    "--processes",
+    type=int,
+    help="Number of worker processes. If this option is not specified, one per CPU is used.",
+)
+parser.add_argument(
+    "-s",
+    "--storage",
+    type=str,
+    default="npy",
+    choices=["npy", "csv"],
+    help="Storage backend to load the history from. Default is npy.",
+)
+parser.add_argument(
+    "-n",
+    "--top",
+    type=int,
+    default=20,
+    help="Number of best combinations printed. Default is 20.",
+)
+parser.add_argument(
+    "-o",
+    "--output",
+    type=str,
+    help="If specified, writes the full ranked table to this csv file.",
+)
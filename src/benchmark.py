@@ -0,0 +1,319 @@
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import requests
+from waitress import create_server
+
+import server
+import utils
+from benchmark_argument_parser import parser
+from cache import ResponseCache
+from fake_upstream import create_app as create_upstream_app, synthetic_prices
+from fetcher import HistoryFetcher, QuotePoller
+from journal import TickJournal
+from server_argument_parser import parser as server_parser
+from storage import get_storage
+from series import TickerSeries
+from store import SnapshotStore
+from stream import Broadcaster
+from utils import (
+    QUERY_DATETIME_FORMAT,
+    calculate_avg_and_sigma,
+    calculate_signal_and_pnl,
+    get_price,
+    get_signal,
+)
+
+# Symbol of the synthetic series, the fake upstream only accepts 1 to 5 letters
+SYMBOL = "bench"
+ANALYTICS_BENCHMARKS = {
+    "calculate_avg_and_sigma",
+    "calculate_signal_and_pnl",
+    "get_price",
+    "get_signal",
+}
+
+
+def timed(function, *arguments):
+    """Runs function once
+
+    Returns:
+        float: Elapsed seconds
+    """
+    start = time.perf_counter()
+    function(*arguments)
+    return time.perf_counter() - start
+
+
+def summarize(benchmark, rows, times):
+    """Summarizes the timings of one benchmark
+
+    Args:
+        benchmark (str): Benchmark name
+        rows (int): Rows in the synthetic price series
+        times (list): Seconds of every timed run
+
+    Returns:
+        dict: benchmark, rows, runs, and min, median, mean, p95 and max in seconds
+    """
+    times = np.array(times)
+    return {
+        "benchmark": benchmark,
+        "rows": rows,
+        "runs": len(times),
+        "min": float(times.min()),
+        "median": float(np.median(times)),
+        "mean": float(times.mean()),
+        "p95": float(np.percentile(times, 95)),
+        "max": float(times.max()),
+    }
+
+
+def synthetic_frame(rows, interval):
+    """Builds a price series ending now, with the same prices the fake upstream serves for SYMBOL
+
+    Args:
+        rows (int): Number of rows
+        interval (int): Interval of time periods in minutes
+
+    Returns:
+        DataFrame: pandas DataFrame with a sorted naive UTC DatetimeIndex and price
+    """
+    index = pd.date_range(
+        end=pd.Timestamp.utcnow().tz_localize(None).floor(f"{interval}min"),
+        periods=rows,
+        freq=f"{interval}min",
+        name="datetime",
+    )
+    return pd.DataFrame({"price": synthetic_prices(SYMBOL, rows)}, index=index)
+
+
+def query_datetimes(series, count):
+    """Picks reproducible random datetimes inside a TickerSeries
+
+    Returns:
+        ndarray: datetime64[m] query datetimes
+    """
+    rng = np.random.default_rng(0)
+    positions = rng.integers(0, len(series), count)
+    return series.index[positions].astype("datetime64[m]")
+
+
+def start_http_server(app):
+    """Serves app through waitress on a free local port from a daemon thread
+
+    Returns:
+        tuple: (waitress server, base url)
+    """
+    http_server = create_server(app, host="127.0.0.1", port=0, threads=4)
+    threading.Thread(target=http_server.run, daemon=True).start()
+    return http_server, f"http://127.0.0.1:{http_server.effective_port}"
+
+
+def bench_analytics(df, interval, benchmarks, repeat, queries):
+    """Benchmarks the analytics functions on a synthetic price series
+
+    Returns:
+        list: Summaries of every benchmark run
+    """
+    rows = len(df)
+    results = []
+    if "calculate_avg_and_sigma" in benchmarks:
+        # both functions add columns in place, so every run gets its own copy
+        copies = [df.copy() for _ in range(repeat + 1)]
+        times = [timed(calculate_avg_and_sigma, copy, interval) for copy in copies]
+        results.append(summarize("calculate_avg_and_sigma", rows, times[1:]))
+
+    df = calculate_avg_and_sigma(df.copy(), interval)
+    if "calculate_signal_and_pnl" in benchmarks:
+        copies = [df.copy() for _ in range(repeat + 1)]
+        times = [timed(calculate_signal_and_pnl, copy) for copy in copies]
+        results.append(summarize("calculate_signal_and_pnl", rows, times[1:]))
+
+    series = TickerSeries.from_frame(calculate_signal_and_pnl(df))
+    datetimes = query_datetimes(series, queries).astype("datetime64[ns]")
+    for name, lookup in (("get_price", get_price), ("get_signal", get_signal)):
+        if name in benchmarks:
+            lookup(series, datetimes[0])
+            times = [timed(lookup, series, query) for query in datetimes]
+            results.append(summarize(name, rows, times))
+    return results
+
+
+def bench_server(rows, interval, benchmarks, repeat, queries):
+    """Benchmarks load_data, update_data and the /price and /signal endpoints.
+    History and quotes come from the fake upstream through the Alpha Vantage and Finnhub code paths.
+
+    Returns:
+        list: Summaries of every benchmark run
+    """
+    results = []
+    upstream, upstream_url = start_http_server(
+        create_upstream_app(calls_per_minute=0, rows=rows)
+    )
+    utils.ALPHA_VANTAGE_URL = f"{upstream_url}/query?"
+    utils.FINNHUB_URL = f"{upstream_url}/api/v1"
+    with tempfile.TemporaryDirectory() as data_dir:
+        server.args = server_parser.parse_args(["--minutes", str(interval)])
+        server.storage = get_storage("npy", data_dir=f"{data_dir}/")
+        server.journal = TickJournal(data_dir=f"{data_dir}/")
+        fetcher = HistoryFetcher(interval, server.storage, calls_per_minute=60)
+        if fetcher.fetch(SYMBOL, retries=0) is not None:
+            raise RuntimeError("Could not download history from the fake upstream")
+
+        loaded = server.load_data()
+        if "load_data" in benchmarks:
+            times = [timed(server.load_data) for _ in range(repeat)]
+            results.append(summarize("load_data", rows, times))
+
+        server.states = {symbol: state for symbol, (_, state) in loaded.items()}
+        server.store = SnapshotStore(
+            {symbol: series for symbol, (series, _) in loaded.items()}
+        )
+        server.response_cache = ResponseCache()
+        server.broadcaster = Broadcaster()
+        server.poller = QuotePoller(workers=1)
+        try:
+            if "update_data" in benchmarks:
+                server.update_data()
+                times = [timed(server.update_data) for _ in range(repeat)]
+                results.append(summarize("update_data", rows, times))
+
+            endpoints = [
+                field for field in server.FIELDS if f"http_{field}" in benchmarks
+            ]
+            if endpoints:
+                app_server, url = start_http_server(server.create_app())
+                datetimes = [
+                    query.astype(datetime).strftime(QUERY_DATETIME_FORMAT)
+                    for query in query_datetimes(
+                        server.store.snapshot().data[SYMBOL], queries
+                    )
+                ]
+                with requests.Session() as session:
+                    session.get(f"{url}/")
+                    for field in endpoints:
+                        times = []
+                        for query in datetimes:
+                            start = time.perf_counter()
+                            r = session.get(f"{url}/{field}/{query}")
+                            times.append(time.perf_counter() - start)
+                            r.raise_for_status()
+                        results.append(summarize(f"http_{field}", rows, times))
+                app_server.close()
+        finally:
+            server.poller.close()
+            server.journal.close()
+    upstream.close()
+    return results
+
+
+def git_commit():
+    """Returns the checked out commit, with -dirty appended when tracked files were modified"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        changes = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if changes else commit
+
+
+def compare(results, baseline, threshold):
+    """Prints the median time ratio of every benchmark against an earlier results file
+
+    Args:
+        results (list): Summaries of this run
+        baseline (dict): Earlier results file contents
+        threshold (float): Ratio above which a benchmark counts as a regression
+
+    Returns:
+        list: Summaries of the benchmarks that regressed
+    """
+    previous = {
+        (result["benchmark"], result["rows"]): result for result in baseline["results"]
+    }
+    print(f"\nCompared with {baseline['commit']}:")
+    regressions = []
+    for result in results:
+        before = previous.get((result["benchmark"], result["rows"]))
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else 1.0
+        regressed = ratio > threshold
+        if regressed:
+            regressions.append(result)
+        print(
+            f"{result['benchmark']:<26}{result['rows']:>9} rows  "
+            f"{ratio:6.2f}x{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    commit = git_commit()
+    results = []
+    for rows in args.sizes:
+        if ANALYTICS_BENCHMARKS.intersection(args.benchmarks):
+            results += bench_analytics(
+                synthetic_frame(rows, args.minutes),
+                args.minutes,
+                args.benchmarks,
+                args.repeat,
+                args.queries,
+            )
+        if set(args.benchmarks) - ANALYTICS_BENCHMARKS:
+            results += bench_server(
+                rows, args.minutes, args.benchmarks, args.repeat, args.queries
+            )
+        for result in results:
+            if result["rows"] == rows:
+                print(
+                    f"{result['benchmark']:<26}{result['rows']:>9} rows  "
+                    f"median {result['median'] * 1000:10.3f}ms  "
+                    f"p95 {result['p95'] * 1000:10.3f}ms"
+                )
+
+    output = args.output or (
+        f"logs/benchmark_{commit}_{datetime.utcnow().strftime('%Y-%m-%d-%H%M%S')}.json"
+    )
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "created": datetime.utcnow().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "platform": platform.platform(),
+                "minutes": args.minutes,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
@@ -0,0 +1,73 @@
+import argparse
+
+BENCHMARKS = [
+    "calculate_avg_and_sigma",
+    "calculate_signal_and_pnl",
+    "get_price",
+    "get_signal",
+    "load_data",
+    "update_data",
+    "http_price",
+    "http_signal",
+]
+
+parser = argparse.ArgumentParser(
+    description="Benchmark the analytics and API hot paths on synthetic price series"
+)
+
+parser.add_argument(
+    "-s",
+    "--sizes",
+    nargs="+",
+    type=int,
+    default=[1000, 10000, 100000, 1000000],
+    help="Rows in each synthetic price series. Default is 1000 10000 100000 1000000.",
+)
+parser.add_argument(
+    "-b",
+    "--benchmarks",
+    nargs="+",
+    default=BENCHMARKS,
+    choices=BENCHMARKS,
+    help="Benchmarks to run. If this option is not specified, every benchmark is run.",
+)
+parser.add_argument(
+    "-r",
+    "--repeat",
+    type=int,
+    default=5,
+    help="Timed runs of every whole-series benchmark, after one warm-up run. Default is 5.",
+)
+parser.add_argument(
+    "-q",
+    "--queries",
+    type=int,
+    default=200,
+    help="Random datetimes queried by the get_price, get_signal and http benchmarks. Default is 200.",
+)
+parser.add_argument(
+    "-m",
+    "--minutes",
+    type=int,
+    default=5,
+    help="Interval of the synthetic price series in minutes. Default is 5.",
+)
+parser.add_argument(
+    "-o",
+    "--output",
+    type=str,
+    help="JSON file the results are written to. Default is logs/benchmark_<commit>_<time>.json",
+)
+parser.add_argument(
+    "-c",
+    "--compare",
+    type=str,
+    help="If specified, compares the results with this earlier JSON results file and exits with status 1 on a regression.",
+)
+parser.add_argument(
+    "-th",
+    "--threshold",
+    type=float,
+    default=1.2,
+    help="Median time ratio against the compared results above which a benchmark counts as a regression. Default is 1.2.",
+)
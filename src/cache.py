@@ -0,0 +1,175 @@
+import gzip
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Bounded LRU cache of API responses with hit and miss counters.
+    Keys are expected to include the data version, and the cache is also cleared
+    explicitly whenever the data changes.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Returns the cached response for key or None, marking it as recently used"""
+        with self.lock:
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self.entries[key]
+
+    def put(self, key, response):
+        """Caches response for key, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every cached response"""
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """Returns the cache counters
+
+        Returns:
+            dict: hits, misses, hit_rate, evictions, invalidations, size and maxsize
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+            }
+
+
+class HistoryCache:
+    """Disk cache of upstream history responses, one gzip compressed file per (symbol, interval).
+    Entries older than `ttl` seconds are stale and downloaded again. When the files take more
+    than `max_bytes`, the least recently used ones are deleted. Last use is kept as the files'
+    access time, so the cache and its eviction order survive restarts.
+    """
+
+    def __init__(self, directory="data/cache/", ttl=3600, max_bytes=100 * 2**20):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def path(self, symbol, interval):
+        return f"{self.directory}{symbol}_{interval}min.csv.gz"
+
+    def fresh(self, symbol, interval):
+        """Returns whether a response younger than ttl is cached for (symbol, interval)"""
+        if self.ttl <= 0:
+            return False
+        try:
+            return (
+                time.time() - os.path.getmtime(self.path(symbol, interval)) < self.ttl
+            )
+        except FileNotFoundError:
+            return False
+
+    def get(self, symbol, interval):
+        """Returns the cached response for (symbol, interval) if it is fresh, marking it as recently used
+
+        Returns:
+            bytes or None: Response content
+        """
+        path = self.path(symbol, interval)
+        with self.lock:
+            if not self.fresh(symbol, interval):
+                self.misses += 1
+                return None
+            try:
+                with open(path, "rb") as file:
+                    content = gzip.decompress(file.read())
+                os.utime(path, (time.time(), os.path.getmtime(path)))
+            except (OSError, EOFError):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return content
+
+    def put(self, symbol, interval, content):
+        """Caches a response for (symbol, interval), evicting the least recently used ones when full
+
+        Args:
+            symbol (str): Stock symbol
+            interval (int): Interval of time periods
+            content (bytes): Response content
+        """
+        if self.ttl <= 0:
+            return
+        path = self.path(symbol, interval)
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{path}.tmp", "wb") as file:
+                file.write(gzip.compress(content))
+            os.replace(f"{path}.tmp", path)
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".csv.gz"):
+                stat = os.stat(f"{self.directory}{name}")
+                entries.append((stat.st_atime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(f"{self.directory}{name}")
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Returns the cache counters
+
+        Returns:
+            dict: hits, misses, hit_rate, evictions, entries and bytes
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            sizes = []
+            if os.path.isdir(self.directory):
+                sizes = [
+                    os.path.getsize(f"{self.directory}{name}")
+                    for name in os.listdir(self.directory)
+                    if name.endswith(".csv.gz")
+                ]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "entries": len(sizes),
+                "bytes": sum(sizes),
+            }
@@ -1,10 +1,13 @@
+import json
 import logging
 import re
+import sys
 from datetime import datetime
 
 from client_argument_parser import parser
-import requests
+from load_generator import LoadGenerator
 from mail import send_email
+from trading_client import TradingClient
 
 
 logging.basicConfig(
@@ -59,6 +62,26 @@ def is_valid_datetime(datetime_input):
         return False
 
 
+def are_valid_queries(datetime_inputs):
+    """Checks whether every datetime is now or in correct format. YYYY-MM-DD-HH:MM
+
+    Args:
+        datetime_inputs (list): datetimes in str
+
+    Returns:
+        bool: Bool to indicate whether all datetimes are valid or not
+    """
+    return all(
+        value.lower() == "now" or is_valid_datetime(value) for value in datetime_inputs
+    )
+
+
+def print_response(response):
+    """Prints a server response as JSON and returns it"""
+    print(json.dumps(response))
+    return response
+
+
 def get_price(datetime_input):
     """Requests price from server for datetime provided
 
@@ -68,13 +91,7 @@ def get_price(datetime_input):
     Returns:
         dict or str: Return dict with symbols as keys and prices as values. Or 'Server has no data'
     """
-    url = f"{base_url}/price/{datetime_input}"
-    r = requests.get(url=url, timeout=15)
-    print(r.text)
-    try:
-        return r.json()
-    except:
-        return r.text
+    return print_response(client.get_price(datetime_input))
 
 
 def get_signal(datetime_input):
@@ -86,13 +103,111 @@ def get_signal(datetime_input):
     Returns:
         dict or str: Return dict with symbols as keys and signal as values. Or 'Server has no data'
     """
-    url = f"{base_url}/signal/{datetime_input}"
-    r = requests.get(url=url, timeout=15)
-    print(r.text)
-    try:
-        return r.json()
-    except:
-        return r.text
+    return print_response(client.get_signal(datetime_input))
+
+
+def get_range(field, start, end, tickers=None):
+    """Requests all prices or signals between start and end from server in one request
+
+    Args:
+        field (str): price or signal
+        start (str): Start datetime in string
+        end (str): End datetime in string
+        tickers (list, optional): Tickers to query. Defaults to every ticker on the server.
+
+    Returns:
+        dict or str: Return dict with symbols as keys and columnar dicts of datetime and field as values. Or 'Server has no data'
+    """
+    return print_response(client.get_range(field, start, end, tickers))
+
+
+def get_batch(datetimes, tickers=None):
+    """Requests price and signal as of every datetime provided from server in one request
+
+    Args:
+        datetimes (list): Datetimes in string
+        tickers (list, optional): Tickers to query. Defaults to every ticker on the server.
+
+    Returns:
+        dict or str: Return dict with symbols as keys and dicts of price and signal lists as values
+    """
+    return print_response(client.get_batch(datetimes, tickers))
+
+
+def screen(datetime_input, signal=1):
+    """Requests every ticker whose signal equals signal at datetime provided from server
+
+    Args:
+        datetime_input (str): Datetime in string
+        signal (int, optional): -1, 0 or 1. Defaults to 1.
+
+    Returns:
+        dict or str: Return dict with the matching symbols as keys and signal as values
+    """
+    return print_response(client.screen(datetime_input, signal))
+
+
+def follow(tickers=None):
+    """Streams new prices and signals from server as they are computed, until interrupted
+
+    Args:
+        tickers (list, optional): Tickers to follow. Defaults to every ticker on the server.
+    """
+    for event in client.follow(tickers):
+        print(json.dumps(event), flush=True)
+
+
+def run_script(path, concurrency=1):
+    """Runs client commands read from a file, or from stdin when path is -, over one connection pool.
+    Prints one JSON line per command with the command and its result.
+
+    Args:
+        path (str): Script file path or -
+        concurrency (int, optional): Queries sent at the same time. Defaults to 1.
+
+    Returns:
+        list: (command, result) tuples
+    """
+    if path == "-":
+        results = client.run_script(sys.stdin, concurrency=concurrency)
+    else:
+        with open(path) as file:
+            results = client.run_script(file, concurrency=concurrency)
+    for command, result in results:
+        print(json.dumps({"command": command, "result": result}))
+    return results
+
+
+def bench(
+    mix, tickers=None, concurrency=1, rate=0, duration=30, count=None, output=None
+):
+    """Load tests the server and prints the report as JSON
+
+    Args:
+        mix (str or dict): Request weights such as price=45,signal=45,add_ticker=5,del_ticker=5
+        tickers (list, optional): Tickers added and deleted. Defaults to BNCH.
+        concurrency (int, optional): Requests in flight at the same time. Defaults to 1.
+        rate (float, optional): Requests per second, 0 sends as fast as the server answers. Defaults to 0.
+        duration (float, optional): Seconds to run for. Defaults to 30.
+        count (int, optional): Stops after this many requests instead. Defaults to None.
+        output (str, optional): File the report is also written to. Defaults to None.
+
+    Returns:
+        dict: Report with throughput, latency percentiles and error rates overall and per operation
+    """
+    generator = LoadGenerator(
+        client,
+        mix,
+        tickers=[ticker.lower() for ticker in tickers] if tickers else None,
+        concurrency=concurrency,
+        rate=rate,
+    )
+    report = generator.run(duration=duration, count=count)
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+    print(json.dumps(report, indent=2))
+    return report
 
 
 def del_ticker(ticker):
@@ -102,39 +217,31 @@ def del_ticker(ticker):
         ticker (str): Stock symbol
 
     Returns:
-        str: Returns 0=success, 1=server error, 2=ticker not found
+        int: Returns 0=success, 1=server error, 2=ticker not found
     """
-    url = f"{base_url}/del_ticker/{ticker}"
-    r = requests.delete(url=url, timeout=15)
-    print(r.text)
-    return r.text
+    return print_response(client.del_ticker(ticker))
 
 
-def add_ticker(ticker):
+def add_ticker(ticker, refresh=False):
     """Requests to add ticker to server
 
     Args:
         ticker (str): Stock symbol
+        refresh (bool, optional): Bypass the server's history cache. Defaults to False.
 
     Returns:
-        str: Returns 0=success, 1=server error, 2=invalid ticker
+        int: Returns 0=success, 1=server error, 2=invalid ticker
     """
-    url = f"{base_url}/add_ticker/{ticker}"
-    r = requests.post(url=url, timeout=15)
-    print(r.text)
-    return r.text
+    return print_response(client.add_ticker(ticker, refresh))
 
 
 def reset():
     """Requests to delete all data from server
 
     Returns:
-        str: return code: 0=success, 1=failure
+        int: return code: 0=success, 1=failure
     """
-    url = f"{base_url}/reset"
-    r = requests.put(url=url, timeout=15)
-    print(r.text)
-    return r.text
+    return print_response(client.reset())
 
 
 def main():
@@ -142,24 +249,45 @@ def main():
         price_response = get_price(args.price)
     if args.signal and (args.signal.lower() == "now" or is_valid_datetime(args.signal)):
         signal_response = get_signal(args.signal)
+    if args.price_range and are_valid_queries(args.price_range):
+        price_range_response = get_range("price", *args.price_range, args.tickers)
+    if args.signal_range and are_valid_queries(args.signal_range):
+        signal_range_response = get_range("signal", *args.signal_range, args.tickers)
+    if args.batch and are_valid_queries(args.batch):
+        batch_response = get_batch(args.batch, args.tickers)
+    if args.screen and (args.screen.lower() == "now" or is_valid_datetime(args.screen)):
+        screen_response = screen(args.screen, args.screen_signal)
     if args.del_ticker:
         del_ticker_response = del_ticker(args.del_ticker)
     if args.add_ticker:
-        add_ticker_response = add_ticker(args.add_ticker)
+        add_ticker_response = add_ticker(args.add_ticker, args.refresh)
     if args.reset:
         reset_response = reset()
+    if args.script:
+        script_response = run_script(args.script, concurrency=args.concurrency)
+    if args.bench:
+        bench_response = bench(
+            args.bench_mix,
+            tickers=args.tickers,
+            concurrency=args.concurrency,
+            rate=args.bench_rate,
+            duration=args.bench_duration,
+            count=args.bench_requests,
+            output=args.bench_output,
+        )
+    if args.follow:
+        follow(args.tickers)
 
 
 if __name__ == "__main__":
     args = parser.parse_args()
     logging.info(args)
     try:
-        base_url = get_base_url()
+        client = TradingClient(get_base_url(), pool_size=max(args.concurrency, 1))
         if args.server_address and is_valid_server_address(args.server_address):
             ip_address, port = args.server_address.split(":")
-            base_url = get_base_url(ip_address=ip_address, port=port)
-            r = requests.get(url=base_url + "/", timeout=15)
-            print(r.text)
+            client.base_url = get_base_url(ip_address=ip_address, port=port)
+            print_response(client.home())
         else:
             print("Invalid server address")
         main()
@@ -1,7 +1,9 @@
 import argparse
 
+from load_generator import DEFAULT_MIX, parse_mix
+
 parser = argparse.ArgumentParser(description="Process client command line arguments")
- 
+
 parser.add_argument(
     "-p",
     "--price",
@@ -33,6 +35,11 @@ parser.add_argument(
     type=str,
     help="Instruct the server to add a new ticker to the server database. Server must download historical data for said ticker, and start appending on the next pull. Returns 0=success, 1=server error, 2=invalid ticker",
 )
+parser.add_argument(
+    "--refresh",
+    action="store_true",
+    help="With --add_ticker, makes the server download the ticker's history from Alpha Vantage again even if it has a fresh copy cached.",
+)
 parser.add_argument(
     "-r",
     "--reset",
@@ -40,4 +47,109 @@ parser.add_argument(
     const=True,
     help="If specified, instructs the server to reset all the data. Server must re-download data and tell client that it was successful. Client exits with return code: 0=success, 1=failure",
 )
- 
+parser.add_argument(
+    "-pr",
+    "--price_range",
+    "--price-range",
+    nargs=2,
+    metavar=("FROM", "TO"),
+    help="If specified, queries server for all prices between the two times specified (YYYY-MM-DD-HH:MM or now) in one request. The times queried are expected to be in UTC Time.",
+)
+parser.add_argument(
+    "-sr",
+    "--signal_range",
+    "--signal-range",
+    nargs=2,
+    metavar=("FROM", "TO"),
+    help="If specified, queries server for all trading signals between the two times specified (YYYY-MM-DD-HH:MM or now) in one request. The times queried are expected to be in UTC Time.",
+)
+parser.add_argument(
+    "-b",
+    "--batch",
+    nargs="+",
+    metavar="DATETIME",
+    help="If specified, queries server for price and signal as of every time specified (YYYY-MM-DD-HH:MM or now) in one request. The times queried are expected to be in UTC Time.",
+)
+parser.add_argument(
+    "-sn",
+    "--screen",
+    type=str,
+    metavar="DATETIME",
+    help="If specified, queries server for every ticker whose trading signal equals --screen_signal as of the time specified (YYYY-MM-DD-HH:MM or now). The time queried is expected to be in UTC Time.",
+)
+parser.add_argument(
+    "-ss",
+    "--screen_signal",
+    type=int,
+    default=1,
+    choices=[-1, 0, 1],
+    help="Signal matched by --screen. Default is 1.",
+)
+parser.add_argument(
+    "-t",
+    "--tickers",
+    nargs="+",
+    help="Limits --price_range, --signal_range, --batch and --follow queries to the tickers specified. Defaults to every ticker on the server. With --bench, tickers added and deleted, default BNCH.",
+)
+parser.add_argument(
+    "-f",
+    "--follow",
+    action="store_const",
+    const=True,
+    help="If specified, keeps the connection open and prints every new price and signal as soon as the server computes it. Use --tickers to follow only some tickers. Runs until interrupted.",
+)
+parser.add_argument(
+    "-sc",
+    "--script",
+    type=str,
+    metavar="FILE",
+    help="If specified, runs one command per line from FILE (or stdin when FILE is -) over one pooled connection and prints one JSON result per line. Commands: price DATETIME, signal DATETIME, price_range FROM TO [TICKER ...], signal_range FROM TO [TICKER ...], batch DATETIME [DATETIME ...], screen DATETIME [SIGNAL], add_ticker TICKER, del_ticker TICKER, reset",
+)
+parser.add_argument(
+    "-c",
+    "--concurrency",
+    type=int,
+    default=1,
+    help="With --script, sends up to this many independent queries at the same time. add_ticker, del_ticker and reset always run on their own. With --bench, number of requests in flight at the same time. Default is 1.",
+)
+parser.add_argument(
+    "-bn",
+    "--bench",
+    action="store_const",
+    const=True,
+    help="If specified, load tests the server with a mix of /price, /signal, /add_ticker and /del_ticker requests sent from --concurrency threads over pooled connections, then prints throughput, p50/p95/p99/max latency and error rates as JSON. add_ticker and del_ticker act on --tickers, default BNCH, so use a server fed by src/fake_upstream.py and keep the tickers it serves out of --tickers.",
+)
+parser.add_argument(
+    "-bm",
+    "--bench_mix",
+    type=parse_mix,
+    default=DEFAULT_MIX,
+    help=f"Weights of the requests sent by --bench, as operation=weight pairs separated by commas. Operations: price, signal, add_ticker, del_ticker. Default is {DEFAULT_MIX}.",
+)
+parser.add_argument(
+    "-bd",
+    "--bench_duration",
+    type=float,
+    default=30,
+    help="Seconds --bench runs for. Default is 30.",
+)
+parser.add_argument(
+    "-br",
+    "--bench_requests",
+    type=int,
+    help="If specified, --bench stops after this many requests instead of after --bench_duration.",
+)
+parser.add_argument(
+    "-bt",
+    "--bench_rate",
+    type=float,
+    default=0,
+    help="Requests per second sent by --bench whether earlier ones are answered or not, with latency counted from when each request was due. Default is 0, every thread sends its next request as soon as the previous one is answered.",
+)
+parser.add_argument(
+    "-bo",
+    "--bench_output",
+    type=str,
+    metavar="FILE",
+    help="If specified, --bench also writes its JSON report to FILE, e.g. to compare runs.",
+)
@@ -0,0 +1,107 @@
+import re
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import Flask, Response, jsonify, request
+from waitress import serve
+
+from fake_upstream_argument_parser import parser
+from fetcher import RateLimiter
+from utils import NEW_YORK
+
+RATE_LIMIT_MESSAGE = (
+    "Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute "
+    "and 500 calls per day."
+)
+INVALID_MESSAGE = "Invalid API call. Please retry or visit the documentation for TIME_SERIES_INTRADAY."
+
+
+def is_valid_symbol(symbol):
+    """Symbols of 1 to 5 letters are treated as valid tickers"""
+    return re.fullmatch("[A-Za-z]{1,5}", symbol or "") is not None
+
+
+def synthetic_prices(symbol, rows):
+    """Deterministic random walk of prices for a symbol
+
+    Args:
+        symbol (str): Stock symbol
+        rows (int): Number of prices
+
+    Returns:
+        ndarray: Prices rounded to 4 decimals like Alpha Vantage
+    """
+    rng = np.random.default_rng(zlib.crc32(symbol.upper().encode()))
+    start = rng.uniform(20, 500)
+    returns = rng.normal(0, 0.002, rows)
+    return np.round(start * np.exp(np.cumsum(returns)), 4)
+
+
+def create_app(calls_per_minute=5, rows=5000, latency=0.0):
+    """Creates a Flask app answering Alpha Vantage TIME_SERIES_INTRADAY csv requests
+    and Finnhub quote requests with synthetic data
+
+    Args:
+        calls_per_minute (int, optional): Alpha Vantage rate limit, 0 disables it. Defaults to 5.
+        rows (int, optional): Rows per historical data response. Defaults to 5000.
+        latency (float, optional): Seconds each response is delayed by. Defaults to 0.
+
+    Returns:
+        Flask: Flask app
+    """
+    app = Flask(__name__)
+    # The finnhub client requests {API_URL}//quote
+    app.url_map.merge_slashes = False
+    limiter = RateLimiter(calls_per_minute) if calls_per_minute else None
+    stats = {"alpha_vantage_calls": 0, "throttled_calls": 0, "finnhub_calls": 0}
+
+    @app.route("/query")
+    def intraday():
+        time.sleep(latency)
+        stats["alpha_vantage_calls"] += 1
+        if limiter and not limiter.try_acquire():
+            stats["throttled_calls"] += 1
+            return jsonify({"Note": RATE_LIMIT_MESSAGE})
+        symbol = request.args.get("symbol")
+        if not is_valid_symbol(symbol):
+            return jsonify({"Error Message": INVALID_MESSAGE})
+
+        interval = int(request.args.get("interval", "5min").replace("min", ""))
+        count = rows if request.args.get("outputsize") == "full" else min(rows, 100)
+        now = datetime.now(NEW_YORK).replace(tzinfo=None, second=0, microsecond=0)
+        last = now - timedelta(minutes=now.minute % interval)
+        prices = synthetic_prices(symbol, rows)[-count:]
+        lines = ["timestamp,open,high,low,close,volume"]
+        for i, price in enumerate(prices[::-1]):
+            timestamp = last - timedelta(minutes=interval * i)
+            lines.append(
+                f"{timestamp:%Y-%m-%d %H:%M:%S},{price},{price},{price},{price},1000"
+            )
+        return Response("\n".join(lines), mimetype="application/x-download")
+
+    @app.route("/api/v1/quote")
+    @app.route("/api/v1//quote")
+    def quote():
+        time.sleep(latency)
+        stats["finnhub_calls"] += 1
+        symbol = request.args.get("symbol", "")
+        price = synthetic_prices(symbol, rows)[-1]
+        price = round(float(price * (1 + np.random.normal(0, 0.002))), 2)
+        return jsonify({"c": price, "t": int(time.time())})
+
+    @app.route("/stats")
+    def upstream_stats():
+        return jsonify(stats)
+
+    return app
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    print(f"Fake Alpha Vantage and Finnhub running on 127.0.0.1:{args.port}")
+    serve(
+        create_app(args.calls_per_minute, args.rows, args.latency),
+        listen=f"127.0.0.1:{args.port}",
+    )
@@ -0,0 +1,34 @@
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Run a local stand-in for the Alpha Vantage and Finnhub APIs"
+)
+
+parser.add_argument(
+    "-p",
+    "--port",
+    type=int,
+    default=8090,
+    help="It specifies the network port for the stand-in. Default is 8090.",
+)
+parser.add_argument(
+    "-c",
+    "--calls_per_minute",
+    type=int,
+    default=5,
+    help="Alpha Vantage calls allowed per minute before the rate limit message is returned. 0 disables the limit. Default is 5.",
+)
+parser.add_argument(
+    "-r",
+    "--rows",
+    type=int,
+    default=5000,
+    help="Number of intraday rows returned for each historical data request. Default is 5000.",
+)
+parser.add_argument(
+    "-l",
+    "--latency",
+    type=float,
+    default=0.0,
+    help="Seconds each response is delayed by, to mimic network latency. Default is 0.",
+)
@@ -0,0 +1,398 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+import numpy as np
+import pandas as pd
+import requests
+
+from metrics import UPSTREAM_ERRORS
+from utils import (
+    add_ticker,
+    create_finnhub_client,
+    get_alpha_vantage_historical_data,
+    get_history,
+    get_realtime_quote,
+    save_history,
+    set_utc_index,
+)
+
+logging = logging.getLogger()
+
+
+class RateLimiter:
+    """Allows at most `capacity` calls in any `period` seconds, the way Alpha Vantage counts them.
+    The first `capacity` calls go out immediately, every later one waits until the call
+    `capacity` calls before it is `period` seconds old.
+    """
+
+    def __init__(self, capacity, period=60):
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self.capacity = capacity
+        self.period = period
+        # times of the last `capacity` calls, oldest first
+        self.calls = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+
+    def _wait(self):
+        # seconds until the next call is allowed
+        if len(self.calls) < self.capacity:
+            return 0.0
+        return self.calls[0] + self.period - time.monotonic()
+
+    def acquire(self):
+        """Blocks until a call is allowed and counts it
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                wait = self._wait()
+                if wait <= 0:
+                    self.calls.append(time.monotonic())
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def try_acquire(self):
+        """Counts a call if one is allowed now, without blocking
+
+        Returns:
+            bool: True if the call is allowed
+        """
+        with self.lock:
+            if self._wait() <= 0:
+                self.calls.append(time.monotonic())
+                return True
+            return False
+
+    def drain(self):
+        """Counts the whole quota as used now, used when the upstream reports that the limit was hit anyway"""
+        with self.lock:
+            self.calls.extend([time.monotonic()] * self.capacity)
+
+
+class HistoryFetcher:
+    """Downloads historical data for tickers through add_ticker without exceeding the Alpha Vantage quota.
+    Calls are paced by a RateLimiter and run on a bounded worker pool, tickers beyond the pool size
+    wait in the pool's queue. Throttled or failed calls are retried with exponential backoff.
+    With `locks`, a function returning a ticker's lock, the download is saved while holding it.
+    """
+
+    def __init__(
+        self,
+        interval,
+        storage,
+        calls_per_minute=5,
+        workers=5,
+        retries=3,
+        backoff=15,
+        cache=None,
+        locks=None,
+    ):
+        self.interval = interval
+        self.storage = storage
+        self.cache = cache
+        self.locks = locks
+        self.limiter = RateLimiter(capacity=calls_per_minute, period=60)
+        self.workers = max(1, min(workers, calls_per_minute))
+        self.retries = retries
+        self.backoff = backoff
+
+    def fetch(self, ticker, retries=None, refresh=False):
+        """Downloads and saves historical data for one ticker, retrying throttled calls.
+        A fresh response in the fetcher's HistoryCache is used without taking any quota.
+
+        Args:
+            ticker (str): Stock symbol
+            retries (int, optional): Number of retries. Defaults to the fetcher's retries.
+            refresh (bool, optional): Downloads even if a fresh response is cached. Defaults to False.
+
+        Returns:
+            str or None: Return "Invalid ticker" or "Server error". Returns None if everything is ok.
+        """
+
+        content = self._cached(ticker, refresh)
+
+        def save():
+            # the quota is waited for before taking the ticker's lock
+            with self.locks(ticker) if self.locks else nullcontext():
+                return add_ticker(
+                    ticker, self.interval, self.storage, self.cache, content
+                )
+
+        return self._call(ticker, save, retries, quota=content is None)
+
+    def download(self, ticker, outputsize="compact", retries=None, refresh=False):
+        """Downloads recent history for one ticker without saving it, retrying throttled calls.
+        A fresh full response in the fetcher's HistoryCache is used without taking any quota.
+
+        Args:
+            ticker (str): Stock symbol
+            outputsize (str, optional): compact for the last rows only or full. Defaults to compact.
+            retries (int, optional): Number of retries. Defaults to the fetcher's retries.
+            refresh (bool, optional): Downloads a full history even if it is cached. Defaults to False.
+
+        Returns:
+            DataFrame or str: pandas DataFrame with a sorted UTC DatetimeIndex and price, or
+            "Invalid ticker" or "Server error"
+        """
+        full = outputsize == "full"
+        # compact responses are not cached, they would stand in for a full history
+        content = self._cached(ticker, refresh) if full else None
+
+        def get():
+            if full:
+                df = get_history(ticker, self.interval, self.cache, content)
+            else:
+                df = get_alpha_vantage_historical_data(
+                    ticker, self.interval, outputsize=outputsize
+                )
+            if type(df) == int:
+                return "Invalid ticker" if df == 2 else "Server error"
+            return set_utc_index(df)
+
+        return self._call(ticker, get, retries, quota=content is None)
+
+    def _cached(self, ticker, refresh=False):
+        # read once, an entry expiring after this read must not turn into an unpaced download
+        if refresh or self.cache is None:
+            return None
+        return self.cache.get(ticker, self.interval)
+
+    def _call(self, ticker, call, retries=None, quota=True):
+        """Runs an Alpha Vantage call within the quota, retrying while it returns "Server error"
+
+        Args:
+            ticker (str): Stock symbol
+            call (function): Makes the call and returns its result
+            retries (int, optional): Number of retries. Defaults to the fetcher's retries.
+            quota (bool, optional): Takes quota for the call. False when it is answered from
+                the cache. Defaults to True.
+
+        Returns:
+            The call's last result, or "Server error" if it raised
+        """
+        retries = self.retries if retries is None else retries
+        status = "Server error"
+        for attempt in range(retries + 1):
+            try:
+                waited = self.limiter.acquire() if quota else 0
+                if waited:
+                    logging.info(
+                        "Waited %.1fs for Alpha Vantage quota for %s", waited, ticker
+                    )
+                status = call()
+            except Exception as e:
+                logging.error("Error while downloading %s: %s", ticker, e)
+                status = "Server error"
+            else:
+                if isinstance(status, str) and status == "Server error":
+                    # Upstream reports the quota is used up, hold every worker until it refills
+                    self.limiter.drain()
+            if not (isinstance(status, str) and status == "Server error"):
+                return status
+
+            if attempt < retries:
+                delay = self.backoff * 2**attempt
+                logging.warning(
+                    "Alpha Vantage call for %s throttled or failed, retrying in %ss",
+                    ticker,
+                    delay,
+                )
+                time.sleep(delay)
+        return status
+
+    def fetch_all(self, tickers, callback=None):
+        """Downloads historical data for every ticker concurrently within the quota
+
+        Args:
+            tickers (list): Stock symbols
+            callback (function, optional): Called with (ticker, status) on the download's worker
+                thread as soon as each ticker is done
+
+        Returns:
+            dict: Tickers as keys and fetch statuses as values
+        """
+
+        def fetch(ticker):
+            status = self.fetch(ticker)
+            if callback:
+                callback(ticker, status)
+            return status
+
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="history"
+        ) as executor:
+            statuses = dict(zip(tickers, executor.map(fetch, tickers)))
+        for ticker, status in statuses.items():
+            if status:
+                logging.error("Could not add %s at startup: %s", ticker, status)
+        return statuses
+
+
+class RouterHistory:
+    """Downloads history through the router that started this shard, whose HistoryFetcher paces
+    the calls of every shard within one Alpha Vantage quota. download() and fetch() answer like
+    HistoryFetcher's, fetch() saves the history to the shard's own storage.
+    The router only starts serving once every shard is up, so refused connections are retried
+    for up to `wait` seconds.
+    """
+
+    def __init__(self, url, interval, storage, locks=None, timeout=600, wait=600):
+        self.url = url.rstrip("/")
+        self.interval = interval
+        self.storage = storage
+        self.locks = locks
+        self.timeout = timeout
+        self.wait = wait
+        self.session = requests.Session()
+
+    def fetch(self, ticker, retries=None, refresh=False):
+        """Downloads and saves the full history of one ticker
+
+        Args:
+            ticker (str): Stock symbol
+            retries (int, optional): Number of retries. Defaults to the router's retries.
+            refresh (bool, optional): Downloads even if the router has it cached. Defaults to False.
+
+        Returns:
+            str or None: Return "Invalid ticker" or "Server error". Returns None if everything is ok.
+        """
+        df = self.download(ticker, "full", retries, refresh)
+        if isinstance(df, str):
+            return df
+        with self.locks(ticker) if self.locks else nullcontext():
+            save_history(ticker, df, self.interval, self.storage)
+
+    def download(self, ticker, outputsize="compact", retries=None, refresh=False):
+        """Downloads recent history for one ticker without saving it
+
+        Args:
+            ticker (str): Stock symbol
+            outputsize (str, optional): compact for the last rows only or full. Defaults to compact.
+            retries (int, optional): Number of retries. Defaults to the router's retries.
+            refresh (bool, optional): Downloads a full history even if the router has it cached.
+                Defaults to False.
+
+        Returns:
+            DataFrame or str: pandas DataFrame with a sorted UTC DatetimeIndex and price, or
+            "Invalid ticker" or "Server error"
+        """
+        params = {"outputsize": outputsize}
+        if retries is not None:
+            params["retries"] = retries
+        if refresh:
+            params["refresh"] = 1
+        deadline = time.monotonic() + self.wait
+        while True:
+            try:
+                r = self.session.get(
+                    f"{self.url}/history/{ticker}",
+                    params=params,
+                    timeout=(5, self.timeout),
+                )
+                r.raise_for_status()
+                break
+            except requests.ConnectionError as e:
+                if time.monotonic() >= deadline:
+                    logging.error("Router unreachable for %s: %s", ticker, e)
+                    return "Server error"
+                time.sleep(5)
+            except requests.RequestException as e:
+                logging.error(
+                    "Error while downloading %s through the router: %s", ticker, e
+                )
+                return "Server error"
+        body = r.json()
+        if isinstance(body, str):
+            return body
+        return pd.DataFrame(
+            {"price": np.array(body["price"], dtype=np.float64)},
+            index=pd.DatetimeIndex(
+                np.array(body["datetime"], dtype=np.int64).view("datetime64[ns]"),
+                name="datetime",
+            ),
+        )
+
+
+class QuotePoller:
+    """Fetches realtime quotes for many tickers concurrently over one pooled Finnhub session.
+    Request start times are spread evenly over the first `stagger` seconds of a tick instead of
+    bursting at the interval boundary. Each request has its own timeout and the whole tick has a
+    deadline counted from its start, quotes that miss it are dropped.
+    """
+
+    def __init__(self, workers=8, timeout=5, deadline=30, stagger=0):
+        self.client = create_finnhub_client(timeout=timeout, pool_size=workers)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="quote"
+        )
+        self.deadline = deadline
+        self.stagger = stagger
+        # seconds each ticker's quote took in the last poll
+        self.latencies = {}
+
+    def _fetch(self, ticker, not_before):
+        delay = not_before - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        start = time.perf_counter()
+        quote = get_realtime_quote(ticker, client=self.client)
+        return quote, time.perf_counter() - start
+
+    def poll(self, tickers):
+        """Gets realtime quotes for every ticker
+
+        Args:
+            tickers (list): Stock symbols
+
+        Returns:
+            dict: Tickers as keys and quote dicts as values, for tickers that answered within the deadline
+        """
+        start = time.perf_counter()
+        step = self.stagger / len(tickers) if tickers else 0
+        futures = {
+            self.executor.submit(self._fetch, ticker, start + i * step): ticker
+            for i, ticker in enumerate(tickers)
+        }
+        done, not_done = wait(futures, timeout=self.deadline)
+
+        quotes = {}
+        latencies = {}
+        for future in not_done:
+            future.cancel()
+            UPSTREAM_ERRORS.inc(upstream="finnhub", reason="deadline")
+            logging.warning(
+                "Quote for %s missed the %ss tick deadline",
+                futures[future],
+                self.deadline,
+            )
+        for future in done:
+            ticker = futures[future]
+            try:
+                quotes[ticker], latency = future.result()
+                latencies[ticker] = latency
+                logging.info("Got realtime quote for %s in %.3fs", ticker, latency)
+            except Exception as e:
+                logging.error(
+                    "Error while getting realtime quote for %s: %s", ticker, e
+                )
+        self.latencies = latencies
+        logging.info(
+            "Polled %d of %d tickers in %.3fs",
+            len(quotes),
+            len(tickers),
+            time.perf_counter() - start,
+        )
+        return quotes
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.client.close()
@@ -0,0 +1,154 @@
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+logging = logging.getLogger()
+
+# One fixed-size little-endian record per accepted quote: UTC nanoseconds and price
+RECORD = np.dtype([("datetime", "<i8"), ("price", "<f8")])
+
+
+class TickJournal:
+    """Append-only binary journal of the realtime quotes accepted for every ticker.
+
+    Quotes are appended to data/journal/{ticker}.journal as they arrive and made durable in
+    batches by sync(), once per update tick. On startup the journal is replayed on top of the
+    stored history, and compaction folds it into the storage backend and truncates it.
+    """
+
+    def __init__(self, data_dir="data/"):
+        self.directory = f"{data_dir}journal/"
+        self.files = {}
+        self.dirty = set()
+        self.lock = threading.Lock()
+
+    def path(self, ticker):
+        return f"{self.directory}{ticker}.journal"
+
+    def _file(self, ticker):
+        if ticker not in self.files:
+            os.makedirs(self.directory, exist_ok=True)
+            self.files[ticker] = open(self.path(ticker), "ab")
+        return self.files[ticker]
+
+    def append(self, ticker, quote_datetime, price):
+        """Appends one quote, it is durable once sync() returns
+
+        Args:
+            ticker (str): Stock symbol
+            quote_datetime (numpy.datetime64): UTC datetime of the quote
+            price (float): Quote price
+        """
+        record = np.array(
+            [(np.datetime64(quote_datetime, "ns").astype(np.int64), price)],
+            dtype=RECORD,
+        )
+        with self.lock:
+            self._file(ticker).write(record.tobytes())
+            self.dirty.add(ticker)
+
+    def sync(self):
+        """Flushes and fsyncs every journal appended to since the last sync"""
+        with self.lock:
+            for ticker in self.dirty:
+                file = self.files[ticker]
+                file.flush()
+                os.fsync(file.fileno())
+            self.dirty.clear()
+
+    def count(self, ticker):
+        """Returns the number of quotes journaled for ticker"""
+        with self.lock:
+            if ticker in self.files:
+                self.files[ticker].flush()
+            try:
+                return os.path.getsize(self.path(ticker)) // RECORD.itemsize
+            except FileNotFoundError:
+                return 0
+
+    def read(self, ticker):
+        """Reads every complete record journaled for ticker. A record cut short by a crash is ignored.
+
+        Args:
+            ticker (str): Stock symbol
+
+        Returns:
+            df (DataFrame): pandas DataFrame with a naive UTC DatetimeIndex and price, in journal order
+        """
+        with self.lock:
+            if ticker in self.files:
+                self.files[ticker].flush()
+            try:
+                raw = np.fromfile(self.path(ticker), dtype=np.uint8)
+            except FileNotFoundError:
+                raw = np.empty(0, dtype=np.uint8)
+        records = raw[: len(raw) - len(raw) % RECORD.itemsize].view(RECORD)
+        return pd.DataFrame(
+            {"price": records["price"]},
+            index=pd.DatetimeIndex(
+                records["datetime"].astype("datetime64[ns]"), name="datetime"
+            ),
+        )
+
+    def replay(self, ticker, df):
+        """Appends the journaled quotes newer than the last stored row to a ticker's history
+
+        Args:
+            ticker (str): Stock symbol
+            df (DataFrame): Stored history with a sorted UTC DatetimeIndex and price
+
+        Returns:
+            df (DataFrame): History with journaled prices appended, analytics still need to be calculated
+        """
+        ticks = self.read(ticker)
+        if len(df) and len(ticks):
+            tail = df.iloc[-len(ticks) :]
+            if (
+                len(tail) == len(ticks)
+                and (tail.index == ticks.index).all()
+                and np.array_equal(tail["price"].to_numpy(), ticks["price"].to_numpy())
+            ):
+                # already folded into storage by a compaction that stopped before truncating
+                self.truncate(ticker)
+                return df
+            # quotes up to the last row of a freshly downloaded history are superseded by it
+            ticks = ticks[ticks.index > df.index[-1]]
+        if not len(ticks):
+            return df
+        logging.info("Replayed %d journaled quotes for %s", len(ticks), ticker)
+        return pd.concat([df, ticks])
+
+    def truncate(self, ticker):
+        """Empties a ticker's journal once its quotes are saved to storage"""
+        with self.lock:
+            file = self.files.pop(ticker, None)
+            if file:
+                file.close()
+            self.dirty.discard(ticker)
+            if os.path.exists(self.path(ticker)):
+                with open(self.path(ticker), "wb") as f:
+                    os.fsync(f.fileno())
+
+    def delete(self, ticker):
+        """Deletes a ticker's journal
+
+        Returns:
+            bool: True if the ticker had a journal
+        """
+        self.truncate(ticker)
+        with self.lock:
+            if os.path.exists(self.path(ticker)):
+                os.remove(self.path(ticker))
+                return True
+        return False
+
+    def close(self):
+        """Syncs and closes every open journal, they are reopened on the next append"""
+        self.sync()
+        with self.lock:
+            for file in self.files.values():
+                file.close()
+            self.files.clear()
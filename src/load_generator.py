@@ -0,0 +1,213 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+
+# Requests the load generator can send
+OPERATIONS = ("price", "signal", "add_ticker", "del_ticker")
+DEFAULT_MIX = "price=45,signal=45,add_ticker=5,del_ticker=5"
+# Tickers added and deleted by default, kept apart from the tickers the server is serving
+DEFAULT_TICKERS = ["bnch"]
+QUERY_DATETIME_FORMAT = "%Y-%m-%d-%H:%M"
+
+
+def parse_mix(mix):
+    """Parses a request mix such as price=45,signal=45,add_ticker=5,del_ticker=5
+
+    Args:
+        mix (str): Comma separated operation=weight pairs
+
+    Returns:
+        dict: Operations as keys and weights as values
+
+    Raises:
+        ValueError: If an operation is unknown or no weight is positive
+    """
+    weights = {}
+    for item in mix.split(","):
+        operation, _, weight = item.strip().partition("=")
+        if operation not in OPERATIONS:
+            raise ValueError(
+                f"Unknown operation {operation}, expected one of {', '.join(OPERATIONS)}"
+            )
+        weights[operation] = float(weight or 1)
+    if not any(weight > 0 for weight in weights.values()):
+        raise ValueError("The mix needs at least one operation with a positive weight")
+    return {operation: weight for operation, weight in weights.items() if weight > 0}
+
+
+def summarize(latencies, errors, elapsed):
+    """Summarizes the requests of one operation or of the whole run
+
+    Args:
+        latencies (list): Seconds of every request
+        errors (dict): Error kinds as keys and counts as values
+        elapsed (float): Seconds the run took
+
+    Returns:
+        dict: requests, throughput in requests per second, errors, error_rate and latency
+        p50, p95, p99, max and mean in milliseconds
+    """
+    latencies = np.array(latencies) * 1000
+    count = len(latencies)
+    failed = sum(errors.values())
+    return {
+        "requests": count,
+        "throughput": count / elapsed if elapsed > 0 else 0.0,
+        "errors": failed,
+        "error_rate": failed / count if count else 0.0,
+        "error_kinds": dict(errors),
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)) if count else None,
+            "p95": float(np.percentile(latencies, 95)) if count else None,
+            "p99": float(np.percentile(latencies, 99)) if count else None,
+            "max": float(latencies.max()) if count else None,
+            "mean": float(latencies.mean()) if count else None,
+        },
+    }
+
+
+class LoadGenerator:
+    """Sends a weighted mix of /price, /signal, /add_ticker and /del_ticker requests to a server
+    from `concurrency` threads over one TradingClient's pooled keep-alive connections.
+
+    Without a rate every thread sends its next request as soon as the previous one is answered.
+    With a rate, requests are scheduled every 1 / rate seconds whether earlier ones are answered
+    or not, and latency is counted from the scheduled time, so a stalled server shows up as
+    queueing delay instead of fewer requests being sent.
+
+    A request fails when it raises, e.g. on a timeout or a refused connection, when the server
+    answers with an HTTP error status, or when add_ticker or del_ticker return 1 (server error).
+    Price and signal queries are spread over random minutes of the last `days` days.
+    """
+
+    def __init__(
+        self, client, mix, tickers=None, concurrency=1, rate=0, days=5, seed=None
+    ):
+        self.client = client
+        self.weights = parse_mix(mix) if isinstance(mix, str) else dict(mix)
+        self.tickers = tickers or DEFAULT_TICKERS
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.days = days
+        self.seed = seed
+        self.lock = threading.Lock()
+
+    def path(self, operation, rng):
+        """Returns the HTTP method and path of a random request for operation"""
+        if operation in ("price", "signal"):
+            minutes = rng.randrange(self.days * 24 * 60)
+            query = datetime.utcnow() - timedelta(minutes=minutes)
+            return "GET", f"/{operation}/{query.strftime(QUERY_DATETIME_FORMAT)}"
+        ticker = rng.choice(self.tickers)
+        if operation == "add_ticker":
+            return "POST", f"/add_ticker/{ticker}"
+        return "DELETE", f"/del_ticker/{ticker}"
+
+    def send(self, operation, rng):
+        """Sends one request
+
+        Returns:
+            str or None: Error kind, None if the request succeeded
+        """
+        method, path = self.path(operation, rng)
+        try:
+            r = self.client.session.request(
+                method, f"{self.client.base_url}{path}", timeout=self.client.timeout
+            )
+        except requests.Timeout:
+            return "timeout"
+        except requests.RequestException:
+            return "connection"
+        if r.status_code >= 400:
+            return f"http_{r.status_code}"
+        if operation in ("add_ticker", "del_ticker") and r.text.strip() == "1":
+            return "server_error"
+        return None
+
+    def run(self, duration=30, count=None):
+        """Sends requests until duration seconds have passed, or count requests were sent
+
+        Args:
+            duration (float, optional): Seconds to run for. Defaults to 30.
+            count (int, optional): Stops after this many requests instead. Defaults to None.
+
+        Returns:
+            dict: Run settings, a summary of every request and one per operation
+        """
+        operations = list(self.weights)
+        weights = list(self.weights.values())
+        latencies = defaultdict(list)
+        errors = defaultdict(lambda: defaultdict(int))
+        sent = [0]
+        start = time.perf_counter()
+        deadline = None if count else start + duration
+
+        def next_request():
+            # returns the scheduled time of the next request, None once the run is over
+            with self.lock:
+                if count and sent[0] >= count:
+                    return None
+                scheduled = start + sent[0] / self.rate if self.rate else None
+                if (
+                    deadline is not None
+                    and (scheduled or time.perf_counter()) >= deadline
+                ):
+                    return None
+                sent[0] += 1
+                return scheduled or time.perf_counter()
+
+        def worker(index):
+            rng = random.Random(None if self.seed is None else self.seed + index)
+            while True:
+                scheduled = next_request()
+                if scheduled is None:
+                    return
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                operation = rng.choices(operations, weights)[0]
+                error = self.send(operation, rng)
+                latency = time.perf_counter() - scheduled
+                with self.lock:
+                    latencies[operation].append(latency)
+                    if error:
+                        errors[operation][error] += 1
+
+        threads = [
+            threading.Thread(target=worker, args=(i,), name=f"bench-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        total_errors = defaultdict(int)
+        for kinds in errors.values():
+            for kind, failed in kinds.items():
+                total_errors[kind] += failed
+        return {
+            "server": self.client.base_url,
+            "created": datetime.utcnow().isoformat(timespec="seconds"),
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "mix": self.weights,
+            "tickers": self.tickers,
+            "elapsed": elapsed,
+            **summarize(
+                [latency for values in latencies.values() for latency in values],
+                total_errors,
+                elapsed,
+            ),
+            "operations": {
+                operation: summarize(latencies[operation], errors[operation], elapsed)
+                for operation in operations
+                if operation in latencies
+            },
+        }
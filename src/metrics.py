@@ -0,0 +1,321 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Sample line of the text format: metric name, optional {labels} and the value
+SAMPLE = re.compile(r"([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (.*)")
+# Histogram upper bounds in seconds, from sub-millisecond lookups to slow upstream calls
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def format_labels(names, values, extra=()):
+    """Formats label pairs as {name="value",...}, escaping values as the text format requires"""
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """Base class for a metric family with a fixed set of label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def remove(self, **labels):
+        """Drops one labelled series"""
+        with self.lock:
+            self.values.pop(self.key(labels), None)
+
+    def clear(self):
+        """Drops every labelled series, used for series of tickers that were removed"""
+        with self.lock:
+            self.values.clear()
+
+    def samples(self):
+        with self.lock:
+            return [
+                (self.name, format_labels(self.labels, key), value)
+                for key, value in sorted(self.values.items())
+            ]
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Value that only goes up"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    kind = "gauge"
+
+    def get(self, **labels):
+        """Returns the value of one labelled series or None"""
+        with self.lock:
+            return self.values.get(self.key(labels))
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Distribution of observations counted in cumulative buckets, with their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the seconds spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = sorted(
+                (key, list(counts), total)
+                for key, (counts, total) in self.values.items()
+            )
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = format_labels(self.labels, key, [("le", format_value(bound))])
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            labels = format_labels(self.labels, key)
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Returns every metric in the Prometheus text format, version 0.0.4"""
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+def merge_expositions(expositions, label):
+    """Merges the text format metrics of several processes into one exposition. Every sample gets
+    a label naming the process it came from, and each family's HELP and TYPE lines are kept once.
+
+    Args:
+        expositions (dict): Label values as keys and rendered metrics as values
+        label (str): Name of the added label
+
+    Returns:
+        str: Metrics in the Prometheus text format, version 0.0.4
+    """
+    # family name to its comment lines and samples, in order of first appearance
+    families = {}
+    for value, text in expositions.items():
+        added = format_labels([label], [value])[1:-1]
+        family = None
+        for line in text.splitlines():
+            if line.startswith("#"):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    comments = families.setdefault(family, ([], []))[0]
+                    if line not in comments:
+                        comments.append(line)
+                continue
+            match = SAMPLE.fullmatch(line)
+            if match is None:
+                continue
+            name, labels, sample = match.groups()
+            labels = f"{added},{labels}" if labels else added
+            families.setdefault(family or name, ([], []))[1].append(
+                f"{name}{{{labels}}} {sample}"
+            )
+    return (
+        "\n".join(
+            line
+            for comments, samples in families.values()
+            for line in [*comments, *samples]
+        )
+        + "\n"
+    )
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(
+    Histogram(
+        "trading_request_duration_seconds",
+        "Time spent answering API requests",
+        ["method", "route"],
+    )
+)
+REQUESTS = REGISTRY.register(
+    Counter(
+        "trading_requests_total",
+        "API requests answered",
+        ["method", "route", "status"],
+    )
+)
+REQUESTS_IN_FLIGHT = REGISTRY.register(
+    Gauge(
+        "trading_requests_in_flight",
+        "API requests being answered",
+        ["method", "route"],
+    )
+)
+TICK_DURATION = REGISTRY.register(
+    Histogram(
+        "trading_update_tick_duration_seconds",
+        "Time spent on one update_data tick, polling quotes and appending them",
+    )
+)
+TICKER_UPDATE_DURATION = REGISTRY.register(
+    Histogram(
+        "trading_ticker_update_duration_seconds",
+        "Time spent getting a ticker's realtime quote and appending it",
+        ["ticker"],
+    )
+)
+LAST_QUOTE = REGISTRY.register(
+    Gauge(
+        "trading_ticker_last_quote_timestamp_seconds",
+        "Unix time of the last successful realtime quote for a ticker",
+        ["ticker"],
+    )
+)
+QUOTE_STALENESS = REGISTRY.register(
+    Gauge(
+        "trading_ticker_quote_staleness_seconds",
+        "Seconds since the last successful realtime quote for a ticker, or since its newest row before the first quote",
+        ["ticker"],
+    )
+)
+TICKER_ROWS = REGISTRY.register(
+    Gauge("trading_ticker_rows", "Rows held in memory for a ticker", ["ticker"])
+)
+TICKER_MEMORY = REGISTRY.register(
+    Gauge(
+        "trading_ticker_memory_bytes",
+        "Memory used by a ticker's history in memory",
+        ["ticker"],
+    )
+)
+UPSTREAM_LATENCY = REGISTRY.register(
+    Histogram(
+        "trading_upstream_request_duration_seconds",
+        "Time spent on Alpha Vantage and Finnhub calls",
+        ["upstream"],
+    )
+)
+UPSTREAM_ERRORS = REGISTRY.register(
+    Counter(
+        "trading_upstream_errors_total",
+        "Failed Alpha Vantage and Finnhub calls",
+        ["upstream", "reason"],
+    )
+)
+CACHE = REGISTRY.register(
+    Gauge(
+        "trading_response_cache",
+        "Response cache counters: hits, misses, evictions, invalidations, size and maxsize",
+        ["stat"],
+    )
+)
+HISTORY_CACHE = REGISTRY.register(
+    Gauge(
+        "trading_history_cache",
+        "Alpha Vantage history cache counters: hits, misses, evictions, entries and bytes",
+        ["stat"],
+    )
+)
@@ -0,0 +1,282 @@
+import copy
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+logging = logging.getLogger()
+
+# Signal of a ticker with no row at or before a panel timestamp
+NO_SIGNAL = np.iinfo(np.int8).min
+
+
+def panel_analytics(price, lengths, interval):
+    """Computes S_avg, sigma, signal, pnl and position for every ticker in one vectorized pass.
+    Tickers are columns of a 2D matrix, each starting at row 0 and NaN padded past its length,
+    so the rolling windows run over each ticker's own rows like calculate_avg_and_sigma and
+    calculate_signal_and_pnl do one ticker at a time.
+
+    Args:
+        price (ndarray): 2D float64 prices, one column per ticker
+        lengths (ndarray): Number of rows of every ticker
+        interval (int): Interval of time periods
+
+    Returns:
+        dict: S_avg, sigma, signal, pnl and position 2D ndarrays shaped like price
+    """
+    rows, tickers = price.shape
+    window = 24 * 60 // interval
+    valid = np.arange(rows)[:, None] < lengths[None, :]
+    avg_price = np.full(price.shape, np.nan)
+    sigma = np.full(price.shape, np.nan)
+    if window >= 2 and rows >= window:
+        # sums relative to each ticker's mean limit cancellation, as in rolling_avg_and_sigma
+        offset = np.nansum(price, axis=0) / np.maximum(lengths, 1)
+        shifted = np.where(valid, price - offset, 0.0)
+        sums = np.vstack([np.zeros(tickers), np.cumsum(shifted, axis=0)])
+        squares = np.vstack([np.zeros(tickers), np.cumsum(shifted * shifted, axis=0)])
+        window_sum = sums[window:] - sums[:-window]
+        window_squares = squares[window:] - squares[:-window]
+        avg_price[window - 1 :] = np.round(window_sum / window + offset, 2)
+        variance = (window_squares - window_sum * window_sum / window) / (window - 1)
+        sigma[window - 1 :] = np.sqrt(np.maximum(variance, 0.0))
+        avg_price[~valid] = np.nan
+        sigma[~valid] = np.nan
+
+    # the first and last rows of every ticker never carry a signal
+    inner = valid & (np.arange(rows)[:, None] >= 1)
+    inner &= np.arange(rows)[:, None] < lengths[None, :] - 1
+    signal = np.where(
+        inner & (price > avg_price + sigma),
+        1,
+        np.where(inner & (price < avg_price - sigma), -1, 0),
+    )
+    position = np.zeros(price.shape)
+    pnl = np.zeros(price.shape)
+    if rows >= 2:
+        position[1:] = np.cumsum(
+            np.where(valid[1:], signal[:-1] * np.nan_to_num(price[1:]), 0.0), axis=0
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            returns = np.where(valid[1:], price[1:] / price[:-1] - 1, 0.0)
+        pnl[1:] = np.round(position[:-1] * returns, 2)
+    return {
+        "S_avg": avg_price,
+        "sigma": sigma,
+        "signal": signal,
+        "pnl": pnl,
+        "position": position,
+    }
+
+
+def prepare_panel(frames, interval):
+    """Calculates S_avg, sigma, signal, pnl and position for many DataFrames loaded from storage
+    at once. Results match calculate_avg_and_sigma and calculate_signal_and_pnl on each DataFrame,
+    except for S_avg values on a half cent which may round the other way.
+
+    Args:
+        frames (dict): Symbols as keys and pandas DataFrames with a sorted UTC DatetimeIndex and price as values
+        interval (int): Interval of time periods
+
+    Returns:
+        dict: Symbols as keys and DataFrames with all analytics columns as values
+    """
+    start = time.perf_counter()
+    symbols = list(frames)
+    lengths = np.array([len(frames[symbol]) for symbol in symbols], dtype=np.int64)
+    price = np.full((int(lengths.max(initial=0)), len(symbols)), np.nan)
+    for column, symbol in enumerate(symbols):
+        price[: lengths[column], column] = frames[symbol]["price"].to_numpy(
+            dtype=np.float64
+        )
+    analytics = panel_analytics(price, lengths, interval)
+
+    prepared = {}
+    for column, symbol in enumerate(symbols):
+        rows = slice(0, lengths[column])
+        prepared[symbol] = pd.DataFrame(
+            {
+                "price": price[rows, column],
+                **{name: values[rows, column] for name, values in analytics.items()},
+            },
+            index=frames[symbol].index,
+        )
+    elapsed = time.perf_counter() - start
+    logging.info(
+        "Calculated analytics for %d tickers and %d rows in %.6fs",
+        len(symbols),
+        lengths.sum(),
+        elapsed,
+    )
+    return prepared
+
+
+class Panel:
+    """As-of view of every loaded ticker on a shared timestamp axis, built from one snapshot.
+
+    Row i holds every ticker's price and signal at its last row at or before index[i], so a
+    cross-sectional query is one binary search and one row slice instead of a lookup per ticker.
+    Only the rows in memory are covered, tickers with no row at or before a query datetime
+    answer No Data here and may still have rows spilled to storage.
+
+    Rows are preallocated buffers grown by 25% at a time. append() builds the panel of the next
+    update tick from this one, writing the new rows past its end and sharing the rows before
+    them. Its last row, whose signals the next tick settles, is kept out of the shared buffers,
+    so a published panel never sees a write.
+    """
+
+    def __init__(self, version, data):
+        self.version = version
+        self.symbols = list(data)
+        self.columns = {symbol: column for column, symbol in enumerate(self.symbols)}
+        index = np.unique(
+            np.concatenate(
+                [series.datetime for series in data.values()] or [np.empty(0, np.int64)]
+            )
+        )
+        price = np.full((len(index), len(self.symbols)), np.nan)
+        signal = np.full((len(index), len(self.symbols)), NO_SIGNAL, np.int8)
+        # last datetime of every ticker, a ticker with no row never gets a new row appended
+        self.ends = np.full(len(self.symbols), np.iinfo(np.int64).min)
+        for column, series in enumerate(data.values()):
+            positions = series.datetime.searchsorted(index, side="right") - 1
+            rows = positions >= 0
+            price[rows, column] = series.values("price", positions[rows])
+            signal[rows, column] = series.values("signal", positions[rows])
+            if len(series):
+                self.ends[column] = series.datetime[-1]
+        self._index, self._price, self._signal = index, price, signal
+        self._share(len(index))
+
+    def _share(self, length):
+        # the last row is read from copies, so the next panel may write its settled signals
+        self.length = length
+        self.last_price = self._price[length - 1].copy() if length else None
+        self.last_signal = self._signal[length - 1].copy() if length else None
+        self.appended = False
+
+    @property
+    def index(self):
+        """Epoch nanoseconds of every row, a view of the buffer without a copy"""
+        return self._index[: self.length]
+
+    def append(self, version, changed):
+        """Returns the panel of the snapshot an update tick published after this panel's one,
+        sharing this panel's rows instead of building it from every series again
+
+        Args:
+            version (int): Version of the new snapshot
+            changed (dict): Symbols as keys and the TickerSeries that got rows appended as values
+
+        Returns:
+            Panel or None: New panel, or None when it has to be built from the snapshot instead:
+            this panel was appended to already, or a ticker is new or its previous last row was
+            not at this panel's last timestamp, so rows before it change as well
+        """
+        length = self.length
+        if self.appended or not length:
+            return None
+        last = self._index[length - 1]
+        added = []
+        for symbol, series in changed.items():
+            column = self.columns.get(symbol)
+            if column is None or self.ends[column] != last:
+                return None
+            added.append(series.datetime[series.datetime.searchsorted(last, "right") :])
+        added = np.unique(np.concatenate(added or [np.empty(0, np.int64)]))
+        self.appended = True
+
+        panel = copy.copy(self)
+        panel.version = version
+        panel.ends = self.ends.copy()
+        panel._index, panel._price, panel._signal = self._grown(length + len(added))
+        panel._index[length : length + len(added)] = added
+        # rows from this panel's last one on: unchanged tickers carry their values forward
+        rows = slice(length - 1, length + len(added))
+        panel._price[rows] = self.last_price
+        panel._signal[rows] = self.last_signal
+        datetimes = panel._index[rows]
+        for symbol, series in changed.items():
+            column = self.columns[symbol]
+            positions = series.datetime.searchsorted(datetimes, side="right") - 1
+            panel._price[rows, column] = series.values("price", positions)
+            panel._signal[rows, column] = series.values("signal", positions)
+            panel.ends[column] = series.datetime[-1]
+        panel._share(length + len(added))
+        return panel
+
+    def _grown(self, rows):
+        # buffers holding at least rows rows, this panel's own ones while they are big enough
+        if rows <= len(self._index):
+            return self._index, self._price, self._signal
+        capacity = max(rows, len(self._index) + len(self._index) // 4)
+        grown = []
+        for buffer, fill in [
+            (self._index, 0),
+            (self._price, np.nan),
+            (self._signal, NO_SIGNAL),
+        ]:
+            copy = np.full((capacity, *buffer.shape[1:]), fill, buffer.dtype)
+            copy[: self.length] = buffer[: self.length]
+            grown.append(copy)
+        return grown
+
+    def _row(self, column, row):
+        if row == self.length - 1:
+            return self.last_price if column == "price" else self.last_signal
+        return (self._price if column == "price" else self._signal)[row]
+
+    def row(self, query_datetime):
+        """Returns the panel row holding every ticker's values at query_datetime, -1 if none"""
+        query = np.datetime64(query_datetime, "ns").astype(np.int64)
+        return int(self.index.searchsorted(query, side="right")) - 1
+
+    def cross_section(self, column, query_datetime):
+        """Gets every ticker's price or signal at query_datetime
+
+        Args:
+            column (str): price or signal
+            query_datetime (numpy.datetime64): UTC datetime
+
+        Returns:
+            dict: Symbols as keys and values or No Data
+        """
+        row = self.row(query_datetime)
+        if row < 0:
+            return {symbol: "No Data" for symbol in self.symbols}
+        values = self._row(column, row)
+        missing = np.isnan(values) if column == "price" else values == NO_SIGNAL
+        return {
+            symbol: "No Data" if absent else value
+            for symbol, value, absent in zip(
+                self.symbols, values.tolist(), missing.tolist()
+            )
+        }
+
+    def missing(self, query_datetime):
+        """Returns the tickers with no row in memory at or before query_datetime"""
+        row = self.row(query_datetime)
+        if row < 0:
+            return list(self.symbols)
+        return [
+            self.symbols[i]
+            for i in np.flatnonzero(self._row("signal", row) == NO_SIGNAL)
+        ]
+
+    def select(self, query_datetime, signal):
+        """Returns the tickers whose signal equals signal at query_datetime
+
+        Args:
+            query_datetime (numpy.datetime64): UTC datetime
+            signal (int): -1, 0 or 1
+
+        Returns:
+            list: Symbols
+        """
+        row = self.row(query_datetime)
+        if row < 0:
+            return []
+        return [
+            self.symbols[i] for i in np.flatnonzero(self._row("signal", row) == signal)
+        ]
@@ -0,0 +1,164 @@
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+logging = logging.getLogger()
+
+
+class StackSampler:
+    """Samples the call stack of one thread at a fixed interval from a background thread.
+    Stacks are kept as folded lines, root first, ready for flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        """Returns the sampled stacks as 'frame;frame;frame count' lines"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class ProfileSession:
+    """cProfile and stack sampling of one request or tick on the current thread"""
+
+    def __init__(self, name, directory, interval):
+        self.name = name
+        self.directory = directory
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+        self.start_time = time.perf_counter()
+
+    def start(self):
+        self.profile.enable()
+        self.sampler.start()
+
+    def stop(self):
+        """Stops profiling and writes <time>_<name>.prof and <time>_<name>.folded
+
+        Returns:
+            str: Path of the .prof file, without extension
+        """
+        self.profile.disable()
+        self.sampler.stop()
+        elapsed = time.perf_counter() - self.start_time
+        path = os.path.join(
+            self.directory,
+            f"{datetime.utcnow().strftime('%Y-%m-%d-%H%M%S-%f')}_{self.name}",
+        )
+        self.profile.dump_stats(f"{path}.prof")
+        with open(f"{path}.folded", "w") as f:
+            f.write(self.sampler.folded())
+        logging.info(
+            "Profiled %s in %.3fs, written to %s.prof", self.name, elapsed, path
+        )
+        return path
+
+
+class Profiler:
+    """Profiles 1 in every `sample_every` requests or ticks, 0 disables profiling.
+    Only the sampled calls pay for profiling, so it can be left on under load.
+    """
+
+    def __init__(self, sample_every=0, directory="logs/profiles/", interval=0.001):
+        self.sample_every = sample_every
+        self.directory = directory
+        self.interval = interval
+        self.calls = Counter()
+        self.profiled = 0
+        self.lock = threading.Lock()
+
+    def sampled(self, kind):
+        """Counts one call of kind and returns True for every sample_every-th call"""
+        with self.lock:
+            if self.sample_every <= 0:
+                return False
+            self.calls[kind] += 1
+            return self.calls[kind] % self.sample_every == 0
+
+    def start(self, kind, name=""):
+        """Starts profiling the current thread if this call of kind is sampled
+
+        Args:
+            kind (str): request or tick, each kind is sampled separately
+            name (str, optional): Added to the profile file names, e.g. the route
+
+        Returns:
+            ProfileSession or None: Session to stop, or None when the call is not sampled
+        """
+        if not self.sampled(kind):
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub("[^A-Za-z0-9]+", "_", f"{kind}_{name}").strip("_")
+        session = ProfileSession(name, self.directory, self.interval)
+        try:
+            session.start()
+        except ValueError as e:
+            # only one cProfile can be active at a time on some Python versions
+            logging.warning("Skipped profiling %s: %s", name, e)
+            return None
+        return session
+
+    def stop(self, session):
+        """Stops a session returned by start and writes its profiles"""
+        if session is None:
+            return
+        try:
+            session.stop()
+            with self.lock:
+                self.profiled += 1
+        except Exception as e:
+            logging.error("Error while writing profile %s: %s", session.name, e)
+
+    @contextmanager
+    def profile(self, kind, name=""):
+        """Profiles the with block if this call of kind is sampled"""
+        session = self.start(kind, name)
+        try:
+            yield
+        finally:
+            self.stop(session)
+
+    def stats(self):
+        """Returns the profiling settings and counters
+
+        Returns:
+            dict: sample_every, directory, calls per kind and profiles written
+        """
+        with self.lock:
+            return {
+                "sample_every": self.sample_every,
+                "directory": self.directory,
+                "calls": dict(self.calls),
+                "profiled": self.profiled,
+            }
@@ -0,0 +1,689 @@
+import atexit
+import logging
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+from flask import Flask, Response, request
+from flask_restful import Api, Resource
+from requests.adapters import HTTPAdapter
+from waitress import serve
+
+from cache import HistoryCache
+from fetcher import HistoryFetcher
+from metrics import merge_expositions
+from router_argument_parser import parser
+from sharding import HashRing
+from storage import get_storage, is_valid_symbol, migrate
+
+if not os.path.exists("data/"):
+    os.makedirs("data/")
+if not os.path.exists("logs/"):
+    os.makedirs("logs/")
+
+logging.basicConfig(
+    filename=f"logs/router_log_{datetime.utcnow().strftime('%Y-%m-%d-%H:%M')}",
+    format="%(asctime)s %(levelname)-8s %(message)s",
+    datefmt="%Y-%m-%d %H:%M",
+    level=logging.INFO,
+)
+
+SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+NO_DATA = "Server has no data"
+INVALID_TICKERS = (
+    "Invalid tickers, should be a list of symbols or a comma separated str"
+)
+
+
+class Worker:
+    """One shard process running src/server.py --shard"""
+
+    def __init__(self, name, port, process):
+        self.name = name
+        self.port = port
+        self.process = process
+        self.url = f"http://127.0.0.1:{port}"
+
+
+# Classes for Flask-restful routes/endpoints
+class HomePage(Resource):
+    def get(self):
+        return "Connected to trading server"
+
+
+class Price(Resource):
+    def get(self, query_datetime):
+        return fan_out_all("GET", f"/price/{query_datetime}", point_has_data)
+
+
+class Signal(Resource):
+    def get(self, query_datetime):
+        return fan_out_all("GET", f"/signal/{query_datetime}", point_has_data)
+
+
+class Screen(Resource):
+    def get(self, query_datetime):
+        return fan_out_all(
+            "GET", f"/screen/{query_datetime}", None, params=request.args.to_dict()
+        )
+
+
+class PriceRange(Resource):
+    def get(self):
+        return range_query("price")
+
+
+class SignalRange(Resource):
+    def get(self):
+        return range_query("signal")
+
+
+class Batch(Resource):
+    def post(self):
+        body = request.get_json(force=True, silent=True) or {}
+        tickers = body.get("tickers")
+        if not tickers:
+            return fan_out_all("POST", "/batch", None, json=body)
+        if not isinstance(tickers, str) and not (
+            isinstance(tickers, list) and all(isinstance(t, str) for t in tickers)
+        ):
+            return INVALID_TICKERS, 400
+        calls = [
+            (worker, "POST", "/batch", {"json": dict(body, tickers=owned)})
+            for worker, owned in owners(tickers).items()
+        ]
+        return merge(fan_out(calls), None)
+
+
+class AddTicker(Resource):
+    def post(self, ticker):
+        ticker = ticker.lower()
+        if not is_valid_symbol(ticker):
+            return 2
+        with membership_lock:
+            worker = workers[assignment.get(ticker) or ring.node_for(ticker)]
+        # the shard downloads through /history, so every shard shares the router's Alpha Vantage
+        # quota, and saves the ticker itself. Other requests are routed meanwhile.
+        body, _ = forward(
+            worker,
+            "POST",
+            f"/add_ticker/{ticker}",
+            params=request.args.to_dict(),
+            timeout=600,
+        )
+        if body == 0:
+            with membership_lock:
+                assignment[ticker] = worker.name
+                if ring.node_for(ticker) != worker.name:
+                    # shards changed while adding, moves the ticker to its owner
+                    rebalance()
+        return body
+
+
+class DelTicker(Resource):
+    def delete(self, ticker):
+        ticker = ticker.lower()
+        if not is_valid_symbol(ticker):
+            return 2
+        with membership_lock:
+            worker = workers[assignment.get(ticker) or ring.node_for(ticker)]
+            body, _ = forward(worker, "DELETE", f"/del_ticker/{ticker}")
+            if body == 0:
+                assignment.pop(ticker, None)
+            return body
+
+
+class History(Resource):
+    def get(self, ticker):
+        ticker = ticker.lower()
+        if not is_valid_symbol(ticker):
+            return "Invalid ticker"
+        # shards download the tickers they add and the rows they backfill here, so they share
+        # the router's quota
+        outputsize = "full" if request.args.get("outputsize") == "full" else "compact"
+        df = fetcher.download(
+            ticker,
+            outputsize=outputsize,
+            retries=request.args.get("retries", type=int),
+            refresh=request.args.get("refresh", "").lower() in ("1", "true", "yes"),
+        )
+        if isinstance(df, str):
+            return df
+        return {
+            "datetime": df.index.values.astype("datetime64[ns]")
+            .view(np.int64)
+            .tolist(),
+            "price": df["price"].tolist(),
+        }
+
+
+class Ready(Resource):
+    def get(self):
+        responses = fan_out_all_raw("GET", "/ready")
+        tickers = {}
+        ready = True
+        for body, status in responses:
+            if not isinstance(body, dict) or "tickers" not in body:
+                return body, status
+            tickers.update(body["tickers"])
+            ready = ready and body["ready"]
+        return {"ready": ready, "tickers": tickers}, 200 if ready else 503
+
+
+class CacheStats(Resource):
+    def get(self):
+        return per_shard("GET", "/cache_stats")
+
+
+class Profile(Resource):
+    def get(self):
+        return per_shard("GET", "/profile")
+
+    def put(self, sample_every=0):
+        return per_shard("PUT", f"/profile/{sample_every}")
+
+
+class Metrics(Resource):
+    def get(self):
+        with membership_lock:
+            targets = list(workers.values())
+        responses = fan_out([(worker, "GET", "/metrics", {}) for worker in targets])
+        expositions = {}
+        for worker, (body, status) in zip(targets, responses):
+            if status != 200:
+                return body, status
+            expositions[worker.name] = body
+        return Response(
+            merge_expositions(expositions, "shard"),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class Stream(Resource):
+    def get(self):
+        # every shard gets the same ?tickers, so tickers moved between shards keep streaming
+        with membership_lock:
+            targets = list(workers.values())
+        streams = []
+        for worker in targets:
+            try:
+                r = requests.get(
+                    f"{worker.url}/stream",
+                    params=request.args.to_dict(),
+                    stream=True,
+                    timeout=(5, 60),
+                )
+            except requests.RequestException as e:
+                logging.error("Error while streaming from %s: %s", worker.name, e)
+                r = None
+            if r is None or r.status_code != 200:
+                for stream in streams:
+                    stream.close()
+                if r is None:
+                    return f"Shard {worker.name} unavailable", 503
+                r.close()
+                return r.json(), r.status_code
+            streams.append(r)
+        return Response(
+            merged_events(streams),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+class Reset(Resource):
+    def put(self):
+        with membership_lock:
+            # one shard at a time, they all clear the same data directory
+            results = [
+                forward(worker, "PUT", "/reset")[0] for worker in workers.values()
+            ]
+            assignment.clear()
+            return 0 if all(result == 0 for result in results) else 1
+
+
+class Workers(Resource):
+    def get(self):
+        return worker_table()
+
+    def post(self):
+        add_worker()
+        return worker_table()
+
+    def delete(self, name):
+        if not remove_worker(name):
+            return "Unknown or last worker", 400
+        return worker_table()
+
+
+def forward(worker, method, path, timeout=60, **kwargs):
+    """Sends a request to a shard
+
+    Args:
+        worker (Worker): Shard to send to
+        method (str): HTTP method
+        path (str): Path with the query string, if any, passed as params
+        timeout (float, optional): Seconds to wait for the answer. Defaults to 60.
+
+    Returns:
+        tuple: (response body, status code), body is parsed JSON when possible
+    """
+    try:
+        r = session.request(method, f"{worker.url}{path}", timeout=timeout, **kwargs)
+    except requests.RequestException as e:
+        logging.error(
+            "Error while calling %s%s on %s: %s", method, path, worker.name, e
+        )
+        return f"Shard {worker.name} unavailable", 503
+    try:
+        return r.json(), r.status_code
+    except ValueError:
+        return r.text, r.status_code
+
+
+def fan_out(calls):
+    """Sends requests to several shards concurrently
+
+    Args:
+        calls (list): (worker, method, path, kwargs) tuples
+
+    Returns:
+        list: (response body, status code) tuples in the order of calls
+    """
+    return list(
+        executor.map(lambda call: forward(call[0], call[1], call[2], **call[3]), calls)
+    )
+
+
+def fan_out_all(method, path, has_data, **kwargs):
+    """Sends the same request to every shard and merges the answers"""
+    return merge(fan_out_all_raw(method, path, **kwargs), has_data)
+
+
+def fan_out_all_raw(method, path, **kwargs):
+    """Sends the same request to every shard
+
+    Returns:
+        list: (response body, status code) tuples
+    """
+    with membership_lock:
+        targets = list(workers.values())
+    return fan_out([(worker, method, path, kwargs) for worker in targets])
+
+
+def per_shard(method, path):
+    """Sends the same request to every shard
+
+    Returns:
+        dict or tuple: Shard names as keys and their answers as values, or the first shard error
+        and status
+    """
+    with membership_lock:
+        targets = list(workers.values())
+    answers = {}
+    for worker, (body, status) in zip(
+        targets, fan_out([(worker, method, path, {}) for worker in targets])
+    ):
+        if status != 200:
+            return body, status
+        answers[worker.name] = body
+    return answers
+
+
+def merged_events(streams, heartbeat=15):
+    """Generates the Server-Sent Events of several shard streams as one stream, until the client
+    disconnects or any shard ends its stream, e.g. because the client fell behind
+
+    Args:
+        streams (list): Streamed requests responses of the shards' /stream
+        heartbeat (int, optional): Seconds between keep-alive comments. Defaults to 15.
+
+    Yields:
+        str: Server-Sent Event
+    """
+    # bounded, so a slow client holds up the shards' streams until they drop it
+    events = queue.Queue(maxsize=100)
+    closed = threading.Event()
+
+    def offer(event):
+        while not closed.is_set():
+            try:
+                events.put(event, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def read(stream):
+        # each stream is read and closed by its own thread, at the latest one shard keep-alive
+        # after the client went away
+        try:
+            lines = []
+            for line in stream.iter_lines(decode_unicode=True):
+                if closed.is_set():
+                    return
+                if line:
+                    lines.append(line)
+                    continue
+                # the shards' connected and keep-alive comments are not passed on
+                if lines and not lines[0].startswith(":"):
+                    offer("\n".join(lines) + "\n\n")
+                lines = []
+        except Exception as e:
+            if not closed.is_set():
+                logging.error("Shard stream ended: %s", e)
+        finally:
+            stream.close()
+            offer(None)
+
+    for stream in streams:
+        threading.Thread(target=read, args=(stream,), daemon=True).start()
+    try:
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = events.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            yield event
+    finally:
+        closed.set()
+
+
+def merge(responses, has_data):
+    """Merges the per ticker dicts answered by the shards
+
+    Args:
+        responses (list): (response body, status code) tuples
+        has_data (function or None): Returns whether a merged value holds data. When no value does,
+            'Server has no data' is answered like a single server would. None keeps the merged dict.
+
+    Returns:
+        dict or str or tuple: Merged dict, 'Server has no data', or the first shard error and status
+    """
+    merged = {}
+    for body, status in responses:
+        if status != 200:
+            return body, status
+        if isinstance(body, dict):
+            merged.update(body)
+    if has_data and not any(has_data(value) for value in merged.values()):
+        return NO_DATA
+    return merged
+
+
+def point_has_data(value):
+    return value != "No Data"
+
+
+def range_has_data(value):
+    return isinstance(value, dict) and bool(value["datetime"])
+
+
+def owners(tickers):
+    """Groups tickers by the shard owning them
+
+    Args:
+        tickers (str or list): Comma separated str or list of tickers
+
+    Returns:
+        dict: Workers as keys and lists of their tickers as values
+    """
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    grouped = {}
+    with membership_lock:
+        for ticker in tickers:
+            ticker = ticker.strip().lower()
+            if ticker:
+                owner = assignment.get(ticker) or ring.node_for(ticker)
+                grouped.setdefault(workers[owner], []).append(ticker)
+    return grouped
+
+
+def range_query(column):
+    """Forwards a range query to the shards owning the requested tickers, or to every shard"""
+    tickers = request.args.get("tickers")
+    params = request.args.to_dict()
+    if not tickers:
+        return fan_out_all("GET", f"/{column}", range_has_data, params=params)
+    calls = [
+        (worker, "GET", f"/{column}", {"params": dict(params, tickers=",".join(owned))})
+        for worker, owned in owners(tickers).items()
+    ]
+    return merge(fan_out(calls), range_has_data)
+
+
+def start_worker(index, tickers):
+    """Starts shard{index} on port base_port + index, without waiting for it
+
+    Args:
+        index (int): Shard number
+        tickers (list): Tickers the shard loads on startup
+
+    Returns:
+        Worker: Started shard
+    """
+    port = args.base_port + index
+    command = [
+        sys.executable,
+        SERVER_PATH,
+        "--shard",
+        "--port",
+        str(port),
+        "--minutes",
+        str(args.minutes),
+        "--storage",
+        args.storage,
+        "--threads",
+        str(args.threads),
+        "--router_url",
+        f"http://127.0.0.1:{args.port}",
+        *(["--no_backfill"] if args.no_backfill else []),
+        "--tickers",
+        *tickers,
+    ]
+    logging.info("Starting shard%s on port %s with %s", index, port, tickers)
+    return Worker(f"shard{index}", port, subprocess.Popen(command))
+
+
+def wait_ready(worker, timeout=300):
+    """Waits until a shard answers requests
+
+    Raises:
+        RuntimeError: If the shard exits or does not answer within timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if worker.process.poll() is not None:
+            raise RuntimeError(f"Shard {worker.name} exited on startup")
+        try:
+            if session.get(f"{worker.url}/", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    worker.process.kill()
+    raise RuntimeError(f"Shard {worker.name} did not start")
+
+
+def stop_worker(worker):
+    worker.process.terminate()
+    try:
+        worker.process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        worker.process.kill()
+    logging.info("Stopped %s", worker.name)
+
+
+def rebalance():
+    """Moves every ticker whose owner changed on the ring to its new shard.
+    The old shard saves and unloads the ticker before the new one loads it, so each ticker's
+    journal only ever has one writer. The moved ticker is missing from answers in between.
+
+    Returns:
+        int: Number of tickers moved
+    """
+    moved = 0
+    for ticker, current in sorted(assignment.items()):
+        owner = ring.node_for(ticker)
+        if owner == current:
+            continue
+        if current in workers:
+            forward(workers[current], "POST", f"/unload_ticker/{ticker}")
+        body, _ = forward(workers[owner], "POST", f"/load_ticker/{ticker}")
+        if body == 0:
+            assignment[ticker] = owner
+        else:
+            logging.error("Could not move %s to %s: %s", ticker, owner, body)
+            assignment.pop(ticker)
+        moved += 1
+    logging.info("Rebalanced %d tickers across %s", moved, ring.nodes)
+    return moved
+
+
+def add_worker():
+    """Starts a new empty shard, puts it on the ring and moves its tickers to it"""
+    global next_worker
+    with membership_lock:
+        index = next_worker
+        next_worker += 1
+    # queries keep being answered while the new shard starts
+    worker = start_worker(index, [])
+    wait_ready(worker)
+    with membership_lock:
+        workers[worker.name] = worker
+        ring.add(worker.name)
+        rebalance()
+
+
+def remove_worker(name):
+    """Takes a shard off the ring, moves its tickers to the other shards and stops it
+
+    Returns:
+        bool: False if the shard is unknown or the last one
+    """
+    with membership_lock:
+        if name not in workers or len(workers) == 1:
+            return False
+        ring.remove(name)
+        rebalance()
+        stop_worker(workers.pop(name))
+        return True
+
+
+def worker_table():
+    """Returns every shard with its url and tickers"""
+    with membership_lock:
+        return {
+            name: {
+                "url": worker.url,
+                "tickers": sorted(
+                    ticker for ticker, owner in assignment.items() if owner == name
+                ),
+            }
+            for name, worker in workers.items()
+        }
+
+
+def create_app():
+    """Creates the router's Flask app, with the same endpoints as the server plus /workers
+
+    Returns:
+        Flask: Flask app
+    """
+    app = Flask(__name__)
+    api = Api(app)
+    api.add_resource(HomePage, "/")
+    api.add_resource(Price, "/price/<query_datetime>")
+    api.add_resource(Signal, "/signal/<query_datetime>")
+    api.add_resource(PriceRange, "/price")
+    api.add_resource(SignalRange, "/signal")
+    api.add_resource(Batch, "/batch")
+    api.add_resource(Screen, "/screen/<query_datetime>")
+    api.add_resource(AddTicker, "/add_ticker/<ticker>")
+    api.add_resource(DelTicker, "/del_ticker/<ticker>")
+    api.add_resource(History, "/history/<ticker>")
+    api.add_resource(Reset, "/reset")
+    api.add_resource(CacheStats, "/cache_stats")
+    api.add_resource(Ready, "/ready")
+    api.add_resource(Stream, "/stream")
+    api.add_resource(Metrics, "/metrics")
+    api.add_resource(Profile, "/profile", "/profile/<int:sample_every>")
+    api.add_resource(Workers, "/workers", "/workers/<name>")
+    return app
+
+
+def at_exit():
+    for worker in list(workers.values()):
+        stop_worker(worker)
+
+
+def at_terminate(signum, frame):
+    # exits through atexit so the shards are stopped too
+    sys.exit(0)
+
+
+# Shards by name, ticker to shard name, and the lock held while either changes
+workers = {}
+assignment = {}
+membership_lock = threading.RLock()
+next_worker = 0
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    logging.info(args)
+    tickers = list(dict.fromkeys(ticker.lower() for ticker in args.tickers))
+    invalid = [ticker for ticker in tickers if not is_valid_symbol(ticker)]
+    if invalid:
+        parser.error(f"invalid tickers: {', '.join(invalid)}")
+    if args.calls_per_minute < 1:
+        parser.error("--calls_per_minute must be at least 1")
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=args.threads * 4)
+    session.mount("http://", adapter)
+    executor = ThreadPoolExecutor(max_workers=args.threads * 4)
+
+    storage = get_storage(args.storage)
+    migrate(storage)
+    fetcher = HistoryFetcher(
+        interval=args.minutes,
+        storage=storage,
+        calls_per_minute=args.calls_per_minute,
+        cache=HistoryCache(
+            ttl=args.history_cache_ttl,
+            max_bytes=int(args.history_cache_size * 2**20),
+        ),
+    )
+    # stored tickers are backfilled by their shards instead of being downloaded again
+    fetcher.fetch_all(
+        [ticker for ticker in tickers if args.no_backfill or not storage.exists(ticker)]
+    )
+
+    next_worker = max(1, args.workers)
+    ring = HashRing(f"shard{index}" for index in range(next_worker))
+    owned = ring.assign(storage.tickers())
+    atexit.register(at_exit)
+    signal.signal(signal.SIGTERM, at_terminate)
+    for index in range(next_worker):
+        worker = start_worker(index, owned[f"shard{index}"])
+        workers[worker.name] = worker
+        assignment.update((ticker, worker.name) for ticker in owned[worker.name])
+    # shards load their data in parallel
+    for worker in workers.values():
+        wait_ready(worker)
+
+    logging.info("Router started with %s", worker_table())
+    print(f"Router started with {len(workers)} shards...accepting requests from client")
+    serve(create_app(), listen=f"*:{args.port}", threads=args.threads)
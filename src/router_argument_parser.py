@@ -0,0 +1,83 @@
+import argparse
+
+parser = argparse.ArgumentParser(
+    description="Run the trading server as shards in several worker processes behind one router"
+)
+
+parser.add_argument(
+    "-t",
+    "--tickers",
+    nargs="*",
+    default=["aapl"],
+    help="US tickers to download on startup and spread across the shards. Tickers already in storage are loaded as well. Default is AAPL.",
+)
+parser.add_argument(
+    "-w",
+    "--workers",
+    type=int,
+    default=2,
+    help="Number of shard processes started. Shards can be added with POST /workers and removed with DELETE /workers/<name>. Default is 2.",
+)
+parser.add_argument(
+    "-p",
+    "--port",
+    type=int,
+    default=8000,
+    help="Network port for the router, clients connect to it as to a single server. Default is 8000.",
+)
+parser.add_argument(
+    "-bp",
+    "--base_port",
+    type=int,
+    default=8100,
+    help="Shards listen on 127.0.0.1 from this port upwards, one port per shard. Default is 8100.",
+)
+parser.add_argument(
+    "-m",
+    "--minutes",
+    type=int,
+    default=5,
+    help="Interval of time periods in minutes, passed to every shard. Default is 5.",
+)
+parser.add_argument(
+    "-s",
+    "--storage",
+    type=str,
+    default="npy",
+    choices=["npy", "csv"],
+    help="Storage backend in data/, shared by every shard. Default is npy.",
+)
+parser.add_argument(
+    "-c",
+    "--calls_per_minute",
+    type=int,
+    default=5,
+    help="Alpha Vantage calls allowed per minute. Every download goes through the router, so the quota is shared by all shards. Default is 5.",
+)
+parser.add_argument(
+    "-th",
+    "--threads",
+    type=int,
+    default=8,
+    help="Request threads of the router and of every shard. Default is 8.",
+)
+parser.add_argument(
+    "-hct",
+    "--history_cache_ttl",
+    type=float,
+    default=3600,
+    help="Seconds an Alpha Vantage history response is cached in data/cache/, the router downloads for every shard. Adding a ticker again within that time, e.g. after deleting it, reuses the cached response without an Alpha Vantage call, unless the add asks for a refresh. 0 disables the cache. Default is 3600.",
+)
+parser.add_argument(
+    "-hcs",
+    "--history_cache_size",
+    type=float,
+    default=100,
+    help="Size limit of the Alpha Vantage history cache in MB, the least recently used responses are evicted beyond it. Default is 100.",
+)
+parser.add_argument(
+    "-nb",
+    "--no_backfill",
+    action="store_true",
+    help="Disables backfilling. By default stored tickers are not downloaded again on startup, the shards download the rows missing since their last stored row through the router, and the rows missed during a realtime polling outage once quotes arrive again. With this option stored --tickers are downloaded again in full on startup.",
+)
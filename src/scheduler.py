@@ -0,0 +1,51 @@
+import logging
+import threading
+import time
+
+logging = logging.getLogger()
+
+
+class IntervalScheduler:
+    """Runs a job on a background thread at every wall-clock multiple of `interval` seconds,
+    e.g. at :00, :05, :10 for 5 minutes, so the schedule never drifts by the job's duration.
+    A run that would start while the previous one is still going is skipped, not queued.
+    """
+
+    def __init__(self, interval, job, name="scheduler"):
+        self.interval = interval
+        self.job = job
+        self.stopped = threading.Event()
+        self.skipped = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def next_run(self, now):
+        """Returns the first interval boundary after now, in seconds since the epoch"""
+        return (now // self.interval + 1) * self.interval
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self, timeout=30):
+        """Stops scheduling and waits up to timeout seconds for a running job to finish"""
+        self.stopped.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def _run(self):
+        scheduled = self.next_run(time.time())
+        while not self.stopped.wait(max(0, scheduled - time.time())):
+            try:
+                self.job()
+            except Exception as e:
+                logging.error("Scheduled %s failed: %s", self.job.__name__, e)
+            finished = time.time()
+            missed = int((finished - scheduled) // self.interval)
+            if missed:
+                self.skipped += missed
+                logging.warning(
+                    "%s took %.1fs, skipping %d missed run(s)",
+                    self.job.__name__,
+                    finished - scheduled,
+                    missed,
+                )
+            scheduled = self.next_run(max(finished, scheduled))
@@ -0,0 +1,329 @@
+import numpy as np
+import pandas as pd
+
+from utils import position_and_pnl
+
+# In-memory dtype of every column, 13 bytes a row
+DTYPES = {"datetime": np.int64, "price": np.float32, "signal": np.int8}
+# Appends grow the columns by GROWTH times their length, and by at least GROWTH_ROWS rows
+GROWTH = 1.25
+GROWTH_ROWS = 256
+# float32 holds every cent below this price, appended prices from it on are kept as float64
+FLOAT32_CENTS = 2**17
+
+
+def decode_prices(prices):
+    """Converts float32 prices back to the float64 decimals they were quoted with.
+    float32 keeps 4 decimals below 1000 and cents up to 131072, encode_prices keeps the prices
+    it cannot give back as float64.
+
+    Args:
+        prices (ndarray or numpy.float32): Prices
+
+    Returns:
+        ndarray or numpy.float64: Prices as float64
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    return np.where(np.abs(prices) < 1000, np.round(prices, 4), np.round(prices, 2))
+
+
+def encode_prices(prices):
+    """Converts prices to float32 when decode_prices gives every one of them back, otherwise
+    keeps them as float64, e.g. BRK.A's prices in cents
+
+    Args:
+        prices (ndarray): Prices
+
+    Returns:
+        ndarray: float32 or float64 prices
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    compact = prices.astype(DTYPES["price"])
+    if np.array_equal(decode_prices(compact), prices, equal_nan=True):
+        return compact
+    return prices
+
+
+def fits_float32(price):
+    """Returns True when decode_prices gives a price back from float32, encode_prices for one
+    price without the overhead of arrays
+
+    Args:
+        price (float): Price
+
+    Returns:
+        bool: True if the price can be stored as float32
+    """
+    if not abs(price) < FLOAT32_CENTS:
+        return False
+    compact = float(np.float32(price))
+    return round(compact, 4 if abs(compact) < 1000 else 2) == price
+
+
+class TickerSeries:
+    """Compact in-memory history of one ticker: UTC epoch nanoseconds as int64, prices as float32
+    (float64 when float32 cannot hold them exactly) and signals as int8. S_avg, sigma, position and pnl are not kept, TickerState carries what
+    the next quote needs and pnl is recomputed from prices and signals when the history is saved.
+
+    Rows older than the retention window are dropped from memory once they are saved. `spilled`
+    then names the (storage, ticker) they live in, and queries reaching before the first row in
+    memory read them from the storage backend on demand.
+
+    Columns are preallocated buffers grown geometrically, so appends are amortized O(1) and
+    allocate nothing until the buffer is full. append() writes the new row past the end of the
+    series and returns a new series one row longer sharing the buffer, so published series never
+    see a write. The signal of a series' last row, known once the next price arrives, is written
+    to the buffer by the append after it, so every series reads its last row's signal from
+    `last_signal` instead of the buffer. retain() returns a new series as well.
+    """
+
+    def __init__(self, datetime, price, signal, spilled=None):
+        self.buffer = Buffer(
+            {"datetime": datetime, "price": price, "signal": signal}, len(datetime)
+        )
+        self.length = len(datetime)
+        self.last_signal = int(signal[-1]) if len(signal) else 0
+        self.spilled = spilled
+
+    @property
+    def datetime(self):
+        """Epoch nanoseconds, a view of the buffer without a copy"""
+        return self.buffer.columns["datetime"][: self.length]
+
+    @property
+    def price(self):
+        """float32 or float64 prices, a view of the buffer without a copy"""
+        return self.buffer.columns["price"][: self.length]
+
+    @property
+    def signal(self):
+        """int8 signals, a copy as the buffer may hold the next series' signal at the last row.
+        values("signal", positions) reads a few rows without copying the column.
+        """
+        signal = self.buffer.columns["signal"][: self.length].copy()
+        if self.length:
+            signal[-1] = self.last_signal
+        return signal
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds a series from a DataFrame with a sorted UTC DatetimeIndex, price and signal"""
+        return cls(
+            df.index.values.astype("datetime64[ns]").view(DTYPES["datetime"]),
+            encode_prices(df["price"].to_numpy(dtype=np.float64)),
+            df["signal"].to_numpy(dtype=DTYPES["signal"]),
+        )
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def index(self):
+        """datetime64[ns] view of the datetimes, without a copy"""
+        return self.datetime.view("datetime64[ns]")
+
+    def values(self, column, positions=slice(None)):
+        """Returns a column's values at positions, prices as float64
+
+        Args:
+            column (str): price or signal
+            positions (slice or int or ndarray, optional): Rows to return. Defaults to every row.
+        """
+        if column == "signal":
+            return self._signals(positions)
+        values = getattr(self, column)[positions]
+        if column == "price" and values.dtype == np.float32:
+            values = decode_prices(values)
+        return values
+
+    def _signals(self, positions):
+        """Returns the signals at positions, the last row's from last_signal"""
+        signal = self.buffer.columns["signal"][: self.length]
+        last = self.length - 1
+        if isinstance(positions, slice):
+            start, stop, step = positions.indices(self.length)
+            values = signal[positions]
+            if last in range(start, stop, step):
+                values = values.copy()
+                values[(last - start) // step] = self.last_signal
+            return values
+        if np.ndim(positions) == 0:
+            if positions in (last, -1):
+                return signal.dtype.type(self.last_signal)
+            return signal[positions]
+        positions = np.asarray(positions)
+        return np.where(
+            (positions == last) | (positions == -1), self.last_signal, signal[positions]
+        ).astype(signal.dtype)
+
+    def memory_usage(self):
+        """Returns the bytes held by the column buffers in memory, spare capacity included"""
+        return sum(column.nbytes for column in self.buffer.columns.values())
+
+    def append(self, quote_datetime, price, previous_signal):
+        """Returns a new series with a row appended, the signal of the last row is set to
+        previous_signal as it is only known once the next price arrives
+
+        Args:
+            quote_datetime (numpy.datetime64): UTC datetime of the new row
+            price (float): Price of the new row
+            previous_signal (int): Signal of the current last row
+        """
+        buffer = self.buffer
+        # a price float32 cannot hold moves every price to float64
+        widen = buffer.columns["price"].dtype == np.float32 and not fits_float32(price)
+        # an older series sharing the buffer must not overwrite the rows appended after it
+        if widen or buffer.rows != self.length or buffer.capacity == self.length:
+            buffer = buffer.grown(
+                self.length,
+                max(self.length + GROWTH_ROWS, int(self.length * GROWTH)),
+                {"price": np.float64} if widen else None,
+            )
+        columns = buffer.columns
+        columns["datetime"][self.length] = np.datetime64(quote_datetime, "ns").astype(
+            np.int64
+        )
+        columns["price"][self.length] = price
+        columns["signal"][self.length] = 0
+        # past the end of this series, which keeps reading its last row's signal from last_signal
+        if self.length >= 2:
+            columns["signal"][self.length - 1] = previous_signal
+        buffer.rows = self.length + 1
+
+        series = TickerSeries.__new__(TickerSeries)
+        series.buffer = buffer
+        series.length = buffer.rows
+        series.last_signal = 0
+        series.spilled = self.spilled
+        return series
+
+    def set_signals(self, start, signals):
+        """Sets the signals from row start onwards, only on a series not published yet
+
+        Args:
+            start (int): First row to set
+            signals (ndarray): Signals of the rows from start to the last one
+        """
+        self.buffer.columns["signal"][start : self.length] = signals
+        if len(signals):
+            self.last_signal = int(signals[-1])
+
+    def merge(self, datetimes, prices):
+        """Returns a new series with rows inserted at their sorted positions. Inserted rows have
+        a 0 signal, the caller recomputes the signals from the row before the first one onwards.
+
+        Args:
+            datetimes (ndarray): Epoch nanoseconds of the new rows
+            prices (ndarray): Prices of the new rows
+
+        Returns:
+            tuple: (TickerSeries, position of the first inserted row)
+        """
+        merged = np.concatenate([self.datetime, datetimes])
+        order = np.argsort(merged, kind="stable")
+        first = int(np.flatnonzero(order >= self.length)[0])
+        series = TickerSeries(
+            merged[order],
+            encode_prices(np.concatenate([self.values("price"), prices])[order]),
+            np.concatenate([self.signal, np.zeros(len(datetimes), DTYPES["signal"])])[
+                order
+            ],
+            self.spilled,
+        )
+        return series, first
+
+    def read_spilled(self):
+        """Reads the rows before the first one in memory from the storage backend
+
+        Returns:
+            TickerSeries: Stored rows, empty when nothing was dropped from memory
+        """
+        if self.spilled is None:
+            return TickerSeries(*(np.empty(0, dtype) for dtype in DTYPES.values()))
+        storage, ticker = self.spilled
+        columns = storage.columns(ticker)
+        datetimes = columns["datetime"].view(np.int64)
+        end = (
+            int(datetimes.searchsorted(self.datetime[0], side="left"))
+            if len(self)
+            else len(datetimes)
+        )
+        return TickerSeries(
+            datetimes[:end], columns["price"][:end], columns["signal"][:end]
+        )
+
+    def retain(self, start, spilled):
+        """Drops the rows before start from memory, they must already be saved to storage
+
+        Args:
+            start (numpy.datetime64 or None): First UTC datetime kept, None keeps every row
+            spilled (tuple): (storage, ticker) the dropped rows are read from
+
+        Returns:
+            TickerSeries: This series if no row is dropped, a new one otherwise
+        """
+        if start is None:
+            return self
+        end = int(
+            self.datetime.searchsorted(
+                np.datetime64(start, "ns").astype(np.int64), side="left"
+            )
+        )
+        if end == 0:
+            return self
+        # copies, so the dropped rows are freed with the old series
+        return TickerSeries(
+            self.datetime[end:].copy(),
+            self.price[end:].copy(),
+            self.signal[end:].copy(),
+            spilled,
+        )
+
+    def to_frame(self):
+        """Builds the full history, spilled rows included, with pnl recomputed for storage
+
+        Returns:
+            df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex, price, signal and pnl
+        """
+        older = self.read_spilled()
+        price = np.concatenate([older.values("price"), self.values("price")])
+        signal = np.concatenate([older.signal, self.signal]).astype(np.int64)
+        _, pnl = position_and_pnl(price, signal)
+        return pd.DataFrame(
+            {"price": price, "signal": signal, "pnl": pnl},
+            index=pd.DatetimeIndex(
+                np.concatenate([older.index, self.index]), name="datetime"
+            ),
+        )
+
+
+class Buffer:
+    """Preallocated columns shared by a series and the ones appended from it.
+    rows is the length of the newest of them, the only one allowed to append in place.
+    """
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+    @property
+    def capacity(self):
+        return len(self.columns["datetime"])
+
+    def grown(self, rows, capacity, dtypes=None):
+        """Returns a new buffer with the first rows copied and room for capacity rows
+
+        Args:
+            rows (int): Rows to copy
+            capacity (int): Rows the new buffer holds
+            dtypes (dict, optional): New dtypes of some columns. Defaults to keeping every dtype.
+        """
+        columns = {}
+        for column, values in self.columns.items():
+            dtype = (dtypes or {}).get(column, values.dtype)
+            columns[column] = np.empty(capacity, dtype=dtype)
+            if column == "price" and values.dtype != dtype:
+                columns[column][:rows] = decode_prices(values[:rows])
+            else:
+                columns[column][:rows] = values[:rows]
+        return Buffer(columns, rows)
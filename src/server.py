@@ -1,28 +1,56 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 import sys, os
 from os import walk
 import atexit
+import signal
+import threading
 
-import pandas as pd
-from flask import Flask
+import numpy as np
+from flask import Flask, Response, g, request
 from flask_restful import Api, Resource
 from waitress import serve
 
 from server_argument_parser import parser
+from storage import get_storage, migrate, clear, is_valid_symbol
+from fetcher import HistoryFetcher, QuotePoller, RouterHistory
+from store import SnapshotStore, TickerLocks
+from series import TickerSeries
+from panel import Panel, prepare_panel
+from journal import TickJournal
+from cache import HistoryCache, ResponseCache
+from stream import Broadcaster, row_event
+from profiler import Profiler
+from scheduler import IntervalScheduler
+from metrics import (
+    REGISTRY,
+    REQUEST_LATENCY,
+    REQUESTS,
+    REQUESTS_IN_FLIGHT,
+    TICK_DURATION,
+    TICKER_UPDATE_DURATION,
+    LAST_QUOTE,
+    QUOTE_STALENESS,
+    TICKER_ROWS,
+    TICKER_MEMORY,
+    CACHE,
+    HISTORY_CACHE,
+)
 
 from utils import (
-    add_ticker,
-    get_realtime_quote,
     calculate_signal_and_pnl,
     calculate_avg_and_sigma,
-    convert_utc_datetime,
+    parse_query_datetime,
     get_price,
     get_signal,
+    get_range,
+    get_asof,
+    append_quote,
+    merge_history,
+    TickerState,
+    COMPACT_ROWS,
 )
-import threading
 import time
-import requests
 
 # Create Data and logs folder if they don't already exist
 if not os.path.exists("data/"):
@@ -38,6 +66,29 @@ logging.basicConfig(
     level=logging.INFO,
 )
 
+FIELDS = ["price", "signal"]
+INVALID_DATETIME = "Invalid datetime format, should be YYYY-MM-DD-HH:MM or now"
+INVALID_TICKERS = "Invalid tickers, should be a list of symbols or a comma separated str"
+LOADING = "Loading"
+
+# Samples requests and update ticks for profiling, enabled by --profile or PUT /profile/<N>
+profiler = Profiler()
+# Set once the server runs, stopped on exit
+scheduler = None
+journal = None
+# Panel of the current snapshot, built on first use
+panel = None
+# Startup status of the tickers not yet fully loaded: loading (not queryable yet), refreshing
+# (stored copy served while a fresh history downloads) or failed. Ready tickers are removed.
+load_status = {}
+# Tickers whose missing rows are being downloaded, see backfill()
+backfilling = set()
+# RouterHistory of a shard started by src/router.py, backfill downloads go through it
+router = None
+# Held while a ticker's stored files are written, read back or deleted, see TickerLocks
+ticker_locks = TickerLocks()
+
+
 # Classes for Flask-restful routes/endpoints
 class HomePage(Resource):
     def get(self):
@@ -46,244 +97,976 @@ class HomePage(Resource):
 
 class Price(Resource):
     def get(self, query_datetime):
-        if query_datetime.lower() == "now":
-            query_datetime = datetime.now().strftime("%Y-%m-%d-%H:%M")
-        elif (
-            datetime.strptime(convert_utc_datetime(query_datetime), "%Y-%m-%d-%H:%M")
-            > datetime.now()
-        ):
+        try:
+            query_datetime = parse_query_datetime(query_datetime)
+        except ValueError:
+            return INVALID_DATETIME, 400
+        if query_datetime > np.datetime64(datetime.utcnow()):
             return "Server has no data"
-        else:
-            query_datetime = convert_utc_datetime(query_datetime)
-
-        response = {}
+        return cached_response("price", query_datetime, get_price)
 
-        for symbol in data:
-            response[symbol] = get_price(data[symbol], query_datetime=query_datetime)
 
-        values = list(set(response.values()))
-        if len(values) == 1 and values[0] == "No Data":
+class Signal(Resource):
+    def get(self, query_datetime):
+        try:
+            query_datetime = parse_query_datetime(query_datetime)
+        except ValueError:
+            return INVALID_DATETIME, 400
+        if query_datetime > np.datetime64(datetime.utcnow()):
             return "Server has no data"
-        else:
-            return response
+        return cached_response("signal", query_datetime, get_signal)
 
 
-class Signal(Resource):
+class Stream(Resource):
+    def get(self):
+        tickers = request.args.get("tickers")
+        # without ?tickers the client gets every ticker, also the ones still loading or added later
+        subscriber = broadcaster.subscribe(
+            requested_symbols(tickers, {}) if tickers else None
+        )
+        if subscriber is None:
+            return "Too many stream clients", 503
+        return Response(
+            broadcaster.events(subscriber),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+class CacheStats(Resource):
+    def get(self):
+        return response_cache.stats()
+
+
+class Screen(Resource):
     def get(self, query_datetime):
-        if query_datetime.lower() == "now":
-            query_datetime = datetime.now().strftime("%Y-%m-%d-%H:%M")
-        elif (
-            datetime.strptime(convert_utc_datetime(query_datetime), "%Y-%m-%d-%H:%M")
-            > datetime.now()
-        ):
+        try:
+            query_datetime = parse_query_datetime(query_datetime)
+            signal = int(request.args.get("signal", 1))
+        except ValueError:
+            return "Invalid datetime or signal, signal should be -1, 0 or 1", 400
+        if query_datetime > np.datetime64(datetime.utcnow()):
             return "Server has no data"
-        else:
-            query_datetime = convert_utc_datetime(query_datetime)
+        snapshot = store.snapshot()
+        data = snapshot.data
+        current = current_panel(snapshot)
+        symbols = current.select(query_datetime, signal)
+        for symbol in current.missing(query_datetime):
+            # rows before the first one in memory
+            if (
+                data[symbol].spilled is not None
+                and get_signal(data[symbol], query_datetime) == signal
+            ):
+                symbols.append(symbol)
+        return {symbol: signal for symbol in symbols}
 
-        response = {}
 
-        for symbol in data:
-            response[symbol] = get_signal(data[symbol], query_datetime=query_datetime)
+class Ready(Resource):
+    def get(self):
+        statuses = dict(load_status)
+        tickers = {symbol: "ready" for symbol in store.snapshot().data}
+        tickers.update(statuses)
+        ready = "loading" not in statuses.values()
+        return {"ready": ready, "tickers": tickers}, 200 if ready else 503
 
-        values = list(set(response.values()))
-        if len(values) == 1 and values[0] == "No Data":
-            return "Server has no data"
-        else:
-            return response
+
+class Metrics(Resource):
+    def get(self):
+        collect_metrics()
+        return Response(
+            REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
+class Profile(Resource):
+    def get(self):
+        return profiler.stats()
+
+    def put(self, sample_every=0):
+        profiler.sample_every = sample_every
+        logging.info("Profiling 1 in %s requests and ticks", sample_every)
+        return profiler.stats()
+
+
+class PriceRange(Resource):
+    def get(self):
+        return query_range("price")
+
+
+class SignalRange(Resource):
+    def get(self):
+        return query_range("signal")
+
+
+class Batch(Resource):
+    def post(self):
+        body = request.get_json(force=True, silent=True) or {}
+        try:
+            query_datetimes = np.array(
+                [parse_query_datetime(value) for value in body.get("timestamps", [])],
+                dtype="datetime64[ns]",
+            )
+        except (ValueError, AttributeError):
+            return INVALID_DATETIME, 400
+        tickers = body.get("tickers")
+        if tickers and not is_ticker_list(tickers):
+            return INVALID_TICKERS, 400
+        fields = [field for field in body.get("fields", FIELDS) if field in FIELDS]
+
+        data = store.snapshot().data
+        response = {}
+        for symbol in requested_symbols(tickers, data):
+            if symbol not in data:
+                response[symbol] = missing(symbol)
+                continue
+            response[symbol] = {
+                field: get_asof(data[symbol], field, query_datetimes)
+                for field in fields
+            }
+        return response
 
 
 class DelTicker(Resource):
     def delete(self, ticker):
         ticker = ticker.lower()
-        if ticker in data.keys():
-            del data[ticker]
-            data_files = [file for file in list(walk("data/"))[0][2] if ticker in file]
-            for file in data_files:
-                if os.path.exists(f"data/{file}"):
-                    os.remove(f"data/{file}")
-                else:
+        if not is_valid_symbol(ticker):
+            return 2
+        with store.lock:
+            # a ticker still loading on startup is cancelled, the loader drops it when done
+            loading = load_status.pop(ticker, None) is not None
+        # waits for an add, load or compaction of the ticker to finish
+        with ticker_locks(ticker):
+            if not drop_ticker(ticker) and not loading:
+                return 2
+            try:
+                journal.delete(ticker)
+                if not storage.delete(ticker):
                     logging.error(
                         f"Historical data file not found on server for ticker: {ticker}"
                     )
+            except OSError as e:
+                logging.error("Error while deleting ticker %s: %s", ticker, e)
+                return 1
             return 0
-        elif ticker not in data.keys():
-            return 2
-        else:
-            return 1
 
 
 class AddTicker(Resource):
     def post(self, ticker):
         ticker = ticker.lower()
+        if not is_valid_symbol(ticker):
+            return 2
         try:
-            add_ticker_status = add_ticker(ticker, args.minutes)
-            if add_ticker_status == "Invalid ticker":
-                return 2
-            elif add_ticker_status == "Server error":
-                return 1
-            data[ticker] = pd.read_csv(f"data/{ticker}_result.csv", header=0)
+            # ?refresh=1 downloads again even if the history is cached
+            refresh = request.args.get("refresh", "").lower() in ("1", "true", "yes")
+            # a delete of the same ticker waits until it is saved and loaded, a shard downloads
+            # through the router's quota and saves the history itself
+            with ticker_locks(ticker):
+                add_ticker_status = (router or fetcher).fetch(
+                    ticker, retries=0, refresh=refresh
+                )
+                if add_ticker_status == "Invalid ticker":
+                    return 2
+                elif add_ticker_status == "Server error":
+                    return 1
+                load_ticker(ticker)
             return 0
         except Exception as e:
             logging.error("Error while adding ticker")
             return 1
 
 
+class LoadTicker(Resource):
+    def post(self, ticker):
+        ticker = ticker.lower()
+        if not is_valid_symbol(ticker):
+            return 2
+        with ticker_locks(ticker):
+            if not storage.exists(ticker):
+                return 2
+            try:
+                load_ticker(ticker)
+                return 0
+            except Exception as e:
+                logging.error("Error while loading ticker %s: %s", ticker, e)
+                return 1
+
+
+class UnloadTicker(Resource):
+    def post(self, ticker):
+        ticker = ticker.lower()
+        if not is_valid_symbol(ticker):
+            return 2
+        with ticker_locks(ticker), store.lock:
+            if ticker not in store.snapshot().data:
+                return 2
+            # saves realtime quotes so the process loading the ticker next starts from them
+            try:
+                compact([ticker])
+            except OSError as e:
+                logging.error("Error while saving ticker %s: %s", ticker, e)
+                return 1
+            drop_ticker(ticker)
+            return 0
+
+
 class Reset(Resource):
     def put(self):
-        global data
-        data = dict()
-        try:
-            data_files = list(walk("data/"))[0][2]
-            for file in data_files:
-                if os.path.exists(f"data/{file}"):
-                    os.remove(f"data/{file}")
-                else:
-                    logging.error(f"Error resetting server data")
-            return 0
-        except Exception as e:
-            logging.error("Error while resetting server data")
-            return 1
+        # waits for every add, load, backfill or compaction in progress, and holds back new ones
+        # until the data directory is empty
+        with ticker_locks.all(), store.lock:
+            store.publish({})
+            states.clear()
+            load_status.clear()
+            response_cache.clear()
+            LAST_QUOTE.clear()
+            TICKER_UPDATE_DURATION.clear()
+            journal.close()
+            try:
+                clear(storage.data_dir)
+                return 0
+            except Exception as e:
+                logging.error("Error while resetting server data: %s", e)
+                return 1
+
 
+def cached_response(endpoint, query_datetime, lookup):
+    """Answers a price or signal query for every ticker, from the response cache when possible.
+    Responses are cached per (endpoint, query minute, snapshot version).
 
-def load_data():
-    """Function to load historical data from csv files
+    Args:
+        endpoint (str): price or signal
+        query_datetime (numpy.datetime64): UTC datetime
+        lookup (function): get_price or get_signal
 
     Returns:
-        dict: dictionary with keys are symbol and DataFrame as values
+        dict or str: Dict with symbols as keys and values, 'Loading' for tickers still loading on
+            startup. Or 'Server has no data'
     """
-    data = dict()
-    data_files = [file for file in list(walk("data/"))[0][2] if "_result.csv" in file]
-    for file in data_files:
-        symbol = file.split("_")[0]
-        df = pd.read_csv("data/" + file, header=0)
-        data[symbol] = df
-    return data
+    snapshot = store.snapshot()
+    key = (endpoint, query_datetime.astype("datetime64[m]"), snapshot.version)
+    response = response_cache.get(key)
+    if response is not None:
+        return response
 
+    data = snapshot.data
+    if args.panel:
+        response = current_panel(snapshot).cross_section(endpoint, query_datetime)
+        for symbol, value in response.items():
+            if value == "No Data" and data[symbol].spilled is not None:
+                # rows before the first one in memory
+                response[symbol] = lookup(data[symbol], query_datetime=query_datetime)
+    else:
+        response = {}
+        for symbol in data:
+            response[symbol] = lookup(data[symbol], query_datetime=query_datetime)
+    for symbol in loading_symbols():
+        response[symbol] = LOADING
 
-def update_data():
-    """Function to get realtime data every X minutes from Finnhub for every symbol and append to internal data structure.
-    Returns None
+    values = list(set(response.values()))
+    if len(values) == 1 and values[0] == "No Data":
+        response = "Server has no data"
+    response_cache.put(key, response)
+    return response
+
+
+def current_panel(snapshot):
+    """Returns the Panel of a snapshot. Update ticks append their rows to the panel, see
+    append_panel(), otherwise it is built on first use after a ticker is loaded, unloaded,
+    backfilled or compacted.
     """
-    for symbol in data.copy():
-        logging.info("Getting realtime data for: %s", symbol)
-        try:
-            realtime_quote = get_realtime_quote(symbol)
-        except Exception as e:
-            logging.error(e)
-            continue
-        try:
-            df = data[symbol]
-        except KeyError as e:
-            logging.error(e)
+    global panel
+    current = panel
+    if current is None or current.version != snapshot.version:
+        current = Panel(snapshot.version, snapshot.data)
+        if panel is None or panel.version < current.version:
+            panel = current
+    return current
+
+
+def append_panel(snapshot, changed):
+    """Moves the Panel of the snapshot before snapshot on to it by appending the rows an update
+    tick added, instead of building it from every series on the next query. Called while holding
+    the store's lock, right after publishing snapshot.
+
+    Args:
+        snapshot (Snapshot): Snapshot just published
+        changed (dict): Symbols as keys and the TickerSeries with a quote appended as values
+    """
+    global panel
+    current = panel
+    if current is not None and current.version == snapshot.version - 1:
+        panel = current.append(snapshot.version, changed)
+
+
+def is_ticker_list(tickers):
+    """Returns True for a comma separated str or a list of str, the forms tickers are requested in"""
+    return isinstance(tickers, str) or (
+        isinstance(tickers, list) and all(isinstance(ticker, str) for ticker in tickers)
+    )
+
+
+def requested_symbols(tickers, data):
+    """Returns the lower cased symbols requested, or every loaded or loading symbol when none are given
+
+    Args:
+        tickers (str or list or None): Comma separated str or list of tickers
+        data (Mapping): Snapshot data with symbols as keys
+
+    Returns:
+        list: List of symbols
+    """
+    if not tickers:
+        return list(dict.fromkeys([*data, *loading_symbols()]))
+    if isinstance(tickers, str):
+        tickers = tickers.split(",")
+    return [ticker.strip().lower() for ticker in tickers if ticker.strip()]
+
+
+def query_range(column):
+    """Answers a range query from the request arguments from, to and tickers.
+    from defaults to the first row and to defaults to now.
+
+    Args:
+        column (str): Column to return, price or signal
+
+    Returns:
+        dict or str: Dict with symbols as keys and columnar dicts as values. Or error message
+    """
+    try:
+        start = request.args.get("from")
+        start = parse_query_datetime(start) if start else None
+        end = parse_query_datetime(request.args.get("to", "now"))
+    except ValueError:
+        return INVALID_DATETIME, 400
+
+    data = store.snapshot().data
+    response = {}
+    for symbol in requested_symbols(request.args.get("tickers"), data):
+        if symbol in data:
+            response[symbol] = get_range(data[symbol], column, start, end)
+        else:
+            response[symbol] = missing(symbol)
+
+    if not any(
+        value == LOADING or isinstance(value, dict) and value["datetime"]
+        for value in response.values()
+    ):
+        return "Server has no data"
+    return response
+
+
+def loading_symbols():
+    """Returns the symbols not queryable yet because they are still loading on startup"""
+    return [
+        symbol for symbol, status in list(load_status.items()) if status == "loading"
+    ]
+
+
+def missing(symbol):
+    """Returns the answer for a symbol that is not loaded, 'Loading' or 'No Data'"""
+    return LOADING if load_status.get(symbol) == "loading" else "No Data"
+
+
+def set_load_status(ticker, status):
+    """Sets a ticker's startup status, None once it is ready, and drops cached answers showing the old one"""
+    if status is None:
+        load_status.pop(ticker, None)
+    else:
+        load_status[ticker] = status
+    response_cache.clear()
+
+
+def prepare_data(df):
+    """Calculates S_avg, sigma, signal, pnl and position for a DataFrame loaded from storage
+
+    Args:
+        df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex and price
+
+    Returns:
+        df (DataFrame): DataFrame with all analytics columns
+    """
+    df = calculate_avg_and_sigma(df, interval=args.minutes)
+    return calculate_signal_and_pnl(df)
+
+
+def retention_start():
+    """Returns the first UTC datetime kept in memory, None when every row is kept"""
+    if args.retention_days <= 0:
+        return None
+    return np.datetime64(datetime.utcnow(), "ns") - np.timedelta64(
+        int(args.retention_days * 24 * 3600), "s"
+    )
+
+
+def read_history(ticker):
+    """Reads a stored ticker and replays its journaled realtime quotes on top
+
+    Args:
+        ticker (str): Stock symbol
+
+    Returns:
+        tuple: (DataFrame as stored, DataFrame with the journal replayed)
+    """
+    stored = storage.load(ticker)
+    return stored, journal.replay(ticker, stored)
+
+
+def to_series(ticker, stored, df):
+    """Builds the in-memory history of a ticker from its history with analytics.
+    Only the rows within the retention window are kept in memory.
+
+    Args:
+        ticker (str): Stock symbol
+        stored (DataFrame): History as stored, its rows can be read back from storage
+        df (DataFrame): Full history processed by prepare_data or prepare_panel
+
+    Returns:
+        tuple: (TickerSeries, TickerState)
+    """
+    series = TickerSeries.from_frame(df)
+    start = retention_start()
+    if start is not None and len(stored):
+        # journaled quotes are not in storage yet, they are never dropped
+        start = min(start, stored.index.values[-1])
+    return series.retain(start, (storage, ticker)), TickerState.from_frame(
+        df, args.minutes
+    )
+
+
+def load_history(ticker):
+    """Loads a stored ticker with its journaled realtime quotes replayed on top.
+    Analytics run over the full history, only the rows within the retention window are kept in memory.
+
+    Args:
+        ticker (str): Stock symbol
+
+    Returns:
+        tuple: (TickerSeries, TickerState)
+    """
+    stored, df = read_history(ticker)
+    return to_series(ticker, stored, prepare_data(df))
+
+
+def load_data(symbols=None):
+    """Function to load historical data from the storage backend, with journaled realtime quotes replayed on top
+
+    Args:
+        symbols (list, optional): Symbols to load. Defaults to every stored symbol.
+
+    Returns:
+        dict: dictionary with symbols as keys and (TickerSeries, TickerState) tuples as values
+    """
+    if symbols is None:
+        symbols = storage.tickers()
+    symbols = [symbol for symbol in symbols if storage.exists(symbol)]
+    if not args.panel:
+        return {symbol: load_history(symbol) for symbol in symbols}
+    # analytics for every symbol in one vectorized pass
+    histories = {symbol: read_history(symbol) for symbol in symbols}
+    prepared = prepare_panel(
+        {symbol: df for symbol, (_, df) in histories.items()}, args.minutes
+    )
+    return {
+        symbol: to_series(symbol, stored, prepared[symbol])
+        for symbol, (stored, _) in histories.items()
+    }
+
+
+def load_ticker(ticker, pending=False):
+    """Loads a stored ticker, replays its journal and publishes it, replacing any loaded copy
+
+    Args:
+        ticker (str): Stock symbol
+        pending (bool, optional): Publishes only if the ticker still has a startup status, so a
+            ticker deleted or reset while loading is not brought back. Defaults to False.
+
+    Returns:
+        bool: True if the ticker was published
+    """
+    return publish_ticker(ticker, *load_history(ticker), pending=pending)
+
+
+def publish_ticker(ticker, series, state, pending=False):
+    """Publishes a loaded ticker, replacing any loaded copy
+
+    Args:
+        ticker (str): Stock symbol
+        series (TickerSeries): Ticker's history in memory
+        state (TickerState): Ticker's incremental analytics state
+        pending (bool, optional): Publishes only if the ticker still has a startup status. Defaults to False.
+
+    Returns:
+        bool: True if the ticker was published
+    """
+    with store.lock:
+        if pending and ticker not in load_status:
+            return False
+        states[ticker] = state
+        store.update(changed={ticker: series})
+        response_cache.clear()
+        return True
+
+
+def drop_ticker(ticker):
+    """Removes a ticker from memory, leaving its stored data and journal in place
+
+    Args:
+        ticker (str): Stock symbol
+
+    Returns:
+        bool: True if the ticker was loaded
+    """
+    with store.lock:
+        if ticker not in store.snapshot().data:
+            return False
+        store.update(removed=[ticker])
+        states.pop(ticker, None)
+        response_cache.clear()
+        LAST_QUOTE.remove(ticker=ticker)
+        TICKER_UPDATE_DURATION.remove(ticker=ticker)
+        return True
+
+
+def compact(symbols):
+    """Saves the histories of symbols to storage, empties their journals and drops the rows
+    older than the retention window from memory
+
+    Args:
+        symbols (list): Symbols to compact
+    """
+    for symbol in symbols:
+        with ticker_locks(symbol), store.lock:
+            data = store.snapshot().data
+            if symbol not in data:
+                continue
+            storage.save(symbol, data[symbol].to_frame())
+            journal.truncate(symbol)
+            series = data[symbol].retain(retention_start(), (storage, symbol))
+            if series is not data[symbol]:
+                store.update(changed={symbol: series})
+            logging.info("Compacted journal of %s into storage", symbol)
+
+
+def gap_slots(since, until):
+    """Returns the number of interval slots strictly between two datetimes, the slots a ticker
+    with rows at since and until has no row for
+
+    Args:
+        since (numpy.datetime64): UTC datetime
+        until (numpy.datetime64): UTC datetime
+
+    Returns:
+        int: Empty slots
+    """
+    slot = args.minutes * 60 * 10**9
+    since = np.datetime64(since, "ns").astype(np.int64)
+    until = np.datetime64(until, "ns").astype(np.int64)
+    return max(0, int(until // slot - since // slot) - 1)
+
+
+def backfill(tickers):
+    """Downloads the rows missing from the tickers' histories, e.g. after downtime or a realtime
+    polling outage, and merges them into memory and storage. Compact Alpha Vantage responses are
+    requested when they reach back far enough, and only the analytics from the first merged row
+    onwards are recomputed.
+
+    Args:
+        tickers (dict): Symbols as keys and the UTC datetimes of their last row before the gap as values
+    """
+    for ticker, since in tickers.items():
+        # compact answers with the last COMPACT_ROWS rows up to now, enough when fewer slots
+        # passed since the gap started, closed market slots have no row
+        slots = gap_slots(since, datetime.utcnow())
+        outputsize = "compact" if slots < COMPACT_ROWS else "full"
+        df = (router or fetcher).download(ticker, outputsize=outputsize)
+        if isinstance(df, str):
+            logging.error("Could not backfill %s: %s", ticker, df)
             continue
-        # appends realtime quote to existing interal data structure
-        df.at[df.shape[0] + 1, ("datetime", "price")] = (
-            realtime_quote["datetime"],
-            realtime_quote["price"],
+        with ticker_locks(ticker), store.lock:
+            data = store.snapshot().data
+            if ticker not in data:
+                # deleted while downloading
+                continue
+            series, state, inserted = merge_history(
+                data[ticker], states[ticker], df, args.minutes
+            )
+            if not inserted:
+                logging.info("No rows to backfill for %s", ticker)
+                continue
+            states[ticker] = state
+            store.update(changed={ticker: series})
+            response_cache.clear()
+            # saves the merged history and empties the journal, which only holds appended quotes
+            compact([ticker])
+        logging.info(
+            "Backfilled %d rows for %s from a %s download", inserted, ticker, outputsize
         )
-        df["datetime"] = pd.to_datetime(df["datetime"])
-        df = calculate_avg_and_sigma(df, interval=args.minutes)
-        df = calculate_signal_and_pnl(df)
-        data[symbol] = df
 
 
-def main():
-    """Creates and runs Flask app through waitress.
-    Runs a loop on a separate thread to continously update data every X minutes after server startup
+def can_backfill():
+    """Returns True unless backfilling is turned off, or the server is a shard with no router
+    to download through"""
+    return not args.no_backfill and (not args.shard or router is not None)
+
+
+def start_backfill(tickers):
+    """Runs backfill() on a background thread for the tickers not already being backfilled
+
+    Args:
+        tickers (dict): Symbols as keys and the UTC datetimes of their last row before the gap as values
+    """
+    with store.lock:
+        tickers = {
+            ticker: until
+            for ticker, until in tickers.items()
+            if ticker not in backfilling
+        }
+        backfilling.update(tickers)
+    if not tickers:
+        return
+
+    def run():
+        try:
+            backfill(tickers)
+        except Exception as e:
+            logging.error("Error while backfilling %s: %s", list(tickers), e)
+        finally:
+            with store.lock:
+                backfilling.difference_update(tickers)
+
+    threading.Thread(target=run, name="backfill", daemon=True).start()
+
+
+def update_data():
+    """Function to get realtime data every X minutes from Finnhub for every symbol concurrently and append to internal data structure.
+    Returns None
+    """
+    with profiler.profile("tick"):
+        start = time.perf_counter()
+        quotes = poller.poll(list(store.snapshot().data))
+        with store.lock:
+            data = store.snapshot().data
+            changed = {}
+            events = []
+            gaps = {}
+            for symbol, realtime_quote in quotes.items():
+                try:
+                    series = data[symbol]
+                    state = states[symbol]
+                except KeyError as e:
+                    # ticker deleted while its quote was being fetched
+                    logging.error(e)
+                    continue
+                # appends realtime quote to a copy of the ticker's series, only the new row is calculated
+                append_start = time.perf_counter()
+                changed[symbol] = append_quote(series, state, realtime_quote)
+                if changed[symbol] is not series:
+                    if len(series) and gap_slots(
+                        series.index[-1], realtime_quote["datetime"]
+                    ):
+                        # quotes were missed, the rows before this one are backfilled
+                        gaps[symbol] = series.index[-1]
+                    journal.append(
+                        symbol, realtime_quote["datetime"], realtime_quote["price"]
+                    )
+                    events.append(row_event(symbol, changed[symbol], state.last_pnl))
+                append_seconds = time.perf_counter() - append_start
+                TICKER_UPDATE_DURATION.observe(
+                    poller.latencies.get(symbol, 0) + append_seconds, ticker=symbol
+                )
+            # one fsync per journal per tick
+            journal.sync()
+            snapshot = store.update(changed=changed)
+            response_cache.clear()
+            if args.panel:
+                append_panel(
+                    snapshot,
+                    {
+                        symbol: series
+                        for symbol, series in changed.items()
+                        if series is not data[symbol]
+                    },
+                )
+        for symbol in changed:
+            LAST_QUOTE.set(time.time(), ticker=symbol)
+        for event in events:
+            broadcaster.publish(event)
+        if gaps and can_backfill():
+            start_backfill(gaps)
+        if args.compact_every > 0:
+            compact(
+                [
+                    symbol
+                    for symbol in changed
+                    if journal.count(symbol) >= args.compact_every
+                ]
+            )
+        elapsed = time.perf_counter() - start
+        TICK_DURATION.observe(elapsed)
+        logging.info("Tick for %d tickers took %.3fs", len(quotes), elapsed)
+
+
+def collect_metrics():
+    """Sets the per ticker and cache gauges from the current snapshot, before /metrics is rendered"""
+    data = store.snapshot().data
+    now = time.time()
+    for metric in (TICKER_ROWS, TICKER_MEMORY, QUOTE_STALENESS):
+        metric.clear()
+    for symbol, series in data.items():
+        TICKER_ROWS.set(len(series), ticker=symbol)
+        TICKER_MEMORY.set(series.memory_usage(), ticker=symbol)
+        last_quote = LAST_QUOTE.get(ticker=symbol)
+        if last_quote is None and len(series):
+            # epoch nanoseconds, UTC
+            last_quote = series.datetime[-1] / 1e9
+        if last_quote is not None:
+            QUOTE_STALENESS.set(now - last_quote, ticker=symbol)
+    for stat, value in response_cache.stats().items():
+        CACHE.set(value, stat=stat)
+    if fetcher.cache is not None:
+        for stat, value in fetcher.cache.stats().items():
+            HISTORY_CACHE.set(value, stat=stat)
+
+
+def request_route():
+    """Returns the route pattern of the current request, so every datetime shares one series"""
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def create_app():
+    """Creates the Flask app with every endpoint registered
+
+    Returns:
+        Flask: Flask app
     """
     app = Flask(__name__)
     api = Api(app)
     api.add_resource(HomePage, "/")
     api.add_resource(Price, "/price/<query_datetime>")
     api.add_resource(Signal, "/signal/<query_datetime>")
+    api.add_resource(PriceRange, "/price")
+    api.add_resource(SignalRange, "/signal")
+    api.add_resource(Batch, "/batch")
     api.add_resource(AddTicker, "/add_ticker/<ticker>")
     api.add_resource(DelTicker, "/del_ticker/<ticker>")
+    api.add_resource(LoadTicker, "/load_ticker/<ticker>")
+    api.add_resource(UnloadTicker, "/unload_ticker/<ticker>")
     api.add_resource(Reset, "/reset")
+    api.add_resource(CacheStats, "/cache_stats")
+    api.add_resource(Ready, "/ready")
+    api.add_resource(Screen, "/screen/<query_datetime>")
+    api.add_resource(Stream, "/stream")
+    api.add_resource(Metrics, "/metrics")
+    api.add_resource(Profile, "/profile", "/profile/<int:sample_every>")
 
-    @app.before_first_request
-    def activate_job():
-        def run_job():
-            """Task to update realtime data every X minutes"""
-            last_data_update = datetime.now()
-            while True:
-                next_data_update = last_data_update + timedelta(
-                    seconds=args.minutes * 60
-                )
-                if last_data_update < next_data_update:
-                    update_data()
-                    logging.info("Updated realtime data for subscribed tickers")
-                    last_data_update = datetime.now()
-                    time.sleep(args.minutes * 60)
-
-        thread = threading.Thread(target=run_job)
-        thread.start()
-
-    def start_runner():
-        """Function to get the @app.before_first_request job started when server starts up.
-        Server makes a request to itself to get the task started.
-        """
-
-        def start_loop():
-            not_started = True
-            while not_started:
-                try:
-                    r = requests.get(url=f"http://127.0.0.1:{args.port}/")
-                    if r.status_code == 200:
-                        not_started = False
-                except:
-                    time.sleep(2)
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(method=request.method, route=request_route())
+        g.profile = profiler.start("request", f"{request.method}_{request_route()}")
 
-        thread = threading.Thread(target=start_loop)
-        thread.start()
+    @app.after_request
+    def count_request(response):
+        REQUESTS.inc(
+            method=request.method, route=request_route(), status=response.status_code
+        )
+        return response
+
+    @app.teardown_request
+    def stop_request_timer(exception):
+        if "request_start" not in g:
+            return
+        profiler.stop(g.profile)
+        REQUESTS_IN_FLIGHT.dec(method=request.method, route=request_route())
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - g.request_start,
+            method=request.method,
+            route=request_route(),
+        )
+
+    return app
 
-    start_runner()
+
+def main():
+    """Creates and runs Flask app through waitress.
+    Updates data on a scheduler thread at every multiple of X minutes until the server stops
+    """
+    global scheduler
+    app = create_app()
+    scheduler = IntervalScheduler(args.minutes * 60, update_data)
+    scheduler.start()
 
     logging.info("Trading server started")
     print("Trading server started...accepting requests from client")
-    serve(app, listen=f"*:{args.port}")
+    try:
+        serve(app, listen=f"*:{args.port}", threads=args.threads)
+    finally:
+        scheduler.stop()
 
 
 def server_start_up_tasks():
-    """Startup tasks to run when the server starts.
+    """Startup tasks, run on a background thread while the server already answers requests.
+    Every ticker becomes queryable as soon as it is loaded, /ready reports the progress.
     Tasks:
-    - add historical data from list of tickers provided
+    - one-shot conversion of csv files (including the reload file) to the storage backend
+    - load the stored tickers, the ones being downloaded again are served from storage meanwhile
+    - add historical data from list of tickers provided, concurrently within the Alpha Vantage quota
+    - backfill the rows missing since the last stored row of the stored tickers, instead of
+      downloading their whole history again
     - if reload file provided and that symbol is in tickers provided, it loads from reload file
+    A shard only loads the stored tickers it owns, src/router.py downloads and migrates data.
+    A shard backfills its tickers through the router's quota.
     """
-    tickers = [ticker for ticker in args.tickers if ticker != reload_symbol]
-    for ticker in tickers:
-        add_ticker(
-            ticker=ticker,
-            interval=args.minutes,
+    if args.shard:
+        stored, downloads = args.tickers, []
+    else:
+        migrate(storage)
+        stored = storage.tickers()
+        downloads = [
+            ticker
+            for ticker in args.tickers
+            if ticker != reload_symbol
+            and (args.no_backfill or not storage.exists(ticker))
+        ]
+    for ticker in dict.fromkeys([*stored, *downloads]):
+        set_load_status(ticker, "loading")
+
+    if args.panel:
+        try:
+            loaded = load_data(
+                [ticker for ticker in stored if load_status.get(ticker) == "loading"]
+            )
+        except Exception as e:
+            # loaded one by one below instead
+            logging.error("Error while loading stored tickers together: %s", e)
+            loaded = {}
+        for ticker, (series, state) in loaded.items():
+            if publish_ticker(ticker, series, state, pending=True):
+                set_load_status(ticker, "refreshing" if ticker in downloads else None)
+
+    for ticker in stored:
+        if load_status.get(ticker) != "loading":
+            continue
+        try:
+            with ticker_locks(ticker):
+                if storage.exists(ticker) and load_ticker(ticker, pending=True):
+                    set_load_status(
+                        ticker, "refreshing" if ticker in downloads else None
+                    )
+                elif ticker not in downloads:
+                    set_load_status(ticker, "failed: not stored")
+        except Exception as e:
+            logging.error("Error while loading ticker %s: %s", ticker, e)
+            set_load_status(ticker, "failed: could not load")
+
+    def downloaded(ticker, status):
+        with ticker_locks(ticker):
+            if ticker not in load_status:
+                # deleted or reset while downloading
+                storage.delete(ticker)
+                return
+            if status is not None and ticker in store.snapshot().data:
+                logging.error("Serving stored history of %s: %s", ticker, status)
+                set_load_status(ticker, None)
+                return
+            try:
+                if status is None and load_ticker(ticker, pending=True):
+                    set_load_status(ticker, None)
+                elif status is not None:
+                    set_load_status(ticker, f"failed: {status}")
+            except Exception as e:
+                logging.error("Error while loading ticker %s: %s", ticker, e)
+                set_load_status(ticker, "failed: could not load")
+
+    fetcher.fetch_all(
+        [ticker for ticker in downloads if ticker in load_status], callback=downloaded
+    )
+    if can_backfill():
+        data = store.snapshot().data
+        now = datetime.utcnow()
+        start_backfill(
+            {
+                ticker: data[ticker].index[-1]
+                for ticker in stored
+                if ticker not in downloads
+                and ticker in data
+                and len(data[ticker])
+                and gap_slots(data[ticker].index[-1], now)
+            }
         )
+    logging.info("Startup loading done, %s", load_status or "every ticker is ready")
 
 
 def at_keyboard_interrupt():
+    """Stops the update scheduler, letting a running update finish, and flushes the journal"""
+    if scheduler is not None:
+        scheduler.stop()
+    if journal is not None:
+        journal.close()
+    logging.info("Server stopped")
+
+
+def at_terminate(signum, frame):
+    # waitress stops serving on SystemExit, so a terminated server shuts down like an interrupted one
     sys.exit(0)
 
 
 atexit.register(at_keyboard_interrupt)
+signal.signal(signal.SIGTERM, at_terminate)
 
 if __name__ == "__main__":
     # parses initial arguments, lower case all tickers and file names
     args = parser.parse_args()
     logging.info(args)
     args.reload = args.reload.lower()
-    if len(args.tickers) > 3:
-        print("Max of 3 tickers. Processing first 3 only ")
-        args.tickers = [args.tickers[i].lower() for i in range(3)]
-    else:
-        args.tickers = [ticker.lower() for ticker in args.tickers]
+    args.tickers = list(dict.fromkeys(ticker.lower() for ticker in args.tickers))
+    invalid = [ticker for ticker in args.tickers if not is_valid_symbol(ticker)]
+    if invalid:
+        parser.error(f"invalid tickers: {', '.join(invalid)}")
+    if args.calls_per_minute < 1:
+        parser.error("--calls_per_minute must be at least 1")
+    profiler.sample_every = args.profile
 
     try:
         # If reload file on server, it will load from there otherwise does nothing
+        storage = get_storage(args.storage)
+        fetcher = HistoryFetcher(
+            interval=args.minutes,
+            storage=storage,
+            calls_per_minute=args.calls_per_minute,
+            workers=args.fetch_workers,
+            cache=HistoryCache(
+                ttl=args.history_cache_ttl,
+                max_bytes=int(args.history_cache_size * 2**20),
+            ),
+            locks=ticker_locks,
+        )
+        if args.router_url:
+            router = RouterHistory(
+                args.router_url, args.minutes, storage, locks=ticker_locks
+            )
+        poller = QuotePoller(
+            workers=args.poll_workers,
+            timeout=args.quote_timeout,
+            deadline=args.tick_deadline,
+            stagger=args.stagger,
+        )
         data_files = list(walk("data/"))[0][2]
-        if args.reload in data_files:
-            reload_symbol = args.reload.split("_")[0]
-        else:
+        reload_symbol = args.reload.split("_")[0] if args.reload else None
+        if args.reload not in data_files and not (
+            reload_symbol and storage.exists(reload_symbol)
+        ):
             reload_symbol = None
-
-        server_start_up_tasks()
-        data = load_data()
+        journal = TickJournal()
+        # starts empty, tickers are published one by one as they load
+        states = {}
+        store = SnapshotStore({})
+        response_cache = ResponseCache(maxsize=args.cache_size)
+        # every stream client holds a waitress thread, so leave at least half of them for requests
+        broadcaster = Broadcaster(max_subscribers=max(1, args.threads // 2))
+        threading.Thread(
+            target=server_start_up_tasks, name="startup", daemon=True
+        ).start()
         main()
     except KeyboardInterrupt:
         logging.error("Server Terminated")
@@ -1,13 +1,13 @@
 import argparse
 
 parser = argparse.ArgumentParser(description="Process arguments when server starts")
- 
+
 parser.add_argument(
     "-t",
     "--tickers",
-    nargs="+",
+    nargs="*",
     default=["aapl"],
-    help="If specified, download data for all the US tickers specified. If this option is not specified, the server will download data for ticker 'AAPL' (Max of 3 tickers)",
+    help="If specified, download data for all the US tickers specified. If this option is not specified, the server will download data for ticker 'AAPL'",
 )
 parser.add_argument(
     "-p",
@@ -31,4 +31,125 @@ parser.add_argument(
     choices=[5, 15, 30, 60],
     help="It specifies the sample data being downloaded. It only accepts (5,15,30,60) as inputs, and default value is 5.",
 )
- 
+parser.add_argument(
+    "-s",
+    "--storage",
+    type=str,
+    default="npy",
+    choices=["npy", "csv"],
+    help="It specifies how historical data is stored in data/. npy stores typed columns in binary .npy files, csv stores {ticker}_result.csv files. Default is npy, existing csv files are converted on startup.",
+)
+parser.add_argument(
+    "-c",
+    "--calls_per_minute",
+    type=int,
+    default=5,
+    help="It specifies the Alpha Vantage API quota. Historical data downloads are paced to stay within this many calls per minute. Default is 5.",
+)
+parser.add_argument(
+    "-w",
+    "--fetch_workers",
+    type=int,
+    default=5,
+    help="It specifies how many historical data downloads run concurrently, capped by --calls_per_minute. Default is 5.",
+)
+parser.add_argument(
+    "-pw",
+    "--poll_workers",
+    type=int,
+    default=8,
+    help="It specifies how many realtime quotes are requested from Finnhub concurrently. Default is 8.",
+)
+parser.add_argument(
+    "-qt",
+    "--quote_timeout",
+    type=float,
+    default=5,
+    help="Seconds before a single realtime quote request times out. Default is 5.",
+)
+parser.add_argument(
+    "-td",
+    "--tick_deadline",
+    type=float,
+    default=30,
+    help="Seconds allowed for all realtime quotes of one update. Quotes that arrive later are skipped until the next update. Default is 30.",
+)
+parser.add_argument(
+    "-sg",
+    "--stagger",
+    type=float,
+    default=5,
+    help="Updates run on wall-clock multiples of --minutes (e.g. :00, :05, :10). It specifies over how many seconds from the start of an update the realtime quote requests are spread, and should be below --tick_deadline. Default is 5.",
+)
+parser.add_argument(
+    "-cs",
+    "--cache_size",
+    type=int,
+    default=1024,
+    help="It specifies how many /price and /signal responses are cached. Cached responses are dropped whenever data changes. 0 disables the cache. Default is 1024.",
+)
+parser.add_argument(
+    "-th",
+    "--threads",
+    type=int,
+    default=8,
+    help="It specifies how many requests the server handles concurrently. Each /stream client holds one thread, and at most half of the threads are given to stream clients. Default is 8.",
+)
+parser.add_argument(
+    "-pf",
+    "--profile",
+    type=int,
+    default=0,
+    help="If specified, profiles 1 in every N requests and 1 in every N update ticks and writes cProfile .prof files and folded stacks for flamegraphs to logs/profiles/. It can be changed at runtime with PUT /profile/<N>. Default is 0, profiling disabled.",
+)
+parser.add_argument(
+    "-ce",
+    "--compact_every",
+    type=int,
+    default=288,
+    help="Realtime quotes are journaled to data/journal/ and replayed on restart. It specifies after how many journaled quotes a ticker is saved to storage and its journal emptied. 0 disables compaction. Default is 288, one day of 5 minute quotes.",
+)
+parser.add_argument(
+    "-rd",
+    "--retention_days",
+    type=float,
+    default=30,
+    help="It specifies how many days of history each ticker keeps in memory. Older rows are dropped from memory once saved to storage, on load and at every compaction, and read back from storage when a query reaches them. 0 keeps every row in memory. Default is 30.",
+)
+parser.add_argument(
+    "-pn",
+    "--panel",
+    action="store_true",
+    help="Panel mode. Stored tickers are loaded together on startup with their analytics computed in one vectorized pass over a 2D price matrix, and price and signal queries for every ticker are answered from one slice of a panel aligning all tickers on a shared timestamp axis, instead of one lookup per ticker.",
+)
+parser.add_argument(
+    "-hct",
+    "--history_cache_ttl",
+    type=float,
+    default=3600,
+    help="Seconds an Alpha Vantage history response is cached in data/cache/. Adding a ticker again within that time, e.g. after deleting it, reuses the cached response without an Alpha Vantage call, unless the add asks for a refresh. 0 disables the cache. Default is 3600.",
+)
+parser.add_argument(
+    "-hcs",
+    "--history_cache_size",
+    type=float,
+    default=100,
+    help="Size limit of the Alpha Vantage history cache in MB, the least recently used responses are evicted beyond it. Default is 100.",
+)
+parser.add_argument(
+    "-nb",
+    "--no_backfill",
+    action="store_true",
+    help="Disables backfilling. By default the rows missing since the last stored row of every stored ticker are downloaded and merged on startup, and the rows missed during a realtime polling outage once quotes arrive again, instead of downloading whole histories. With this option stored --tickers are downloaded again in full on startup.",
+)
+parser.add_argument(
+    "--shard",
+    action="store_true",
+    help="Runs the server as a shard started by src/router.py. Only the --tickers already in storage are loaded, nothing is downloaded or migrated on startup.",
+)
+parser.add_argument(
+    "-ru",
+    "--router_url",
+    default=None,
+    help="URL of the router that started this shard, set by src/router.py. Backfill downloads go through the router so every shard shares its Alpha Vantage quota. A shard without it does not backfill.",
+)
@@ -0,0 +1,68 @@
+import bisect
+import hashlib
+
+
+class HashRing:
+    """Consistent hash ring assigning keys to nodes.
+    Every node is placed on the ring at `replicas` points, so adding or removing a node only
+    moves the keys between it and its neighbours, about 1/N of the keys.
+    """
+
+    def __init__(self, nodes=(), replicas=100):
+        self.replicas = replicas
+        self.points = []
+        self.owners = {}
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key):
+        return int(hashlib.md5(key.encode()).hexdigest()[:16], 16)
+
+    @property
+    def nodes(self):
+        return sorted(set(self.owners.values()))
+
+    def add(self, node):
+        """Places node on the ring"""
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            if point not in self.owners:
+                bisect.insort(self.points, point)
+            self.owners[point] = node
+
+    def remove(self, node):
+        """Takes node off the ring"""
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            if self.owners.get(point) == node:
+                del self.owners[point]
+                self.points.remove(point)
+
+    def node_for(self, key):
+        """Returns the node owning key, the first node clockwise from the key's hash
+
+        Args:
+            key (str): Key such as a stock symbol
+
+        Returns:
+            str or None: Node, or None when the ring is empty
+        """
+        if not self.points:
+            return None
+        i = bisect.bisect(self.points, self._hash(key)) % len(self.points)
+        return self.owners[self.points[i]]
+
+    def assign(self, keys):
+        """Returns the owning node of every key
+
+        Args:
+            keys (iterable): Keys
+
+        Returns:
+            dict: Nodes as keys and lists of their keys as values, for every node on the ring
+        """
+        assignment = {node: [] for node in self.nodes}
+        for key in keys:
+            assignment[self.node_for(key)].append(key)
+        return assignment
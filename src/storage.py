@@ -0,0 +1,350 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from os import walk
+
+import numpy as np
+import pandas as pd
+
+from storage_argument_parser import parser
+from utils import NEW_YORK, UTC, set_utc_index
+
+logging = logging.getLogger()
+
+DATA_DIR = "data/"
+# Symbols name files and directories in the data directory: 1 to 10 letters, digits, dots or
+# dashes, starting with a letter or digit so that no symbol, such as .., names a path outside it
+SYMBOL = re.compile(r"[A-Za-z0-9][A-Za-z0-9.\-]{0,9}")
+# Directories in the data directory that ticker directories live next to, see TickJournal and
+# HistoryCache, no symbol may name them
+RESERVED = {"journal", "cache"}
+COLUMNS = {
+    "price": np.float64,
+    "signal": np.int64,
+    "pnl": np.float64,
+}
+
+
+def is_valid_symbol(symbol):
+    """Returns True if symbol can name a ticker's files in storage"""
+    return (
+        isinstance(symbol, str)
+        and SYMBOL.fullmatch(symbol) is not None
+        and symbol.lower() not in RESERVED
+    )
+
+
+def check_symbol(symbol):
+    """Raises ValueError if symbol cannot name a ticker's files in storage"""
+    if not is_valid_symbol(symbol):
+        raise ValueError(f"Invalid ticker symbol: {symbol!r}")
+
+
+class CsvStorage:
+    """Stores each ticker as {ticker}_result.csv and {ticker}_price.csv with New York datetimes.
+    This is the original format, kept for exports and reload files.
+    """
+
+    name = "csv"
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+
+    def tickers(self):
+        """Returns the list of symbols stored"""
+        return sorted(
+            file.split("_")[0]
+            for file in list(walk(self.data_dir))[0][2]
+            if file.endswith("_result.csv") and is_valid_symbol(file.split("_")[0])
+        )
+
+    def exists(self, ticker):
+        check_symbol(ticker)
+        return os.path.exists(f"{self.data_dir}{ticker}_result.csv")
+
+    def save(self, ticker, df):
+        """Saves DataFrame to {ticker}_result.csv and {ticker}_price.csv
+
+        Args:
+            ticker (str): Stock symbol
+            df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex, price, signal and pnl
+        """
+        check_symbol(ticker)
+        frame = df[list(COLUMNS)].reset_index(drop=True)
+        frame.insert(
+            0,
+            "datetime",
+            df.index.tz_localize(UTC).tz_convert(NEW_YORK).tz_localize(None),
+        )
+        frame.to_csv(f"{self.data_dir}{ticker}_result.csv", index=False)
+        frame[["datetime", "price"]].to_csv(
+            f"{self.data_dir}{ticker}_price.csv", index=False
+        )
+
+    def load(self, ticker):
+        """Loads DataFrame from {ticker}_result.csv
+
+        Args:
+            ticker (str): Stock symbol
+
+        Returns:
+            df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex, price, signal and pnl
+        """
+        check_symbol(ticker)
+        df = pd.read_csv(
+            f"{self.data_dir}{ticker}_result.csv", header=0, parse_dates=["datetime"]
+        )
+        return set_utc_index(df).astype(COLUMNS)
+
+    def columns(self, ticker):
+        """Loads the ticker's columns as arrays, empty if it is not stored
+
+        Returns:
+            dict: datetime as UTC datetime64[ns], price and signal arrays
+        """
+        if not self.exists(ticker):
+            return empty_columns()
+        df = self.load(ticker)
+        return {
+            "datetime": df.index.values,
+            "price": df["price"].to_numpy(),
+            "signal": df["signal"].to_numpy(),
+        }
+
+    def delete(self, ticker):
+        """Deletes every file for the ticker
+
+        Returns:
+            bool: True if any file was deleted
+        """
+        check_symbol(ticker)
+        deleted = False
+        for suffix in ["_result.csv", "_price.csv"]:
+            path = f"{self.data_dir}{ticker}{suffix}"
+            if os.path.exists(path):
+                os.remove(path)
+                deleted = True
+        return deleted
+
+
+class NumpyStorage:
+    """Stores each ticker as a data/{ticker}/ directory with one typed .npy file per column.
+    datetime is saved as UTC datetime64[ns], so loading is a binary read with no parsing.
+    """
+
+    name = "npy"
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+
+    def path(self, ticker, column):
+        check_symbol(ticker)
+        return f"{self.data_dir}{ticker}/{column}.npy"
+
+    def tickers(self):
+        """Returns the list of symbols stored"""
+        return sorted(
+            directory
+            for directory in list(walk(self.data_dir))[0][1]
+            if is_valid_symbol(directory)
+            and os.path.exists(self.path(directory, "datetime"))
+        )
+
+    def exists(self, ticker):
+        return os.path.exists(self.path(ticker, "datetime"))
+
+    def save(self, ticker, df):
+        """Saves each column of the DataFrame to its own .npy file.
+        Files are written to a temporary name first and then renamed.
+
+        Args:
+            ticker (str): Stock symbol
+            df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex, price, signal and pnl
+        """
+        check_symbol(ticker)
+        os.makedirs(f"{self.data_dir}{ticker}", exist_ok=True)
+        columns = {"datetime": df.index.values.astype("datetime64[ns]")}
+        for column, dtype in COLUMNS.items():
+            columns[column] = df[column].to_numpy(dtype=dtype)
+        # datetime is written last so a ticker only counts as stored once every column is complete
+        for column in [*COLUMNS, "datetime"]:
+            path = self.path(ticker, column)
+            with open(f"{path}.tmp", "wb") as file:
+                np.save(file, columns[column])
+            os.replace(f"{path}.tmp", path)
+
+    def load(self, ticker):
+        """Loads DataFrame from the ticker's .npy files
+
+        Args:
+            ticker (str): Stock symbol
+
+        Returns:
+            df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex, price, signal and pnl
+        """
+        index = pd.DatetimeIndex(
+            np.load(self.path(ticker, "datetime")), name="datetime"
+        )
+        return pd.DataFrame(
+            {column: np.load(self.path(ticker, column)) for column in COLUMNS},
+            index=index,
+        )
+
+    def columns(self, ticker):
+        """Memory maps the ticker's columns, only the pages read are loaded.
+        Saving replaces the files, so arrays mapped before keep the previous version.
+
+        Returns:
+            dict: datetime as UTC datetime64[ns], price and signal arrays, empty if it is not stored
+        """
+        try:
+            return {
+                column: np.load(self.path(ticker, column), mmap_mode="r")
+                for column in ["datetime", "price", "signal"]
+            }
+        except FileNotFoundError:
+            return empty_columns()
+
+    def delete(self, ticker):
+        """Deletes the ticker's directory
+
+        Returns:
+            bool: True if the ticker was stored
+        """
+        check_symbol(ticker)
+        if os.path.isdir(f"{self.data_dir}{ticker}"):
+            shutil.rmtree(f"{self.data_dir}{ticker}")
+            return True
+        return False
+
+
+def empty_columns():
+    return {
+        "datetime": np.empty(0, dtype="datetime64[ns]"),
+        "price": np.empty(0, dtype=COLUMNS["price"]),
+        "signal": np.empty(0, dtype=COLUMNS["signal"]),
+    }
+
+
+STORAGES = {storage.name: storage for storage in [NumpyStorage, CsvStorage]}
+
+
+def get_storage(name, data_dir=DATA_DIR):
+    """Creates the storage backend with the given name
+
+    Args:
+        name (str): npy or csv
+        data_dir (str, optional): Directory holding the data. Defaults to "data/".
+
+    Returns:
+        NumpyStorage or CsvStorage: Storage backend
+    """
+    return STORAGES[name](data_dir=data_dir)
+
+
+def clear(data_dir=DATA_DIR):
+    """Deletes every file and ticker directory in the data directory"""
+    _, directories, files = list(walk(data_dir))[0]
+    for file in files:
+        os.remove(f"{data_dir}{file}")
+    for directory in directories:
+        shutil.rmtree(f"{data_dir}{directory}")
+
+
+def migrate(storage, source=None, remove=True):
+    """Copies every ticker from the csv files in the data directory into storage
+
+    Args:
+        storage (NumpyStorage): Destination storage
+        source (CsvStorage, optional): Source storage. Defaults to csv files in the same directory.
+        remove (bool, optional): Remove the csv files once copied. Defaults to True.
+
+    Returns:
+        list: Symbols migrated
+    """
+    source = source or CsvStorage(data_dir=storage.data_dir)
+    if source.name == storage.name and source.data_dir == storage.data_dir:
+        return []
+    migrated = []
+    for ticker in source.tickers():
+        storage.save(ticker, source.load(ticker))
+        if remove:
+            source.delete(ticker)
+        logging.info(
+            "Migrated %s from %s to %s storage", ticker, source.name, storage.name
+        )
+        migrated.append(ticker)
+    return migrated
+
+
+def export_csv(storage, ticker, data_dir=DATA_DIR):
+    """Exports a stored ticker to {ticker}_result.csv and {ticker}_price.csv
+
+    Args:
+        storage (NumpyStorage): Storage holding the ticker
+        ticker (str): Stock symbol
+        data_dir (str, optional): Directory to write csv files to. Defaults to "data/".
+    """
+    CsvStorage(data_dir=data_dir).save(ticker, storage.load(ticker))
+
+
+def benchmark(rows):
+    """Times saving and loading a synthetic ticker with every storage backend in a scratch directory
+
+    Args:
+        rows (int): Number of rows in the synthetic ticker
+
+    Returns:
+        dict: Backend name as keys and save/load seconds, and load seconds per million rows as values
+    """
+    data_dir = tempfile.mkdtemp() + "/"
+    index = pd.date_range(
+        "2000-01-03 14:30", periods=rows, freq="5min", name="datetime"
+    )
+    df = pd.DataFrame(
+        {
+            "price": np.round(100 + np.random.default_rng(0).normal(0, 1, rows), 2),
+            "signal": np.random.default_rng(1).integers(-1, 2, rows),
+            "pnl": np.round(np.random.default_rng(2).normal(0, 1, rows), 2),
+        },
+        index=index,
+    )
+    results = {}
+    for name in STORAGES:
+        storage = get_storage(name, data_dir=data_dir)
+        start = time.perf_counter()
+        storage.save("bench", df)
+        saved = time.perf_counter()
+        storage.load("bench")
+        loaded = time.perf_counter()
+        results[name] = {
+            "save_seconds": saved - start,
+            "load_seconds": loaded - saved,
+            "load_seconds_per_million_rows": (loaded - saved) * 1_000_000 / rows,
+        }
+    shutil.rmtree(data_dir)
+    return results
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    storage = get_storage(args.storage, data_dir=args.data_dir)
+    if args.migrate:
+        print(
+            f"Migrated: {', '.join(migrate(storage, remove=not args.keep_csv)) or 'nothing'}"
+        )
+    if args.export:
+        for ticker in args.export:
+            export_csv(storage, ticker.lower(), data_dir=args.data_dir)
+            print(
+                f"Exported {ticker.lower()} to {args.data_dir}{ticker.lower()}_result.csv"
+            )
+    if args.benchmark:
+        for name, result in benchmark(args.benchmark).items():
+            print(
+                f"{name}: load {result['load_seconds_per_million_rows']:.3f}s per million rows "
+                f"(save {result['save_seconds']:.3f}s, load {result['load_seconds']:.3f}s for {args.benchmark} rows)"
+            )
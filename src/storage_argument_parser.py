@@ -0,0 +1,47 @@
+import argparse
+
+parser = argparse.ArgumentParser(description="Manage stored ticker history")
+
+parser.add_argument(
+    "-s",
+    "--storage",
+    type=str,
+    default="npy",
+    choices=["npy", "csv"],
+    help="Storage backend to migrate to or export from. Default is npy.",
+)
+parser.add_argument(
+    "-d",
+    "--data_dir",
+    type=str,
+    default="data/",
+    help="Directory holding the stored ticker history. Default is data/.",
+)
+parser.add_argument(
+    "-m",
+    "--migrate",
+    action="store_const",
+    const=True,
+    help="If specified, converts every {ticker}_result.csv file in the data directory to the storage backend.",
+)
+parser.add_argument(
+    "-k",
+    "--keep_csv",
+    action="store_const",
+    const=True,
+    help="If specified with --migrate, keeps the csv files after they are converted.",
+)
+parser.add_argument(
+    "-e",
+    "--export",
+    nargs="+",
+    metavar="TICKER",
+    help="If specified, exports the tickers to {ticker}_result.csv and {ticker}_price.csv in the data directory.",
+)
+parser.add_argument(
+    "-b",
+    "--benchmark",
+    type=int,
+    metavar="ROWS",
+    help="If specified, times saving and loading a synthetic ticker with ROWS rows in every storage backend.",
+)
@@ -0,0 +1,92 @@
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from types import MappingProxyType
+
+# version increases by one on every publish, data is a read-only mapping of symbol to TickerSeries
+Snapshot = namedtuple("Snapshot", ["version", "data"])
+
+
+class SnapshotStore:
+    """Holds an immutable snapshot of every ticker's TickerSeries.
+
+    Readers call snapshot() once and use the returned Snapshot without taking any lock, so they
+    always see one consistent version even while an update runs. Writers hold `lock`, build new
+    series instead of modifying published ones, and publish them with one reference swap.
+    """
+
+    def __init__(self, data=None):
+        self.lock = threading.RLock()
+        self._snapshot = Snapshot(0, MappingProxyType(dict(data or {})))
+
+    def snapshot(self):
+        """Returns the current Snapshot"""
+        return self._snapshot
+
+    def publish(self, data):
+        """Replaces every ticker with the series in data
+
+        Args:
+            data (dict): dictionary with symbols as keys and TickerSeries as values
+
+        Returns:
+            Snapshot: The published snapshot
+        """
+        with self.lock:
+            self._snapshot = Snapshot(
+                self._snapshot.version + 1, MappingProxyType(dict(data))
+            )
+            return self._snapshot
+
+    def update(self, changed=None, removed=()):
+        """Publishes a snapshot with some tickers replaced, added or removed
+
+        Args:
+            changed (dict, optional): Symbols as keys and new TickerSeries as values
+            removed (iterable, optional): Symbols to remove
+
+        Returns:
+            Snapshot: The published snapshot
+        """
+        with self.lock:
+            data = dict(self._snapshot.data)
+            data.update(changed or {})
+            for symbol in removed:
+                data.pop(symbol, None)
+            return self.publish(data)
+
+
+class TickerLocks:
+    """One reentrant lock per ticker, held while a ticker's stored files are written, read back or
+    deleted (adding, deleting, loading, compacting and backfilling) so these never interleave on
+    the same ticker. A ticker's lock is always taken before the SnapshotStore lock, never after,
+    and no thread holds two tickers' locks at once except through all().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def __call__(self, ticker):
+        """Returns the lock of a ticker, created on first use"""
+        lock = self._locks.get(ticker)
+        if lock is None:
+            # waits while all() holds every lock, so a new ticker cannot slip past it
+            with self._lock:
+                lock = self._locks.setdefault(ticker, threading.RLock())
+        return lock
+
+    @contextmanager
+    def all(self):
+        """Holds the lock of every ticker, waiting for whatever holds one of them to finish.
+        Tickers used for the first time meanwhile wait until every lock is released.
+        """
+        with self._lock:
+            locks = list(self._locks.values())
+            for lock in locks:
+                lock.acquire()
+            try:
+                yield
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
@@ -0,0 +1,117 @@
+import json
+import logging
+import queue
+import threading
+
+from utils import format_datetimes
+
+logging = logging.getLogger()
+
+
+class Subscriber:
+    """One streaming client with its own bounded queue of events"""
+
+    def __init__(self, tickers=None, maxsize=100):
+        self.tickers = set(tickers) if tickers else None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = False
+
+    def wants(self, event):
+        return self.tickers is None or event["ticker"] in self.tickers
+
+
+class Broadcaster:
+    """Fans out events to every subscribed streaming client.
+    publish never blocks, a client whose queue is full is dropped instead of slowing down updates.
+    """
+
+    def __init__(self, max_subscribers=16, queue_size=100):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.sequence = 0
+
+    def subscribe(self, tickers=None):
+        """Registers a new client
+
+        Args:
+            tickers (list, optional): Only stream events for these tickers. Defaults to every ticker.
+
+        Returns:
+            Subscriber or None: Subscriber, or None when max_subscribers clients are already connected
+        """
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(tickers, maxsize=self.queue_size)
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def publish(self, event):
+        """Queues event for every interested client, dropping clients that fell behind
+
+        Args:
+            event (dict): Event with at least a ticker key
+        """
+        with self.lock:
+            self.sequence += 1
+            event = dict(event, id=self.sequence)
+            for subscriber in list(self.subscribers):
+                if not subscriber.wants(event):
+                    continue
+                try:
+                    subscriber.queue.put_nowait(event)
+                except queue.Full:
+                    logging.warning("Dropping slow stream client")
+                    subscriber.dropped = True
+                    self.subscribers.discard(subscriber)
+
+    def events(self, subscriber, heartbeat=15):
+        """Generates Server-Sent Events for a subscriber until it disconnects or is dropped
+
+        Args:
+            subscriber (Subscriber): Subscriber returned by subscribe
+            heartbeat (int, optional): Seconds between keep-alive comments. Defaults to 15.
+
+        Yields:
+            str: Server-Sent Event
+        """
+        try:
+            yield ": connected\n\n"
+            while not subscriber.dropped:
+                try:
+                    event = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # also lets waitress notice clients that went away
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: quote\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def row_event(symbol, series, pnl):
+    """Builds the stream event for the last row of a ticker's history
+
+    Args:
+        symbol (str): Stock symbol
+        series (TickerSeries): Ticker's history in memory
+        pnl (float): pnl of the last row, from the ticker's TickerState
+
+    Returns:
+        dict: ticker, datetime, price, signal and pnl of the new row, and previous_signal,
+        the signal of the row before it which is only known once the new price arrives
+    """
+    return {
+        "ticker": symbol,
+        "datetime": format_datetimes(series.index[-1:])[0],
+        "price": float(series.values("price", -1)),
+        "signal": int(series.values("signal", -1)),
+        "previous_signal": int(series.values("signal", -2)) if len(series) > 1 else 0,
+        "pnl": pnl,
+    }
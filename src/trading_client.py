@@ -0,0 +1,229 @@
+import json
+import shlex
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Script commands that change server data, they never run concurrently with other commands
+MUTATING_COMMANDS = {"add_ticker", "del_ticker", "reset"}
+
+
+class TradingClient:
+    """Client for the trading server API.
+    Every call goes through one requests.Session, so connections are kept alive and reused.
+    """
+
+    def __init__(self, base_url="http://127.0.0.1:8000", timeout=15, pool_size=10):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        r = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        try:
+            return r.json()
+        except ValueError:
+            return r.text
+
+    def home(self):
+        """Checks the connection to the server
+
+        Returns:
+            str: 'Connected to trading server'
+        """
+        return self._request("GET", "/")
+
+    def get_price(self, datetime_input):
+        """Requests price for datetime provided
+
+        Args:
+            datetime_input (str): Datetime in string
+
+        Returns:
+            dict or str: Return dict with symbols as keys and prices as values. Or 'Server has no data'
+        """
+        return self._request("GET", f"/price/{datetime_input}")
+
+    def get_signal(self, datetime_input):
+        """Requests signal for datetime provided
+
+        Args:
+            datetime_input (str): Datetime in string
+
+        Returns:
+            dict or str: Return dict with symbols as keys and signal as values. Or 'Server has no data'
+        """
+        return self._request("GET", f"/signal/{datetime_input}")
+
+    def get_range(self, field, start, end, tickers=None):
+        """Requests all prices or signals between start and end
+
+        Args:
+            field (str): price or signal
+            start (str): Start datetime in string
+            end (str): End datetime in string
+            tickers (list, optional): Tickers to query. Defaults to every ticker on the server.
+
+        Returns:
+            dict or str: Return dict with symbols as keys and columnar dicts of datetime and field as values
+        """
+        params = {"from": start, "to": end}
+        if tickers:
+            params["tickers"] = ",".join(tickers)
+        return self._request("GET", f"/{field}", params=params)
+
+    def get_batch(self, datetimes, tickers=None):
+        """Requests price and signal as of every datetime provided
+
+        Args:
+            datetimes (list): Datetimes in string
+            tickers (list, optional): Tickers to query. Defaults to every ticker on the server.
+
+        Returns:
+            dict or str: Return dict with symbols as keys and dicts of price and signal lists as values
+        """
+        body = {"timestamps": datetimes}
+        if tickers:
+            body["tickers"] = tickers
+        return self._request("POST", "/batch", json=body)
+
+    def screen(self, datetime_input, signal=1):
+        """Requests every ticker whose signal equals signal at datetime provided
+
+        Args:
+            datetime_input (str): Datetime in string
+            signal (int, optional): -1, 0 or 1. Defaults to 1.
+
+        Returns:
+            dict or str: Return dict with the matching symbols as keys and signal as values
+        """
+        return self._request(
+            "GET", f"/screen/{datetime_input}", params={"signal": signal}
+        )
+
+    def add_ticker(self, ticker, refresh=False):
+        """Requests to add ticker
+
+        Args:
+            ticker (str): Stock symbol
+            refresh (bool, optional): Download the history again even if the server has it cached. Defaults to False.
+
+        Returns:
+            int: 0=success, 1=server error, 2=invalid ticker
+        """
+        params = {"refresh": 1} if refresh else None
+        return self._request("POST", f"/add_ticker/{ticker}", params=params)
+
+    def del_ticker(self, ticker):
+        """Requests to delete ticker
+
+        Returns:
+            int: 0=success, 1=server error, 2=ticker not found
+        """
+        return self._request("DELETE", f"/del_ticker/{ticker}")
+
+    def reset(self):
+        """Requests to delete all data
+
+        Returns:
+            int: 0=success, 1=failure
+        """
+        return self._request("PUT", "/reset")
+
+    def follow(self, tickers=None):
+        """Streams new prices and signals as they are computed
+
+        Args:
+            tickers (list, optional): Tickers to follow. Defaults to every ticker on the server.
+
+        Yields:
+            dict or str: Stream events, or the error message if the server refused the stream
+        """
+        params = {"tickers": ",".join(tickers)} if tickers else {}
+        # server sends a keep-alive every 15 seconds, so a longer silence means the connection is gone
+        with self.session.get(
+            f"{self.base_url}/stream", params=params, stream=True, timeout=(15, 60)
+        ) as r:
+            if r.status_code != 200:
+                yield r.text
+                return
+            for line in r.iter_lines(decode_unicode=True):
+                if line.startswith("data:"):
+                    yield json.loads(line[len("data:") :])
+
+    def run_command(self, line):
+        """Runs one script command. Commands mirror the client options:
+        price DATETIME, signal DATETIME, price_range FROM TO [TICKER ...],
+        signal_range FROM TO [TICKER ...], batch DATETIME [DATETIME ...],
+        screen DATETIME [SIGNAL], add_ticker TICKER, del_ticker TICKER, reset
+
+        Args:
+            line (str): Command line
+
+        Returns:
+            dict or str or int: Server response, or an error message for unknown commands
+        """
+        try:
+            command, *arguments = shlex.split(line)
+        except ValueError:
+            return f"Invalid command: {line}"
+        if command in ("price", "signal") and len(arguments) == 1:
+            return self._request("GET", f"/{command}/{arguments[0]}")
+        if command in ("price_range", "signal_range") and len(arguments) >= 2:
+            field = command.split("_")[0]
+            return self.get_range(field, arguments[0], arguments[1], arguments[2:])
+        if command == "batch" and arguments:
+            return self.get_batch(arguments)
+        if command == "screen" and len(arguments) in (1, 2):
+            return self.screen(*arguments)
+        if command == "add_ticker" and len(arguments) == 1:
+            return self.add_ticker(arguments[0])
+        if command == "del_ticker" and len(arguments) == 1:
+            return self.del_ticker(arguments[0])
+        if command == "reset" and not arguments:
+            return self.reset()
+        return f"Invalid command: {line}"
+
+    def run_script(self, lines, concurrency=1):
+        """Runs script commands over the pooled session and returns results in script order.
+        Blank lines and lines starting with # are skipped. With concurrency above 1, consecutive
+        queries run concurrently while add_ticker, del_ticker and reset run on their own.
+
+        Args:
+            lines (iterable): Command lines
+            concurrency (int, optional): Queries sent at the same time. Defaults to 1.
+
+        Returns:
+            list: (command, result) tuples
+        """
+        commands = [line.strip() for line in lines]
+        commands = [line for line in commands if line and not line.startswith("#")]
+        if concurrency <= 1:
+            return [(line, self.run_command(line)) for line in commands]
+
+        results = []
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            group = []
+            for line in commands:
+                if line.split()[0] in MUTATING_COMMANDS:
+                    results.extend(zip(group, executor.map(self.run_command, group)))
+                    results.append((line, self.run_command(line)))
+                    group = []
+                else:
+                    group.append(line)
+            results.extend(zip(group, executor.map(self.run_command, group)))
+        return results
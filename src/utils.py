@@ -1,26 +1,51 @@
 from io import StringIO
 import logging
+import time
 from dateutil import tz
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import requests
 import finnhub
 from configparser import ConfigParser
 
+from metrics import UPSTREAM_ERRORS, UPSTREAM_LATENCY
+
 logging = logging.getLogger()
 
 # Loads the config file for API keys
 config = ConfigParser()
 config.read("src/config_file.txt")
 
+# Upstream API base urls, can be pointed at a local stand-in such as src/fake_upstream.py
+ALPHA_VANTAGE_URL = config.get(
+    "API_URLS", "ALPHA_VANTAGE_URL", fallback="https://www.alphavantage.co/query?"
+)
+FINNHUB_URL = config.get(
+    "API_URLS", "FINNHUB_URL", fallback="https://api.finnhub.io/api/v1"
+)
+
+# Timezones are parsed once and reused for every conversion
+UTC = tz.gettz("UTC")
+NEW_YORK = tz.gettz("America/New_York")
+QUERY_DATETIME_FORMAT = "%Y-%m-%d-%H:%M"
+
+# Finnhub client shared by get_realtime_quote calls, created on first use
+finnhub_client = None
+
+# Rows returned by Alpha Vantage for outputsize=compact
+COMPACT_ROWS = 100
+
 
-def get_alpha_vantage_historical_data(ticker, interval):
+def get_alpha_vantage_historical_data(ticker, interval, cache=None, outputsize="full"):
     """Get historical intraday data from Alpha Vantage API for given ticker.
     Returns empty DataFrame if API rate limit reached or ticker is invalid
 
     Args:
         ticker (str): Stock symbol
         interval (int): Time interval for intraday prices in minutes
+        cache (HistoryCache, optional): Valid full responses are added to it
+        outputsize (str, optional): full or compact, the last COMPACT_ROWS rows only. Defaults to full.
 
     Returns:
         pandas DF or int: DataFrame with datetime, price or int. 1 = server error, 2 = invalid ticker
@@ -29,60 +54,158 @@ def get_alpha_vantage_historical_data(ticker, interval):
 
     try:
         ALPHA_VANTAGE_API_KEY = config["API_KEYS"]["ALPHA_VANTAGE_API_KEY"]
-        CSV_URL = "https://www.alphavantage.co/query?"
         params = {
             "function": "TIME_SERIES_INTRADAY",
             "symbol": ticker,
             "interval": f"{interval}min",
             "datatype": "csv",
-            "outputsize": "full",
+            "outputsize": outputsize,
             "apikey": ALPHA_VANTAGE_API_KEY,
         }
 
-        r = requests.get(CSV_URL, params=params)
+        with UPSTREAM_LATENCY.time(upstream="alpha_vantage"):
+            r = requests.get(ALPHA_VANTAGE_URL, params=params)
         if r.status_code == 200 and "Invalid API call" in r.text:
+            UPSTREAM_ERRORS.inc(upstream="alpha_vantage", reason="invalid_ticker")
             return 2
         elif (
             r.status_code == 200
             and "Our standard API call frequency is 5 calls per minute" in r.text
         ):
+            UPSTREAM_ERRORS.inc(upstream="alpha_vantage", reason="rate_limited")
             return 1
 
-        csvStringIO = StringIO(r.content.decode("utf-8"))
-
-        df = pd.read_csv(
-            csvStringIO, sep=",", header=0, parse_dates={"datetime": ["timestamp"]}
-        ).rename(columns={"close": "price"})[["datetime", "price"]]
-        df["price"] = df["price"].apply(lambda x: round(x, 2))
-        df = df.sort_values(
-            "datetime",
-            ascending=True,
-        ).reset_index(drop=True)
+        df = parse_alpha_vantage_csv(r.content)
+        if cache is not None and r.status_code == 200 and outputsize == "full":
+            cache.put(ticker, interval, r.content)
         return df
     except Exception as e:
+        UPSTREAM_ERRORS.inc(upstream="alpha_vantage", reason="error")
         logging.error(e)
         return pd.DataFrame()
 
 
-def get_realtime_quote(ticker):
+def parse_alpha_vantage_csv(content):
+    """Parses an Alpha Vantage intraday csv response
+
+    Args:
+        content (bytes): Response content
+
+    Returns:
+        pandas DF: DataFrame with datetime, price sorted by datetime
+    """
+    csvStringIO = StringIO(content.decode("utf-8"))
+
+    df = pd.read_csv(
+        csvStringIO, sep=",", header=0, parse_dates={"datetime": ["timestamp"]}
+    ).rename(columns={"close": "price"})[["datetime", "price"]]
+    df["price"] = df["price"].apply(lambda x: round(x, 2))
+    df = df.sort_values(
+        "datetime",
+        ascending=True,
+    ).reset_index(drop=True)
+    return df
+
+
+def create_finnhub_client(timeout=10, pool_size=10):
+    """Creates a Finnhub client whose keep-alive session can be shared between threads
+
+    Args:
+        timeout (float, optional): Seconds before a quote request times out. Defaults to 10.
+        pool_size (int, optional): Connections kept open to Finnhub. Defaults to 10.
+
+    Returns:
+        finnhub.Client: Finnhub client
+    """
+    FINNHUB_API_KEY = config["API_KEYS"]["FINNHUB_API_KEY"]
+    client = finnhub.Client(api_key=FINNHUB_API_KEY)
+    client.API_URL = FINNHUB_URL
+    client.DEFAULT_TIMEOUT = timeout
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    client._session.mount("https://", adapter)
+    client._session.mount("http://", adapter)
+    return client
+
+
+def get_realtime_quote(ticker, client=None):
     """Get realtime quote from Finnhub API for given ticker
 
     Args:
         ticker (str): Stock symbol
+        client (finnhub.Client, optional): Client to use. Defaults to a client shared by every call.
 
     Returns:
         dict: Dictionary with datetime and price as keys and their respective values
     """
-    FINNHUB_API_KEY = config["API_KEYS"]["FINNHUB_API_KEY"]
-    finnhub_client = finnhub.Client(api_key=FINNHUB_API_KEY)
-    quote = finnhub_client.quote(ticker.upper())
+    global finnhub_client
+    if client is None:
+        if finnhub_client is None:
+            finnhub_client = create_finnhub_client()
+        client = finnhub_client
+    try:
+        with UPSTREAM_LATENCY.time(upstream="finnhub"):
+            quote = client.quote(ticker.upper())
+    except Exception:
+        UPSTREAM_ERRORS.inc(upstream="finnhub", reason="error")
+        raise
     result = {
-        "datetime": datetime.fromtimestamp(quote["t"]),
+        "datetime": datetime.utcfromtimestamp(quote["t"]),
         "price": quote["c"],
     }
     return result
 
 
+def signal_position_pnl(price, avg_price, sigma, band=1.0):
+    """Computes signal, position and pnl arrays for a price series in one pass.
+
+    signal[i] is 1 when price is above S_avg + band * sigma, -1 when below S_avg - band * sigma
+    and 0 otherwise.
+    The first and last rows never carry a signal. The position is the cumulative sum of
+    signal[i] * price[i + 1] and pnl is the previous position times the shifted price return.
+
+    Args:
+        price (ndarray): Prices
+        avg_price (ndarray): Rolling average prices
+        sigma (ndarray): Rolling standard deviation of prices
+        band (float, optional): Width of the band in sigmas. Defaults to 1.
+
+    Returns:
+        tuple: (signal, position, pnl) ndarrays
+    """
+    n = len(price)
+    signal = np.zeros(n, dtype=np.int64)
+    if n >= 2:
+        inner = slice(1, n - 1)
+        width = band * sigma[inner]
+        signal[inner] = np.where(
+            price[inner] > avg_price[inner] + width,
+            1,
+            np.where(price[inner] < avg_price[inner] - width, -1, 0),
+        )
+    position, pnl = position_and_pnl(price, signal)
+    return signal, position, pnl
+
+
+def position_and_pnl(price, signal):
+    """Computes the position and pnl arrays of a price series from its signals
+
+    Args:
+        price (ndarray): Prices
+        signal (ndarray): Signals
+
+    Returns:
+        tuple: (position, pnl) ndarrays
+    """
+    n = len(price)
+    position = np.zeros(n, dtype=np.float64)
+    pnl = np.zeros(n, dtype=np.float64)
+    if n < 2:
+        return position, pnl
+    position[1:] = np.cumsum(signal[:-1] * price[1:])
+    pnl[1:] = np.round(position[:-1] * ((price[1:] / price[:-1]) - 1), 2)
+    return position, pnl
+
+
 def calculate_signal_and_pnl(df):
     """Calculates the signal, pnl and position for the DataFrame provided
 
@@ -92,35 +215,23 @@ def calculate_signal_and_pnl(df):
     Returns:
         df (DataFrame): Return modified DataFrame with signal, pnl and position
     """
-    df["signal"] = 0
-    df["pnl"] = 0
-    df["position"] = 0
-    position = 0
-    for i in range(1, len(df) - 1):
-        current_price = df.iloc[i]["price"]
-        avg_price = df.iloc[i]["S_avg"]
-        sigma = df.iloc[i]["sigma"]
-        next_price = df.iloc[i + 1]["price"]
-
-        if current_price > (avg_price + sigma):
-            df.at[i, "signal"] = 1
-            position += next_price
-            df.at[i + 1, "position"] = position
-        elif current_price < (avg_price - sigma):
-            df.at[i, "signal"] = -1
-            position -= next_price
-            df.at[i + 1, "position"] = position
-        else:
-            df.at[i, "signal"] = 0
-            df.at[i + 1, "position"] = position
-
-    for i in range(1, len(df)):
-        previous_position = df.iloc[i - 1]["position"]
-        current_price = df.iloc[i]["price"]
-        previous_price = df.iloc[i - 1]["price"]
-        pnl = previous_position * ((current_price / previous_price) - 1)
-        df.at[i, "pnl"] = round(pnl, 2)
-
+    start = time.perf_counter()
+    signal, position, pnl = signal_position_pnl(
+        df["price"].to_numpy(dtype=np.float64),
+        df["S_avg"].to_numpy(dtype=np.float64),
+        df["sigma"].to_numpy(dtype=np.float64),
+    )
+    df["signal"] = signal
+    df["pnl"] = pnl
+    df["position"] = position
+
+    elapsed = time.perf_counter() - start
+    logging.info(
+        "Calculated signal and pnl for %d rows in %.6fs (%.0f rows/sec)",
+        len(df),
+        elapsed,
+        len(df) / elapsed if elapsed > 0 else float("inf"),
+    )
     return df
 
 
@@ -140,31 +251,286 @@ def calculate_avg_and_sigma(df, interval):
     return df
 
 
-def add_ticker(ticker, interval):
+class RollingStats:
+    """Rolling window of the last `window` prices kept in a ring buffer.
+    Maintains a running sum and sum of squares so mean and sigma are updated in O(1) per price.
+    Sums are taken relative to the first price seen to limit cancellation, and are re-summed
+    from the buffer every time the ring wraps around to stop rounding error from accumulating.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.buffer = np.zeros(window, dtype=np.float64)
+        self.count = 0
+        self.position = 0
+        self.offset = None
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, price):
+        """Adds a price to the window, dropping the oldest one once the window is full
+
+        Args:
+            price (float): Latest price
+        """
+        if self.offset is None:
+            self.offset = price
+        value = price - self.offset
+        if self.count >= self.window:
+            oldest = self.buffer[self.position]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        else:
+            self.count += 1
+        self.buffer[self.position] = value
+        self.total += value
+        self.total_sq += value * value
+        self.position = (self.position + 1) % self.window
+        if self.position == 0:
+            values = self.buffer[: self.count]
+            self.total = float(values.sum())
+            self.total_sq = float((values * values).sum())
+
+    def mean(self):
+        """Returns the rolling mean or NaN until the window is full"""
+        if self.count < self.window:
+            return np.nan
+        return self.offset + self.total / self.window
+
+    def std(self):
+        """Returns the rolling sample standard deviation or NaN until the window is full"""
+        if self.count < self.window or self.window < 2:
+            return np.nan
+        variance = (self.total_sq - self.total * self.total / self.window) / (
+            self.window - 1
+        )
+        return float(np.sqrt(max(variance, 0.0)))
+
+
+class TickerState:
+    """Incremental analytics state for one ticker.
+    Holds the rolling stats and the last row so a new quote only needs O(1) work.
+    """
+
+    def __init__(self, interval):
+        self.stats = RollingStats(window=24 * 60 // interval)
+        self.rows = 0
+        self.last_price = np.nan
+        self.last_avg = np.nan
+        self.last_sigma = np.nan
+        self.last_position = 0.0
+        self.last_pnl = 0.0
+
+    @classmethod
+    def from_frame(cls, df, interval):
+        """Builds state from a DataFrame already processed by calculate_avg_and_sigma
+        and calculate_signal_and_pnl
+
+        Args:
+            df (DataFrame): pandas DataFrame with price, S_avg, sigma, position and pnl
+            interval (int): Interval of time periods
+
+        Returns:
+            TickerState: State positioned after the last row of df
+        """
+        state = cls(interval)
+        for price in df["price"].to_numpy(dtype=np.float64)[-state.stats.window :]:
+            state.stats.push(price)
+        state.rows = len(df)
+        if state.rows:
+            last = df.iloc[-1]
+            state.last_price = float(last["price"])
+            state.last_avg = float(last["S_avg"])
+            state.last_sigma = float(last["sigma"])
+            state.last_position = float(last["position"])
+            state.last_pnl = float(last["pnl"])
+        return state
+
+    def update(self, price):
+        """Computes the analytics for a new price appended after the last row.
+        Mirrors calculate_avg_and_sigma and calculate_signal_and_pnl for the last two rows.
+
+        Args:
+            price (float): New price
+
+        Returns:
+            dict: previous_signal for the previous last row, and S_avg, sigma, signal,
+            position and pnl for the new row
+        """
+        previous_signal = 0
+        if self.rows >= 2:
+            if self.last_price > self.last_avg + self.last_sigma:
+                previous_signal = 1
+            elif self.last_price < self.last_avg - self.last_sigma:
+                previous_signal = -1
+
+        position = 0.0
+        pnl = 0.0
+        if self.rows >= 1:
+            position = self.last_position + previous_signal * price
+            pnl = round(self.last_position * ((price / self.last_price) - 1), 2)
+
+        self.stats.push(price)
+        avg_price = round(self.stats.mean(), 2)
+        sigma = self.stats.std()
+
+        self.rows += 1
+        self.last_price = price
+        self.last_avg = avg_price
+        self.last_sigma = sigma
+        self.last_position = position
+        self.last_pnl = pnl
+        return {
+            "previous_signal": previous_signal,
+            "S_avg": avg_price,
+            "sigma": sigma,
+            "signal": 0,
+            "position": position,
+            "pnl": pnl,
+        }
+
+
+def append_quote(series, state, quote):
+    """Returns a new TickerSeries with a realtime quote appended, updating analytics for the new row only
+
+    Args:
+        series (TickerSeries): Ticker's history in memory
+        state (TickerState): Incremental state for the ticker, updated in place
+        quote (dict): Dictionary with UTC datetime and price
+
+    Returns:
+        TickerSeries: Series with the new row appended, or the one passed in for an out of order quote
+    """
+    quote_datetime = np.datetime64(quote["datetime"], "ns")
+    if len(series) and quote_datetime < series.index[-1]:
+        logging.warning("Skipping out of order quote at %s", quote["datetime"])
+        return series
+
+    row = state.update(quote["price"])
+    # the series passed in is never modified and can still be read concurrently
+    return series.append(quote_datetime, quote["price"], row["previous_signal"])
+
+
+def merge_history(series, state, df, interval):
+    """Merges downloaded rows into a ticker's history in memory, filling the interval slots
+    that have no row. Only the analytics from the row before the first inserted one onwards
+    are recomputed, the rows before it keep their signals.
+
+    Args:
+        series (TickerSeries): Ticker's history in memory
+        state (TickerState): Ticker's incremental state, left unchanged
+        df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex and price
+        interval (int): Interval of time periods
+
+    Returns:
+        tuple: (TickerSeries, TickerState, number of rows inserted), series and state are the
+        ones passed in when no row is missing
+    """
+    window = 24 * 60 // interval
+    slot = np.int64(interval * 60 * 10**9)
+    datetimes = df.index.values.astype("datetime64[ns]").view(np.int64)
+    # one row per slot, slots already holding a quote or bar are not downloaded rows to add
+    _, rows = np.unique(datetimes // slot, return_index=True)
+    rows = rows[~np.isin(datetimes[rows] // slot, series.datetime // slot)]
+    if len(series):
+        # older rows are in storage or predate the history
+        rows = rows[datetimes[rows] > series.datetime[0]]
+    if not len(rows):
+        return series, state, 0
+
+    old_price = series.values("price")
+    old_signal = series.signal.astype(np.int64)
+    merged, first = series.merge(
+        datetimes[rows], df["price"].to_numpy(dtype=np.float64)[rows]
+    )
+    # the row before the first inserted one may get a signal now that it is not the last row
+    tail = max(first - 1, 0)
+    price = merged.values("price")
+    context = price[max(tail - window + 1, 0) :]
+    if tail < window - 1 and merged.spilled is not None:
+        context = np.concatenate(
+            [merged.read_spilled().values("price")[-(window - 1 - tail) :], context]
+        )
+    frame = calculate_avg_and_sigma(pd.DataFrame({"price": context}), interval)
+    signal, _, _ = signal_position_pnl(
+        context, frame["S_avg"].to_numpy(), frame["sigma"].to_numpy()
+    )
+    start = len(context) - (len(price) - tail)
+    merged.set_signals(tail, signal[start:])
+
+    # position of the tail row, from the last position minus what the old rows after it added
+    position = state.last_position - np.sum(old_signal[tail:-1] * old_price[tail + 1 :])
+    frame["signal"] = signal
+    frame["position"] = np.nan
+    frame["pnl"] = np.nan
+    frame.iloc[start:, frame.columns.get_loc("position")] = position + np.concatenate(
+        [[0.0], np.cumsum(signal[start:-1] * context[start + 1 :])]
+    )
+    if len(frame) - start >= 2:
+        frame.iloc[-1, frame.columns.get_loc("pnl")] = round(
+            frame["position"].iloc[-2] * (context[-1] / context[-2] - 1), 2
+        )
+    else:
+        frame.iloc[-1, frame.columns.get_loc("pnl")] = state.last_pnl
+    merged_state = TickerState.from_frame(frame, interval)
+    merged_state.rows = state.rows + len(rows)
+    return merged, merged_state, len(rows)
+
+
+def get_history(ticker, interval, cache=None, content=None):
+    """Gets the full historical intraday data of ticker, from a cached response when one is given
+
+    Args:
+        ticker (str): Stock symbol
+        interval (int): Interval of time period
+        cache (HistoryCache, optional): Downloaded responses are added to it
+        content (bytes, optional): Cached Alpha Vantage response used instead of calling Alpha Vantage
+
+    Returns:
+        pandas DF or int: DataFrame with datetime, price or int. 1 = server error, 2 = invalid ticker
+    """
+    if content is not None:
+        logging.info("Using cached Alpha Vantage history for %s", ticker)
+        return parse_alpha_vantage_csv(content)
+    return get_alpha_vantage_historical_data(ticker, interval=interval, cache=cache)
+
+
+def add_ticker(ticker, interval, storage, cache=None, content=None):
     """Gets historical data for ticker at given interval. Calculates S_avg, sigma, signal, pnl and position
-    Saves data to {ticker}_price.csv and {ticker}_result.csv
+    Saves datetime, price, signal and pnl to the storage backend
 
     Args:
         ticker (str): Stock symbol
         interval (int): Interval of time period
+        storage (NumpyStorage or CsvStorage): Storage backend to save to
+        cache (HistoryCache, optional): Downloaded responses are added to it
+        content (bytes, optional): Cached Alpha Vantage response used instead of calling Alpha Vantage
 
     Returns:
         str or None: Return "Invalid ticker" or "server error". Returns None if everything is ok.
     """
-    df = get_alpha_vantage_historical_data(ticker, interval=interval)
+    df = get_history(ticker, interval, cache, content)
     if type(df) == int and df == 2:
         return "Invalid ticker"
     elif type(df) == int and df == 1:
         return "Server error"
 
+    save_history(ticker, set_utc_index(df), interval, storage)
+
+
+def save_history(ticker, df, interval, storage):
+    """Calculates S_avg, sigma, signal, pnl and position for a downloaded history and saves
+    datetime, price, signal and pnl to the storage backend
+
+    Args:
+        ticker (str): Stock symbol
+        df (DataFrame): pandas DataFrame with a sorted UTC DatetimeIndex and price
+        interval (int): Interval of time period
+        storage (NumpyStorage or CsvStorage): Storage backend to save to
+    """
     df = calculate_avg_and_sigma(df, interval=interval)
     df = calculate_signal_and_pnl(df)
-
-    # Saving to csv file
-    df[["datetime", "price", "signal", "pnl"]].to_csv(
-        f"data/{ticker}_result.csv", index=False
-    )
-    df[["datetime", "price"]].to_csv(f"data/{ticker}_price.csv", index=False)
+    storage.save(ticker, df)
 
 
 def convert_utc_datetime(utc_datetime):
@@ -176,45 +542,164 @@ def convert_utc_datetime(utc_datetime):
     Returns:
         str: New York datetime in str format YYYY-MM-DD-HH:MM
     """
-    from_zone = tz.gettz("UTC")
-    to_zone = tz.gettz("America/New_York")
     return (
-        datetime.strptime(utc_datetime, "%Y-%m-%d-%H:%M")
-        .replace(tzinfo=from_zone)
-        .astimezone(to_zone)
-        .strftime("%Y-%m-%d-%H:%M")
+        datetime.strptime(utc_datetime, QUERY_DATETIME_FORMAT)
+        .replace(tzinfo=UTC)
+        .astimezone(NEW_YORK)
+        .strftime(QUERY_DATETIME_FORMAT)
     )
 
 
-def get_price(df, query_datetime):
-    """Gets price for ticker at given query time
+def parse_query_datetime(query_datetime):
+    """Parses a client query datetime to a UTC datetime64
+
+    Args:
+        query_datetime (str): UTC datetime in str format YYYY-MM-DD-HH:MM or now
+
+    Returns:
+        numpy.datetime64: Naive UTC datetime
+    """
+    if query_datetime.lower() == "now":
+        return np.datetime64(datetime.utcnow(), "ns")
+    return np.datetime64(datetime.strptime(query_datetime, QUERY_DATETIME_FORMAT), "ns")
+
+
+def set_utc_index(df):
+    """Indexes DataFrame by its datetime column converted to UTC and sorts it.
+    Naive datetimes are New York time as returned by Alpha Vantage.
 
     Args:
         df (DataFrame): pandas DataFrame with datetime, price
-        query_datetime (str): Datetime in YYYY-MM-DD-HH:MM format
+
+    Returns:
+        df (DataFrame): DataFrame with a sorted naive UTC DatetimeIndex named datetime
+    """
+    index = pd.DatetimeIndex(df["datetime"])
+    if index.tz is None:
+        index = index.tz_localize(
+            NEW_YORK, ambiguous="NaT", nonexistent="shift_forward"
+        )
+    df = df.drop(columns="datetime")
+    df.index = index.tz_convert(UTC).tz_localize(None).rename("datetime")
+    if df.index.hasnans:
+        df = df[df.index.notna()]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+    return df
+
+
+def locate(series, query_datetime):
+    """Finds the last row at or before query_datetime with a binary search.
+    Rows dropped from memory by the retention policy are read from storage when needed.
+
+    Args:
+        series (TickerSeries): Ticker's history
+        query_datetime (numpy.datetime64): UTC datetime
+
+    Returns:
+        tuple: (TickerSeries holding the row, row position or -1 if there is no row at or before query_datetime)
+    """
+    position = int(series.index.searchsorted(query_datetime, side="right")) - 1
+    if position < 0 and series.spilled is not None:
+        return locate(series.read_spilled(), query_datetime)
+    return series, position
+
+
+def get_price(series, query_datetime):
+    """Gets price for ticker at given query time
+
+    Args:
+        series (TickerSeries): Ticker's history
+        query_datetime (numpy.datetime64): UTC datetime
 
     Returns:
         float or str: Returns price or No Data
     """
-    price = df.loc[(df["datetime"] <= query_datetime)].tail(1)["price"].values
-    if len(price) == 1:
-        return price[0]
-    elif len(price) == 0:
+    series, position = locate(series, query_datetime)
+    if position < 0:
         return "No Data"
+    return float(series.values("price", position))
 
 
-def get_signal(df, query_datetime):
+def get_signal(series, query_datetime):
     """Gets signal for ticker at given query time
 
     Args:
-        df (DataFrame): pandas DataFrame with datetime, price
-        query_datetime (str): Datetime in YYYY-MM-DD-HH:MM format
+        series (TickerSeries): Ticker's history
+        query_datetime (numpy.datetime64): UTC datetime
 
     Returns:
         int or str: Returns signal or No Data
     """
-    signal = df.loc[(df["datetime"] <= query_datetime)].tail(1)["signal"].values
-    if len(signal) == 1:
-        return int(signal[0])
-    elif len(signal) == 0:
+    series, position = locate(series, query_datetime)
+    if position < 0:
         return "No Data"
+    return int(series.values("signal", position))
+
+
+def format_datetimes(datetimes):
+    """Formats UTC datetime64 values as ISO 8601 strings with second resolution
+
+    Args:
+        datetimes (ndarray): numpy datetime64 array
+
+    Returns:
+        list: List of str datetimes
+    """
+    return np.datetime_as_string(datetimes, unit="s").tolist()
+
+
+def get_range(series, column, start, end):
+    """Slices a column between start and end (inclusive) out of the ticker's history.
+    Rows dropped from memory by the retention policy are read from storage when start is before them.
+
+    Args:
+        series (TickerSeries): Ticker's history
+        column (str): Column to return, price or signal
+        start (numpy.datetime64 or None): UTC start datetime, None for the first row
+        end (numpy.datetime64): UTC end datetime
+
+    Returns:
+        dict: Columnar dict with datetime and column lists
+    """
+    index = series.index
+    lo = 0 if start is None else int(index.searchsorted(start, side="left"))
+    hi = int(index.searchsorted(end, side="right"))
+    response = {
+        "datetime": format_datetimes(index[lo:hi]),
+        column: series.values(column, slice(lo, hi)).tolist(),
+    }
+    if series.spilled is not None and (
+        not len(index) or start is None or start < index[0]
+    ):
+        older = get_range(series.read_spilled(), column, start, end)
+        response = {key: older[key] + response[key] for key in response}
+    return response
+
+
+def get_asof(series, column, query_datetimes):
+    """Gets the last value of a column at or before each query datetime
+
+    Args:
+        series (TickerSeries): Ticker's history
+        column (str): Column to return, price or signal
+        query_datetimes (ndarray): numpy datetime64 array of UTC datetimes
+
+    Returns:
+        list: Values for each query datetime or No Data
+    """
+    positions = series.index.searchsorted(query_datetimes, side="right") - 1
+    values = (
+        series.values(column, np.maximum(positions, 0)).tolist() if len(series) else []
+    )
+    response = [
+        values[i] if position >= 0 else "No Data"
+        for i, position in enumerate(positions)
+    ]
+    if series.spilled is not None and (positions < 0).any():
+        # queries before the first row in memory
+        earlier = np.flatnonzero(positions < 0)
+        older = get_asof(series.read_spilled(), column, query_datetimes[earlier])
+        for i, value in zip(earlier, older):
+            response[i] = value
+    return response
@@ -0,0 +1,132 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+# The modules read src/config_file.txt and create data/ and logs/ relative to the working
+# directory, so the tests run from a scratch directory holding a copy of the config
+WORKDIR = tempfile.mkdtemp(prefix="trading-tests-")
+os.makedirs(os.path.join(WORKDIR, "src"))
+shutil.copy(os.path.join(ROOT, "src", "config_file.txt"), os.path.join(WORKDIR, "src"))
+os.chdir(WORKDIR)
+
+from waitress import create_server
+
+import fetcher
+import server
+import utils
+from cache import ResponseCache
+from fake_upstream import create_app
+from journal import TickJournal
+from server_argument_parser import parser
+from storage import get_storage
+from store import SnapshotStore
+from stream import Broadcaster
+
+
+class FakeClock:
+    """Stands in for the time module in fetcher, sleeping only advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.lock = threading.Lock()
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake clock for the token buckets and backoff delays of fetcher"""
+    fake = FakeClock()
+    monkeypatch.setattr(fetcher, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def start_upstream(monkeypatch):
+    """Starts a fake Alpha Vantage and Finnhub server and points utils at it
+
+    Returns:
+        function: Takes create_app's arguments and returns the base url of the started server
+    """
+    upstreams = []
+
+    def start(**kwargs):
+        upstream = create_server(create_app(**kwargs), host="127.0.0.1", port=0)
+        threading.Thread(target=upstream.run, daemon=True).start()
+        upstreams.append(upstream)
+        url = f"http://127.0.0.1:{upstream.effective_port}"
+        monkeypatch.setattr(utils, "ALPHA_VANTAGE_URL", f"{url}/query?")
+        monkeypatch.setattr(utils, "FINNHUB_URL", f"{url}/api/v1")
+        return url
+
+    yield start
+    for upstream in upstreams:
+        upstream.close()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Empty data directory, with the trailing slash the storage backends expect"""
+    return f"{tmp_path}/"
+
+
+@pytest.fixture
+def configure_server(start_upstream, data_dir, monkeypatch):
+    """Sets the server's globals up like server.py's __main__ does, against a fake upstream
+
+    Returns:
+        function: Takes command line arguments and the fake upstream's calls_per_minute, and
+        returns the configured server module
+    """
+    pollers = []
+
+    def configure(*argv, calls_per_minute=0):
+        start_upstream(calls_per_minute=calls_per_minute, rows=2000)
+        args = parser.parse_args(list(argv))
+        monkeypatch.setattr(server, "args", args, raising=False)
+        monkeypatch.setattr(server, "reload_symbol", None, raising=False)
+        monkeypatch.setattr(server, "load_status", {})
+        monkeypatch.setattr(server, "backfilling", set())
+        monkeypatch.setattr(server, "states", {}, raising=False)
+        monkeypatch.setattr(server, "store", SnapshotStore({}), raising=False)
+        monkeypatch.setattr(server, "response_cache", ResponseCache(), raising=False)
+        monkeypatch.setattr(server, "broadcaster", Broadcaster(), raising=False)
+        monkeypatch.setattr(
+            server, "storage", get_storage("npy", data_dir=data_dir), raising=False
+        )
+        monkeypatch.setattr(server, "journal", TickJournal(data_dir=data_dir))
+        monkeypatch.setattr(
+            server,
+            "fetcher",
+            fetcher.HistoryFetcher(
+                args.minutes,
+                server.storage,
+                calls_per_minute=args.calls_per_minute,
+                workers=args.fetch_workers,
+                locks=server.ticker_locks,
+            ),
+            raising=False,
+        )
+        pollers.append(fetcher.QuotePoller(workers=2))
+        monkeypatch.setattr(server, "poller", pollers[-1], raising=False)
+        return server
+
+    yield configure
+    for poller in pollers:
+        poller.close()
+    if pollers:
+        server.journal.close()
@@ -0,0 +1,149 @@
+import os
+
+import numpy as np
+import pytest
+from pandas.testing import assert_series_equal
+
+from panel import prepare_panel
+from utils import (
+    TickerState,
+    calculate_avg_and_sigma,
+    calculate_signal_and_pnl,
+    parse_alpha_vantage_csv,
+    set_utc_index,
+)
+
+INTERVAL = 5
+# Synthetic Alpha Vantage 5 minute intraday csv response, generated by src/fake_upstream.py
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "ibm_5min.csv")
+# the reference loop writes floats into integer columns like it always did
+pytestmark = pytest.mark.filterwarnings("ignore:Setting an item of incompatible dtype")
+
+
+def reference_avg_and_sigma(df, interval):
+    """calculate_avg_and_sigma as it was before the analytics were vectorized"""
+    window = 24 * 60 // interval
+    df["S_avg"] = df["price"].rolling(window=window).mean().apply(lambda x: round(x, 2))
+    df["sigma"] = df["price"].rolling(window=window).std()
+    return df
+
+
+def reference_signal_and_pnl(df):
+    """calculate_signal_and_pnl as it was before the analytics were vectorized, row by row on a
+    DataFrame with a RangeIndex"""
+    df["signal"] = 0
+    df["pnl"] = 0
+    df["position"] = 0
+    position = 0
+    for i in range(1, len(df) - 1):
+        current_price = df.iloc[i]["price"]
+        avg_price = df.iloc[i]["S_avg"]
+        sigma = df.iloc[i]["sigma"]
+        next_price = df.iloc[i + 1]["price"]
+
+        if current_price > (avg_price + sigma):
+            df.at[i, "signal"] = 1
+            position += next_price
+            df.at[i + 1, "position"] = position
+        elif current_price < (avg_price - sigma):
+            df.at[i, "signal"] = -1
+            position -= next_price
+            df.at[i + 1, "position"] = position
+        else:
+            df.at[i, "signal"] = 0
+            df.at[i + 1, "position"] = position
+
+    for i in range(1, len(df)):
+        previous_position = df.iloc[i - 1]["position"]
+        current_price = df.iloc[i]["price"]
+        previous_price = df.iloc[i - 1]["price"]
+        pnl = previous_position * ((current_price / previous_price) - 1)
+        df.at[i, "pnl"] = round(pnl, 2)
+
+    return df
+
+
+@pytest.fixture(scope="module")
+def history():
+    with open(FIXTURE, "rb") as f:
+        return set_utc_index(parse_alpha_vantage_csv(f.read()))
+
+
+@pytest.fixture(scope="module")
+def reference(history):
+    df = reference_avg_and_sigma(history.reset_index(), INTERVAL)
+    return reference_signal_and_pnl(df).set_index("datetime")
+
+
+def test_fixture_has_signals(reference):
+    # more rows than the 24 hour window, and both signals occur
+    assert len(reference) > 24 * 60 // INTERVAL
+    assert set(reference["signal"]) == {-1, 0, 1}
+
+
+def assert_matches_reference(df, reference):
+    for column in ["signal", "position", "pnl", "sigma"]:
+        assert_series_equal(df[column], reference[column], check_exact=True)
+    # rounded to cents after a vectorized sum that may run in another order than rolling()
+    assert_series_equal(df["S_avg"], reference["S_avg"], check_exact=False, atol=1e-9)
+
+
+def test_vectorized_analytics_match_reference(history, reference):
+    df = calculate_signal_and_pnl(calculate_avg_and_sigma(history.copy(), INTERVAL))
+    assert_matches_reference(df, reference)
+
+
+@pytest.mark.parametrize("rows", [0, 1, 2, 3])
+def test_short_histories_match_reference(history, rows):
+    # too short for a window, and for any row to have both a previous and a next one
+    short = history.iloc[:rows]
+    df = calculate_signal_and_pnl(calculate_avg_and_sigma(short.copy(), INTERVAL))
+    expected = reference_signal_and_pnl(
+        reference_avg_and_sigma(short.reset_index(), INTERVAL)
+    ).set_index("datetime")
+    for column in ["signal", "position", "pnl"]:
+        # the reference leaves position and pnl integer columns when it writes no float into them
+        assert_series_equal(
+            df[column], expected[column], check_exact=True, check_dtype=False
+        )
+
+
+def test_panel_matches_reference(history, reference):
+    # two tickers of different lengths, the shorter one NaN padded in the panel
+    prepared = prepare_panel({"ibm": history, "short": history.iloc[:400]}, INTERVAL)
+    short = reference_signal_and_pnl(
+        reference_avg_and_sigma(history.iloc[:400].reset_index(), INTERVAL)
+    ).set_index("datetime")
+    for df, expected in [(prepared["ibm"], reference), (prepared["short"], short)]:
+        for column in ["signal", "position", "pnl"]:
+            assert_series_equal(df[column], expected[column], check_exact=True)
+        # S_avg on a half cent may round the other way, see prepare_panel
+        assert_series_equal(
+            df["S_avg"], expected["S_avg"], check_exact=False, atol=0.01 + 1e-9
+        )
+        assert_series_equal(
+            df["sigma"], expected["sigma"], check_exact=False, rtol=1e-9
+        )
+
+
+def test_incremental_state_matches_reference(history, reference):
+    # the first rows are loaded, the rest arrive one quote at a time
+    loaded = 300
+    df = calculate_signal_and_pnl(
+        calculate_avg_and_sigma(history.iloc[:loaded].copy(), INTERVAL)
+    )
+    state = TickerState.from_frame(df, INTERVAL)
+    rows = [state.update(price) for price in history["price"].iloc[loaded:]]
+    expected = reference.iloc[loaded:]
+    np.testing.assert_allclose(
+        [row["S_avg"] for row in rows], expected["S_avg"], atol=0.01 + 1e-9
+    )
+    np.testing.assert_allclose(
+        [row["sigma"] for row in rows], expected["sigma"], rtol=1e-6
+    )
+    signals = np.array([row["previous_signal"] for row in rows])
+    # each update settles the signal of the row before it
+    np.testing.assert_array_equal(signals, reference["signal"].iloc[loaded - 1 : -1])
+    np.testing.assert_array_equal(
+        [row["position"] for row in rows], expected["position"]
+    )
@@ -0,0 +1,66 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from waitress import create_server
+
+import fake_upstream
+import router
+from fetcher import HistoryFetcher, RouterHistory
+
+# the fake upstream's last row is at the current interval, frozen so every download agrees
+NOW = datetime.now(timezone.utc)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return NOW.astimezone(tz)
+
+
+@pytest.fixture
+def shard(configure_server, monkeypatch):
+    """Shard whose backfill downloads go through a router app, both against the fake upstream"""
+    monkeypatch.setattr(fake_upstream, "datetime", FrozenDatetime)
+    server = configure_server("--minutes", "5", "--shard", "--calls_per_minute", "1000")
+    monkeypatch.setattr(
+        router,
+        "fetcher",
+        HistoryFetcher(5, server.storage, calls_per_minute=1000),
+        raising=False,
+    )
+    http = create_server(router.create_app(), host="127.0.0.1", port=0)
+    threading.Thread(target=http.run, daemon=True).start()
+    monkeypatch.setattr(
+        server,
+        "router",
+        RouterHistory(f"http://127.0.0.1:{http.effective_port}", 5, server.storage),
+    )
+    yield server
+    http.close()
+
+
+def test_shard_backfills_through_the_router(shard):
+    assert shard.can_backfill()
+    assert router.fetcher.fetch("ibm") is None
+    full = shard.storage.load("ibm")
+    # the last rows were missed, e.g. while the shard was down
+    shard.storage.save("ibm", full.iloc[:-20])
+    shard.load_ticker("ibm")
+    series = shard.store.snapshot().data["ibm"]
+
+    shard.backfill({"ibm": series.index[-1]})
+
+    backfilled = shard.store.snapshot().data["ibm"]
+    np.testing.assert_array_equal(backfilled.index, full.index)
+    np.testing.assert_array_equal(backfilled.values("price"), full["price"])
+    np.testing.assert_array_equal(backfilled.signal, full["signal"])
+    # merged into storage as well
+    np.testing.assert_array_equal(shard.storage.load("ibm").index, full.index)
+
+
+def test_router_history_answers_invalid_tickers(shard):
+    assert shard.router.download("1234") == "Invalid ticker"
+    client = router.create_app().test_client()
+    assert client.get("/history/%2E%2E").get_json() == "Invalid ticker"
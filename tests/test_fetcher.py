@@ -0,0 +1,132 @@
+import os
+
+import pytest
+import requests
+
+import fetcher
+from cache import HistoryCache
+from fetcher import HistoryFetcher, RateLimiter
+from server_argument_parser import parser
+from storage import get_storage
+
+TICKERS = ["aapl", "msft", "goog", "amzn", "nflx", "tsla", "fb", "ibm", "orcl", "intc"]
+
+
+@pytest.fixture
+def storage(data_dir):
+    return get_storage("npy", data_dir=data_dir)
+
+
+@pytest.fixture
+def calls(clock, monkeypatch):
+    """Fake times of every Alpha Vantage download saved by the fetcher"""
+    times = []
+    add_ticker = fetcher.add_ticker
+
+    def timed(*args, **kwargs):
+        times.append(clock.now)
+        return add_ticker(*args, **kwargs)
+
+    monkeypatch.setattr(fetcher, "add_ticker", timed)
+    return times
+
+
+def upstream_stats(url):
+    return requests.get(f"{url}/stats").json()
+
+
+def test_rate_limiter_allows_capacity_calls_in_any_period(clock):
+    limiter = RateLimiter(capacity=5, period=60)
+    waits = [limiter.acquire() for _ in range(10)]
+    # the 6th call waits for the 1st to be a minute old, the next ones for the 2nd to 5th
+    assert waits == [0] * 5 + [60] + [0] * 4
+    assert clock.now == 60
+    assert not limiter.try_acquire()
+
+
+@pytest.mark.parametrize("capacity", [0, -1])
+def test_rate_limiter_needs_a_positive_capacity(capacity):
+    with pytest.raises(ValueError):
+        RateLimiter(capacity)
+
+
+def test_limiter_failure_is_a_server_error(clock, storage, monkeypatch):
+    history = HistoryFetcher(5, storage, retries=0)
+
+    def broken():
+        raise RuntimeError("limiter failed")
+
+    monkeypatch.setattr(history.limiter, "acquire", broken)
+    assert history.fetch("aapl") == "Server error"
+
+
+def test_cached_history_takes_no_quota_and_is_read_once(
+    clock, start_upstream, storage, data_dir, monkeypatch
+):
+    url = start_upstream(calls_per_minute=0, rows=300)
+    cache = HistoryCache(os.path.join(data_dir, "cache"))
+    history = HistoryFetcher(5, storage, calls_per_minute=1, cache=cache)
+    assert history.fetch("aapl") is None
+    assert history.fetch("aapl") is None
+    assert not history.download("aapl", "full").empty
+    assert len(history.limiter.calls) == 1
+    assert upstream_stats(url)["alpha_vantage_calls"] == 1
+
+    # the entry expires between a freshness check and the read, the download still waits its turn
+    monkeypatch.setattr(cache, "fresh", lambda symbol, interval: True)
+    monkeypatch.setattr(cache, "get", lambda symbol, interval: None)
+    assert history.fetch("aapl") is None
+    assert clock.now == 60
+    assert upstream_stats(url)["alpha_vantage_calls"] == 2
+
+
+def test_downloads_are_paced_to_five_calls_per_minute(
+    clock, calls, start_upstream, storage
+):
+    # one worker, so the fake clock only advances while that worker waits
+    url = start_upstream(calls_per_minute=5, rows=300)
+    history = HistoryFetcher(5, storage, calls_per_minute=5, workers=1)
+    assert history.fetch_all(TICKERS) == dict.fromkeys(TICKERS)
+    assert len(calls) == len(TICKERS)
+    assert all(later - earlier >= 60 for earlier, later in zip(calls, calls[5:]))
+    assert upstream_stats(url)["throttled_calls"] == 0
+
+
+def test_throttled_call_is_retried_after_backoff(clock, calls, start_upstream, storage):
+    # the upstream allows fewer calls than the fetcher thinks
+    url = start_upstream(calls_per_minute=1, rows=300)
+    history = HistoryFetcher(5, storage, calls_per_minute=5, retries=2, backoff=15)
+    assert history.fetch("aapl") is None
+    assert history.fetch("msft") is None
+    assert upstream_stats(url)["throttled_calls"] == 1
+    # backs off, then the drained quota holds the retry until a minute after the throttled call
+    assert 15 in clock.sleeps
+    assert calls[-1] - calls[-2] >= 60
+    assert storage.exists("msft")
+
+
+def test_throttled_call_without_retries_fails(clock, start_upstream, storage):
+    start_upstream(calls_per_minute=1, rows=300)
+    history = HistoryFetcher(5, storage, calls_per_minute=5)
+    assert history.fetch("aapl", retries=0) is None
+    assert history.fetch("msft", retries=0) == "Server error"
+    assert not storage.exists("msft")
+
+
+def test_invalid_ticker_is_not_retried(clock, start_upstream, storage):
+    url = start_upstream(calls_per_minute=5, rows=300)
+    history = HistoryFetcher(5, storage, calls_per_minute=5, retries=3)
+    assert history.fetch("1234") == "Invalid ticker"
+    assert upstream_stats(url)["alpha_vantage_calls"] == 1
+    assert not storage.exists("1234")
+
+
+def test_startup_downloads_every_ticker(clock, configure_server):
+    # --tickers used to be cut down to the first 3
+    args = ["--tickers", *TICKERS, "--calls_per_minute", "5", "--no_backfill"]
+    assert parser.parse_args(args).tickers == TICKERS
+    server = configure_server(*args, calls_per_minute=5)
+    server.server_start_up_tasks()
+    assert sorted(server.store.snapshot().data) == sorted(TICKERS)
+    assert sorted(server.storage.tickers()) == sorted(TICKERS)
+    assert server.load_status == {}
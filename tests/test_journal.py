@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+from journal import TickJournal
+
+
+def history(datetimes, prices):
+    return pd.DataFrame(
+        {"price": prices},
+        index=pd.DatetimeIndex(pd.to_datetime(datetimes), name="datetime"),
+    )
+
+
+def test_replay_keeps_the_stored_row_of_a_journaled_datetime(data_dir):
+    journal = TickJournal(data_dir=data_dir)
+    stored = history(["2022-06-01 13:30", "2022-06-01 13:35"], [1.0, 2.0])
+    # the download that replaced storage already holds 13:35, journaled at another price
+    for datetime, price in [("2022-06-01 13:35", 2.5), ("2022-06-01 13:40", 3.0)]:
+        journal.append("ibm", np.datetime64(datetime), price)
+    journal.sync()
+
+    replayed = journal.replay("ibm", stored)
+
+    assert replayed.index.is_unique
+    np.testing.assert_array_equal(
+        replayed.index,
+        pd.to_datetime(["2022-06-01 13:30", "2022-06-01 13:35", "2022-06-01 13:40"]),
+    )
+    np.testing.assert_array_equal(replayed["price"], [1.0, 2.0, 3.0])
+    journal.close()
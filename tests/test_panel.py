@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+import pytest
+
+from panel import Panel
+from series import TickerSeries
+from utils import (
+    TickerState,
+    append_quote,
+    calculate_avg_and_sigma,
+    calculate_signal_and_pnl,
+    parse_alpha_vantage_csv,
+    set_utc_index,
+)
+
+INTERVAL = 5
+FIXTURE = os.path.join(os.path.dirname(__file__), "data", "ibm_5min.csv")
+STEP = np.timedelta64(INTERVAL, "m")
+
+
+@pytest.fixture
+def loaded():
+    """Series and states of three tickers, "lagging" ending 100 rows before the others"""
+    with open(FIXTURE, "rb") as f:
+        history = set_utc_index(parse_alpha_vantage_csv(f.read()))
+    frames = {"ibm": history, "double": history * 2, "lagging": history.iloc[:-100]}
+    data, states = {}, {}
+    for symbol, frame in frames.items():
+        df = calculate_signal_and_pnl(calculate_avg_and_sigma(frame.copy(), INTERVAL))
+        data[symbol] = TickerSeries.from_frame(df)
+        states[symbol] = TickerState.from_frame(df, INTERVAL)
+    return data, states
+
+
+def tick(data, states, symbols, prices, at=None):
+    """Appends a quote one interval after each ticker's last row, or at `at`"""
+    changed = {}
+    for symbol, price in zip(symbols, prices):
+        quote_datetime = at if at is not None else data[symbol].index[-1] + STEP
+        changed[symbol] = append_quote(
+            data[symbol], states[symbol], {"datetime": quote_datetime, "price": price}
+        )
+    return {**data, **changed}, changed
+
+
+def answers(panel, datetimes):
+    return [
+        (
+            panel.cross_section("price", query),
+            panel.cross_section("signal", query),
+            panel.missing(query),
+            panel.select(query, 1),
+        )
+        for query in datetimes
+    ]
+
+
+def test_appended_panel_matches_a_built_one(loaded):
+    data, states = loaded
+    panel = Panel(1, data)
+    queries = [data["ibm"].index[i] for i in [0, 500, -101, -2, -1]]
+
+    # enough ticks to grow the buffers, and a tick with a quote at the last timestamp again
+    for version in range(2, 400):
+        data, changed = tick(data, states, ["ibm", "double"], [150.0, 40.0 + version])
+        panel = panel.append(version, changed)
+        assert panel is not None
+    last = data["ibm"].index[-1]
+    data, changed = tick(data, states, ["ibm"], [151.0], at=last)
+    panel = panel.append(400, changed)
+
+    built = Panel(400, data)
+    np.testing.assert_array_equal(panel.index, built.index)
+    queries += [data["ibm"].index[i] for i in [-300, -2, -1]]
+    queries.append(last + STEP)
+    assert answers(panel, queries) == answers(built, queries)
+
+
+def test_published_panel_is_not_changed_by_append(loaded):
+    data, states = loaded
+    # appended once, so the next append writes into buffers this panel shares
+    panel = Panel(1, data)
+    data, changed = tick(data, states, ["ibm", "double"], [150.0, 1.0])
+    panel = panel.append(2, changed)
+    queries = [data["ibm"].index[i] for i in [-2, -1]]
+    before = answers(panel, queries)
+    # the tick settles the signal of the last row, which is 0 until then
+    data, changed = tick(data, states, ["ibm", "double"], [300.0, 1.0])
+    appended = panel.append(3, changed)
+    assert answers(appended, queries) != before
+    assert answers(panel, queries) == before
+
+
+def test_panel_is_built_again_when_rows_before_its_end_change(loaded):
+    data, states = loaded
+    panel = Panel(1, data)
+    # the lagging ticker's new row settles the signal of a row older than the panel's last one
+    _, changed = tick(data, states, ["lagging"], [100.0])
+    assert panel.append(2, changed) is None
+    # a panel is only appended to once
+    panel = Panel(1, data)
+    _, changed = tick(data, states, ["ibm"], [100.0])
+    assert panel.append(2, changed) is not None
+    assert panel.append(2, changed) is None
+
+
+def test_update_ticks_do_not_build_the_panel(configure_server, monkeypatch):
+    server = configure_server("--minutes", "5", "--panel", "--calls_per_minute", "1000")
+    client = server.create_app().test_client()
+    for symbol in ["ibm", "msft"]:
+        assert client.post(f"/add_ticker/{symbol}").get_json() == 0
+    builds = []
+
+    class Counted(Panel):
+        def __init__(self, version, data):
+            builds.append(version)
+            super().__init__(version, data)
+
+    monkeypatch.setattr(server, "Panel", Counted)
+    query = "/price/now"
+    client.get(query)
+    assert len(builds) == 1
+
+    def poll(symbols):
+        data = server.store.snapshot().data
+        return {
+            symbol: {"datetime": data[symbol].index[-1] + STEP, "price": 100.0}
+            for symbol in symbols
+        }
+
+    monkeypatch.setattr(server.poller, "poll", poll)
+    for _ in range(3):
+        server.update_data()
+        snapshot = server.store.snapshot()
+        panel = server.current_panel(snapshot)
+        last = snapshot.data["ibm"].index[-1]
+        built = Panel(snapshot.version, snapshot.data)
+        for column, query in [("price", last), ("signal", last - STEP)]:
+            assert panel.cross_section(column, query) == built.cross_section(
+                column, query
+            )
+    assert len(builds) == 1
@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.mark.parametrize(
+    "path", ["/price/yesterday", "/signal/2022-13-01-10:00", "/price/2022-06-01"]
+)
+def test_point_queries_reject_invalid_datetimes(configure_server, path):
+    server = configure_server("--minutes", "5")
+    r = server.create_app().test_client().get(path)
+    assert r.status_code == 400
+    assert r.get_json() == server.INVALID_DATETIME
+
+
+@pytest.mark.parametrize("tickers", [[1], ["ibm", None], {"ibm": 1}, 5])
+def test_batch_rejects_invalid_tickers(configure_server, tickers):
+    server = configure_server("--minutes", "5")
+    body = {"timestamps": ["now"], "tickers": tickers}
+    r = server.create_app().test_client().post("/batch", json=body)
+    assert r.status_code == 400
+    assert r.get_json() == server.INVALID_TICKERS
@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+from waitress import create_server
+
+import router
+from fetcher import HistoryFetcher, RouterHistory
+from sharding import HashRing
+
+
+def serve(app):
+    http = create_server(app, host="127.0.0.1", port=0)
+    threading.Thread(target=http.run, daemon=True).start()
+    return http
+
+
+@pytest.fixture
+def routed(configure_server, monkeypatch):
+    """Router app with one shard, a configured server served over http, that downloads through
+    the router like the shards src/router.py starts
+
+    Returns:
+        tuple: Router's Flask test client and the shard's server module
+    """
+    server = configure_server("--minutes", "5", "--shard", "--calls_per_minute", "1000")
+    shard = serve(server.create_app())
+    executor = ThreadPoolExecutor(max_workers=4)
+    for name, value in [
+        ("fetcher", HistoryFetcher(5, server.storage, calls_per_minute=1000)),
+        ("session", requests.Session()),
+        ("executor", executor),
+        ("ring", HashRing(["shard0"])),
+        ("workers", {"shard0": router.Worker("shard0", shard.effective_port, None)}),
+        ("assignment", {}),
+    ]:
+        monkeypatch.setattr(router, name, value, raising=False)
+    http = serve(router.create_app())
+    monkeypatch.setattr(
+        server,
+        "router",
+        RouterHistory(
+            f"http://127.0.0.1:{http.effective_port}",
+            5,
+            server.storage,
+            locks=server.ticker_locks,
+        ),
+    )
+    yield router.create_app().test_client(), server
+    http.close()
+    shard.close()
+    executor.shutdown()
+
+
+def test_add_ticker_is_saved_and_loaded_by_its_shard(routed, monkeypatch):
+    client, server = routed
+    saved = []
+    save = server.storage.save
+
+    def saving(ticker, df):
+        # the router process never writes a shard's storage
+        saved.append(threading.current_thread().name)
+        return save(ticker, df)
+
+    monkeypatch.setattr(server.storage, "save", saving)
+    assert client.post("/add_ticker/ibm").get_json() == 0
+    assert saved and server.storage.exists("ibm")
+    assert "ibm" in server.store.snapshot().data
+    assert router.assignment == {"ibm": "shard0"}
+    assert client.post("/add_ticker/1234").get_json() == 2
+    assert "1234" not in router.assignment
+
+
+def test_shard_endpoints_are_aggregated(routed, monkeypatch):
+    client, server = routed
+    monkeypatch.setattr(server.profiler, "sample_every", 0)
+    assert client.post("/add_ticker/ibm").get_json() == 0
+
+    r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.get_json() == {"ready": True, "tickers": {"ibm": "ready"}}
+
+    assert client.get("/cache_stats").get_json() == {
+        "shard0": server.response_cache.stats()
+    }
+    assert client.put("/profile/7").get_json()["shard0"]["sample_every"] == 7
+    assert client.get("/profile").get_json()["shard0"]["sample_every"] == 7
+
+    metrics = client.get("/metrics").get_data(as_text=True)
+    assert 'trading_ticker_rows{shard="shard0",ticker="ibm"}' in metrics
+    assert metrics.count("# TYPE trading_ticker_rows gauge") == 1
+
+
+def test_batch_rejects_invalid_tickers(routed):
+    client, _ = routed
+    r = client.post("/batch", json={"timestamps": ["now"], "tickers": ["ibm", 1]})
+    assert r.status_code == 400
+    assert r.get_json() == router.INVALID_TICKERS
+
+
+def test_stream_is_proxied(routed):
+    client, server = routed
+    r = client.get("/stream", buffered=False)
+    assert r.status_code == 200
+    events = iter(r.response)
+    assert next(events) == b": connected\n\n"
+    server.broadcaster.publish({"ticker": "ibm", "price": 1.5})
+    event = next(events).decode()
+    assert event.startswith("id: ")
+    assert 'data: {"ticker": "ibm", "price": 1.5' in event
+    r.close()
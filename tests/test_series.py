@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from series import TickerSeries
+
+
+def frame(prices, signals):
+    index = pd.date_range("2022-06-01 13:30", periods=len(prices), freq="5min")
+    return pd.DataFrame({"price": prices, "signal": signals}, index=index)
+
+
+def test_append_leaves_published_series_unchanged():
+    published = TickerSeries.from_frame(frame([10.0, 10.5, 11.0, 11.5], [0, 1, -1, 0]))
+    before = published.signal
+    appended = published.append(published.index[-1] + np.timedelta64(5, "m"), 12.0, 1)
+    # the new row's price makes the old last row's signal known, for the new series only
+    assert published.signal.tolist() == before.tolist() == [0, 1, -1, 0]
+    assert published.values("signal", -1) == 0
+    assert published.values("signal", slice(2, None)).tolist() == [-1, 0]
+    assert published.values("signal", np.array([3, 1])).tolist() == [0, 1]
+    assert appended.signal.tolist() == [0, 1, -1, 1, 0]
+    assert appended.values("signal", 3) == 1
+    assert published.to_frame()["signal"].tolist() == [0, 1, -1, 0]
+
+
+def test_older_series_appending_again_copies_the_buffer():
+    published = TickerSeries.from_frame(frame([10.0, 10.5], [0, 0]))
+    first = published.append(published.index[-1] + np.timedelta64(5, "m"), 11.0, 1)
+    second = published.append(published.index[-1] + np.timedelta64(5, "m"), 9.0, -1)
+    assert first.signal.tolist() == [0, 1, 0]
+    assert second.signal.tolist() == [0, -1, 0]
+    assert published.signal.tolist() == [0, 0]
+
+
+def test_prices_float32_cannot_hold_stay_exact():
+    # BRK.A trades above 131072, where float32 has no cents
+    prices = [612345.67, 612350.01, 612349.99]
+    series = TickerSeries.from_frame(frame(prices, [0, 0, 0]))
+    assert series.price.dtype == np.float64
+    assert series.values("price").tolist() == prices
+    assert series.to_frame()["price"].tolist() == prices
+
+
+def test_append_moves_prices_to_float64_when_needed():
+    published = TickerSeries.from_frame(frame([123.45, 130000.01], [0, 0]))
+    assert published.price.dtype == np.float32
+    appended = published.append(
+        published.index[-1] + np.timedelta64(5, "m"), 612345.67, 0
+    )
+    assert appended.price.dtype == np.float64
+    assert appended.values("price").tolist() == [123.45, 130000.01, 612345.67]
+    assert appended.to_frame()["price"].tolist() == [123.45, 130000.01, 612345.67]
+    assert published.values("price").tolist() == [123.45, 130000.01]
+
+
+def test_merge_keeps_prices_exact():
+    series = TickerSeries.from_frame(frame([10.25, 10.5], [0, 0]))
+    merged, first = series.merge(
+        np.array([series.datetime[-1] + 300 * 10**9]), np.array([612345.67])
+    )
+    assert first == 2
+    assert merged.values("price").tolist() == [10.25, 10.5, 612345.67]
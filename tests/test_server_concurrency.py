@@ -0,0 +1,117 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import server
+
+SERVED = "ibm"
+CHURNED = "bnch"
+
+
+@pytest.fixture
+def app(configure_server):
+    """Server serving SERVED, compacting every tick"""
+    server = configure_server(
+        "--minutes", "5", "--compact_every", "1", "--calls_per_minute", "1000"
+    )
+    app = server.create_app()
+    assert app.test_client().post(f"/add_ticker/{SERVED}").get_json() == 0
+    return app
+
+
+def test_price_while_tickers_are_updated_added_and_deleted(app):
+    """Hammers /price while update_data compacts every tick and another ticker is added and
+    deleted from two threads at once, none of which may fail or leave partial files behind
+    """
+    query = f"/price/{datetime.utcnow().strftime('%Y-%m-%d-%H:%M')}"
+    failures = []
+    done = threading.Event()
+
+    def hammer():
+        client = app.test_client()
+        while not done.is_set():
+            r = client.get(query)
+            if r.status_code != 200 or SERVED not in r.get_json():
+                failures.append(("price", r.status_code, r.get_data(as_text=True)))
+
+    def update():
+        while not done.is_set():
+            try:
+                server.update_data()
+            except Exception as e:
+                failures.append(("update_data", repr(e)))
+
+    def churn(method, path, statuses):
+        client = app.test_client()
+        for _ in range(25):
+            r = client.open(path, method=method)
+            if r.status_code != 200 or r.get_json() not in statuses:
+                failures.append((path, r.status_code, r.get_data(as_text=True)))
+
+    readers = [threading.Thread(target=hammer) for _ in range(3)]
+    updater = threading.Thread(target=update)
+    churners = [
+        threading.Thread(target=churn, args=("POST", f"/add_ticker/{CHURNED}", [0])),
+        threading.Thread(
+            target=churn, args=("DELETE", f"/del_ticker/{CHURNED}", [0, 2])
+        ),
+    ]
+    for thread in [*readers, updater, *churners]:
+        thread.start()
+    for thread in churners:
+        thread.join()
+    # lets a few more ticks compact the final state
+    time.sleep(0.2)
+    done.set()
+    for thread in [*readers, updater]:
+        thread.join()
+
+    assert failures == []
+    data = server.store.snapshot().data
+    assert set(data) == set(server.states)
+    assert SERVED in data
+    # a loaded ticker is stored, a deleted one left nothing behind
+    assert server.storage.exists(CHURNED) == (CHURNED in data)
+    assert sorted(server.storage.tickers()) == sorted(data)
+
+
+def test_reset_while_tickers_are_added_and_compacted(app):
+    """Resets the server while a ticker is added and update_data compacts every tick, the reset
+    may neither fail on files written meanwhile nor leave a loaded ticker without its files
+    """
+    failures = []
+    done = threading.Event()
+
+    def update():
+        while not done.is_set():
+            try:
+                server.update_data()
+            except Exception as e:
+                failures.append(("update_data", repr(e)))
+
+    def churn(method, path):
+        client = app.test_client()
+        for _ in range(25):
+            r = client.open(path, method=method)
+            if r.status_code != 200 or r.get_json() != 0:
+                failures.append((path, r.status_code, r.get_data(as_text=True)))
+
+    updater = threading.Thread(target=update)
+    churners = [
+        threading.Thread(target=churn, args=("POST", f"/add_ticker/{CHURNED}")),
+        threading.Thread(target=churn, args=("PUT", "/reset")),
+    ]
+    for thread in [updater, *churners]:
+        thread.start()
+    for thread in churners:
+        thread.join()
+    done.set()
+    updater.join()
+
+    assert failures == []
+    data = server.store.snapshot().data
+    assert set(data) == set(server.states)
+    assert server.storage.exists(CHURNED) == (CHURNED in data)
+    assert sorted(server.storage.tickers()) == sorted(data)
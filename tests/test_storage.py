@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage import get_storage, is_valid_symbol
+
+
+@pytest.mark.parametrize("symbol", ["aapl", "BRK.A", "BF-B", "7203", "a", "abcdefghij"])
+def test_valid_symbols(symbol):
+    assert is_valid_symbol(symbol)
+
+
+@pytest.mark.parametrize(
+    "symbol",
+    [
+        "",
+        ".",
+        "..",
+        ".aapl",
+        "-x",
+        "a/b",
+        "..%2F",
+        "a b",
+        "abcdefghijk",
+        None,
+        "journal",
+        "cache",
+        "CACHE",
+    ],
+)
+def test_invalid_symbols(symbol):
+    assert not is_valid_symbol(symbol)
+
+
+@pytest.mark.parametrize("name", ["npy", "csv"])
+def test_storage_rejects_paths_outside_the_data_directory(name, data_dir):
+    storage = get_storage(name, data_dir=data_dir)
+    df = pd.DataFrame(
+        {"price": [1.0], "signal": [0], "pnl": [0.0]},
+        index=pd.DatetimeIndex(["2022-06-01 13:30"], name="datetime"),
+    )
+    for call in [
+        lambda: storage.save("..", df),
+        lambda: storage.load("../x"),
+        lambda: storage.exists(".."),
+        lambda: storage.delete(".."),
+    ]:
+        with pytest.raises(ValueError):
+            call()
+    assert os.path.isdir(data_dir)
+
+
+@pytest.mark.parametrize(
+    "method, endpoint",
+    [
+        ("POST", "add_ticker"),
+        ("DELETE", "del_ticker"),
+        ("POST", "load_ticker"),
+        ("POST", "unload_ticker"),
+    ],
+)
+def test_endpoints_reject_invalid_symbols(configure_server, method, endpoint):
+    server = configure_server("--minutes", "5")
+    client = server.create_app().test_client()
+    before = sorted(os.listdir(os.path.dirname(server.storage.data_dir[:-1])))
+    r = client.open(f"/{endpoint}/%2E%2E", method=method)
+    assert r.status_code == 200 and r.get_json() == 2
+    assert sorted(os.listdir(os.path.dirname(server.storage.data_dir[:-1]))) == before
+
+
+@pytest.mark.parametrize("reserved", ["journal", "cache"])
+def test_deleting_a_reserved_name_keeps_its_directory(configure_server, reserved):
+    server = configure_server("--minutes", "5")
+    client = server.create_app().test_client()
+    assert client.post("/add_ticker/ibm").get_json() == 0
+    server.journal.append("ibm", np.datetime64("2022-06-01T13:30"), 1.0)
+    server.journal.sync()
+    os.makedirs(f"{server.storage.data_dir}cache", exist_ok=True)
+    assert client.post(f"/add_ticker/{reserved}").get_json() == 2
+    assert client.delete(f"/del_ticker/{reserved}").get_json() == 2
+    assert server.storage.tickers() == ["ibm"]
+    assert os.path.isdir(f"{server.storage.data_dir}{reserved}")
@@ -0,0 +1,24 @@
+import pytest
+
+import server
+from stream import Broadcaster
+
+
+@pytest.fixture
+def broadcaster(monkeypatch):
+    monkeypatch.setattr(server, "broadcaster", Broadcaster(), raising=False)
+    monkeypatch.setattr(server, "load_status", {"ibm": "loading"})
+    return server.broadcaster
+
+
+@pytest.mark.parametrize(
+    "query, tickers",
+    [("", None), ("?tickers=", None), ("?tickers=IBM,msft", {"ibm", "msft"})],
+)
+def test_stream_subscribes_to_requested_tickers(broadcaster, query, tickers):
+    """A client without ?tickers gets every ticker, not only the ones loading when it connected"""
+    app = server.create_app()
+    with app.test_request_context(f"/stream{query}"):
+        server.Stream().get()
+    (subscriber,) = broadcaster.subscribers
+    assert subscriber.tickers == tickers